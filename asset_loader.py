@@ -0,0 +1,222 @@
+"""
+asset_loader.py
+
+Decode-once image loading for the GUI.
+
+Every image name is decoded at most once per process, however many animations use it,
+and only when something first asks for it:
+
+    assets = AssetLoader(max_size=390)
+    frames = [assets.image(name) for name in ("高兴1", "高兴2")]
+
+Images come either from individual ``<name>.png`` files or, when ``atlas.json`` exists
+next to them, from one prebuilt sprite sheet (decoded once, frames cropped out of it).
+Build the sheet with:
+
+    python -m asset_loader --build-atlas --max-size 390
+
+The asset directory is located relative to this module, so it works from any working
+directory and inside a Nuitka bundle (``--include-data-dir=assets=assets``).
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger("crackleaf")
+
+ASSET_DIR_NAME = "assets"
+ATLAS_INDEX_NAME = "atlas.json"
+ATLAS_IMAGE_NAME = "atlas.png"
+PLACEHOLDER_COLOR = "red"
+
+
+def find_asset_dir() -> Optional[str]:
+    """
+    Locate the assets directory.
+
+    Looked up next to this module first (source checkout, or the unpacked Nuitka onefile
+    bundle, where ``__file__`` points into the extraction directory), then next to the
+    executable (standalone builds), then in the working directory.
+
+    Returns:
+        Optional[str]: The directory, or None if none of the candidates exists.
+    """
+    candidates = [os.path.join(os.path.dirname(os.path.abspath(__file__)), ASSET_DIR_NAME),
+                  os.path.join(os.path.dirname(os.path.abspath(sys.argv[0] or sys.executable)), ASSET_DIR_NAME),
+                  os.path.abspath(ASSET_DIR_NAME)]
+    for candidate in candidates:
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+class AssetLoader:
+    """
+    Lazily decoded, shared PIL images keyed by asset name (the file name without ``.png``).
+
+    Args:
+        directory (Optional[str]): Asset directory; located with find_asset_dir() if None.
+        max_size (Optional[int]): Shrink images larger than this (in either dimension) right
+            after decoding. Set it to the largest size the UI ever displays: resident memory
+            then scales with the display size instead of the source resolution.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_size: Optional[int] = None):
+        self.directory = directory or find_asset_dir()
+        self.max_size = max_size
+        self._images: Dict[str, "Image.Image"] = {}
+        self._lock = threading.Lock()
+        self._atlas_boxes: Optional[Dict[str, List[int]]] = None
+        self._atlas_image_name = ATLAS_IMAGE_NAME
+        self._atlas = None  # the decoded sprite sheet, once a frame has been cropped from it
+        self._cropped: set[str] = set()
+        if self.directory is None:
+            logger.error(f"[Assets] 找不到 '{ASSET_DIR_NAME}' 目录，所有图片将使用占位图。")
+        else:
+            self._load_atlas_index()
+
+    def _load_atlas_index(self):
+        path = os.path.join(self.directory, ATLAS_INDEX_NAME)
+        try:
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+            self._atlas_boxes = index["frames"]
+            self._atlas_image_name = index.get("image", ATLAS_IMAGE_NAME)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"[Assets] 精灵图索引 {path} 无法读取，改为逐个加载图片: {e}")
+
+    def image(self, name: str) -> "Image.Image":
+        """
+        Return the decoded image for ``name``; decoded on the first call, shared afterwards.
+
+        A missing or unreadable image is replaced by a placeholder (and logged once).
+        """
+        with self._lock:
+            image = self._images.get(name)
+            if image is None:
+                image = self._decode(name)
+                self._images[name] = image
+            return image
+
+    def preload(self, names: Sequence[str]):
+        """Decode ``names`` now, e.g. from a background thread."""
+        for name in names:
+            self.image(name)
+
+    def loaded(self) -> List[str]:
+        """Names decoded so far."""
+        with self._lock:
+            return list(self._images)
+
+    def _decode(self, name: str) -> "Image.Image":
+        from PIL import Image
+        try:
+            if self.directory is None:
+                raise FileNotFoundError(ASSET_DIR_NAME)
+            if self._atlas_boxes is not None and name in self._atlas_boxes:
+                image = self._crop_from_atlas(name)
+            else:
+                with Image.open(os.path.join(self.directory, f"{name}.png")) as source:
+                    source.load()
+                    image = source.copy() if self.max_size is None else self._shrink(source)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Assets] 图片 '{name}' 加载失败，使用占位图: {e}")
+            return Image.new("RGB", (self.max_size or 100,) * 2, color=PLACEHOLDER_COLOR)
+        return image
+
+    def _shrink(self, image: "Image.Image") -> "Image.Image":
+        from PIL import Image
+        if max(image.size) <= self.max_size:
+            return image.copy()
+        scale = self.max_size / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, Image.LANCZOS)
+
+    def _crop_from_atlas(self, name: str) -> "Image.Image":
+        # Called with the lock held
+        if self._atlas is None:
+            from PIL import Image
+            with Image.open(os.path.join(self.directory, self._atlas_image_name)) as sheet:
+                sheet.load()
+                self._atlas = sheet.copy()
+        x, y, width, height = self._atlas_boxes[name]
+        image = self._atlas.crop((x, y, x + width, y + height))
+        self._cropped.add(name)
+        if len(self._cropped) == len(self._atlas_boxes):
+            self._atlas = None  # every frame has been cropped, the sheet is no longer needed
+        return image if self.max_size is None else self._shrink(image)
+
+
+def build_atlas(directory: str, names: Optional[Sequence[str]] = None, max_size: Optional[int] = None) -> str:
+    """
+    Pack ``<name>.png`` images into ``atlas.png`` and write ``atlas.json`` next to them.
+
+    Frames are laid out on a square-ish grid of equal cells, so the index stays trivial.
+
+    Args:
+        directory (str): Asset directory to read from and write to.
+        names (Optional[Sequence[str]]): Images to pack; every PNG except the atlas by default.
+        max_size (Optional[int]): Shrink each frame to at most this size before packing.
+
+    Returns:
+        str: Path of the written index.
+    """
+    from PIL import Image
+    if names is None:
+        names = sorted(os.path.splitext(entry)[0] for entry in os.listdir(directory)
+                       if entry.endswith(".png") and entry != ATLAS_IMAGE_NAME)
+    loader = AssetLoader(directory, max_size=max_size)
+    loader._atlas_boxes = None  # always pack from the individual files
+    images = [(name, loader.image(name)) for name in names]
+    if not images:
+        raise ValueError(f"{directory} 中没有可打包的 PNG 图片")
+
+    cell_width = max(image.width for _, image in images)
+    cell_height = max(image.height for _, image in images)
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    sheet = Image.new("RGBA", (columns * cell_width, rows * cell_height), (0, 0, 0, 0))
+    boxes = {}
+    for position, (name, image) in enumerate(images):
+        x, y = (position % columns) * cell_width, (position // columns) * cell_height
+        sheet.paste(image.convert("RGBA"), (x, y))
+        boxes[name] = [x, y, image.width, image.height]
+
+    sheet.save(os.path.join(directory, ATLAS_IMAGE_NAME), optimize=True)
+    index_path = os.path.join(directory, ATLAS_INDEX_NAME)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"image": ATLAS_IMAGE_NAME, "frames": boxes}, f, ensure_ascii=False, indent=2)
+    return index_path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m asset_loader", description="CrackLeaf 图片资源工具")
+    parser.add_argument("--build-atlas", action="store_true", help="把 assets 目录中的 PNG 打包成一张精灵图")
+    parser.add_argument("--dir", help="资源目录，默认自动查找")
+    parser.add_argument("--max-size", type=int, help="打包前把每帧缩小到不超过该尺寸（像素）")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or find_asset_dir()
+    if directory is None:
+        parser.error(f"找不到 '{ASSET_DIR_NAME}' 目录，请用 --dir 指定")
+    if not args.build_atlas:
+        parser.print_help()
+        return 0
+    index_path = build_atlas(directory, max_size=args.max_size)
+    print(f"已生成 {index_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
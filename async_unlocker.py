@@ -0,0 +1,201 @@
+"""
+async_unlocker.py
+
+asyncio front end for pdf_unlocker.unlock_pdf.
+
+Every call runs on one shared executor (a process pool by default, or a thread pool) and
+must first take a slot from a per-event-loop semaphore, so however many coroutines call
+in, at most ``max_concurrency`` unlocks are admitted at once and the event loop itself
+never blocks on PDF work:
+
+    configure_async_executor("process", max_workers=4)
+    result = await unlock_pdf_async("in.pdf", "out.pdf")
+
+Cancelling a waiting call removes it before it starts. A call that is already running
+cannot be interrupted inside the worker: the awaiting task is cancelled right away, but
+its admission slot is only released once the worker finishes, so cancelled work still
+counts against the limit for as long as it really occupies the executor.
+
+If a worker process dies, the process pool is replaced and every call that was running on
+it is retried once on the new pool; a call whose retry breaks the pool again returns a
+failed result instead of raising.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+
+from pdf_unlocker import (ERROR_RESOURCE, SAVE_PROFILES, UnlockResult, _failure_result, _init_worker,
+                          _output_path_for, unlock_pdf)
+
+logger = logging.getLogger("crackleaf")
+
+EXECUTOR_KINDS = ("process", "thread")
+
+_executor: Optional[Executor] = None
+_executor_kind = "process"
+_max_workers: Optional[int] = None
+_max_concurrency: Optional[int] = None
+_executor_lock = threading.Lock()
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def configure_async_executor(kind: str = "process", max_workers: Optional[int] = None,
+                             max_concurrency: Optional[int] = None):
+    """
+    Choose the executor used by the async API. Replaces (and shuts down) the current one.
+
+    Args:
+        kind (str): "process" for a process pool (true parallelism, results are pickled back)
+            or "thread" (no start-up cost, shares the caller's memory).
+        max_workers (Optional[int]): Pool size; None uses all CPU cores.
+        max_concurrency (Optional[int]): Unlocks admitted at once per event loop; defaults
+            to the pool size, so extra callers wait on the semaphore, not in the executor queue.
+    """
+    global _executor, _executor_kind, _max_workers, _max_concurrency
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"未知的执行器类型: {kind}（可选: {', '.join(EXECUTOR_KINDS)}）")
+    with _executor_lock:
+        old = _executor
+        _executor, _executor_kind = None, kind
+        _max_workers, _max_concurrency = max_workers, max_concurrency
+        _semaphores.clear()
+    if old is not None:
+        old.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_async_executor(wait: bool = True):
+    """Shut the shared executor down; the next call creates a fresh one."""
+    global _executor
+    with _executor_lock:
+        old, _executor = _executor, None
+        _semaphores.clear()
+    if old is not None:
+        old.shutdown(wait=wait, cancel_futures=True)
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = _max_workers or os.cpu_count() or 1
+            if _executor_kind == "thread":
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crackleaf")
+            else:
+                _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        return _executor
+
+def _replace_executor(broken: Executor):
+    """Drop a pool broken by a dead worker so the next call starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is not broken:
+            return  # already replaced by another call
+        _executor = None
+    logger.warning("[Async] 工作进程异常退出，重建进程池")
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _submit(*args, **options) -> Tuple[Executor, Future]:
+    """Submit unlock_pdf, retrying once on a fresh pool if the current one is already broken."""
+    executor = _get_executor()
+    try:
+        return executor, executor.submit(unlock_pdf, *args, **options)
+    except BrokenProcessPool:
+        _replace_executor(executor)
+    executor = _get_executor()
+    return executor, executor.submit(unlock_pdf, *args, **options)
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_concurrency or _max_workers or os.cpu_count() or 1)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+async def unlock_pdf_async(input_path: str, output_path: str, password: str = '', **options) -> UnlockResult:
+    """
+    Awaitable unlock_pdf; runs on the shared executor once an admission slot is free.
+
+    Args:
+        input_path (str): PDF to unlock.
+        output_path (str): Where to write the unlocked PDF.
+        password (str): Password to open the document.
+        **options: Any other unlock_pdf keyword (adaptive, profile, instrument, cache, keyring).
+
+    Returns:
+        UnlockResult: Same as unlock_pdf.
+
+    Raises:
+        asyncio.CancelledError: If the calling task is cancelled.
+    """
+    semaphore = _get_semaphore()
+    await semaphore.acquire()
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        try:
+            executor, future = _submit(input_path, output_path, password, **options)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancel() or future.done():
+                semaphore.release()
+            else:
+                # Already running in a worker: hold the slot until it really finishes
+                logger.info(f"[Async] '{input_path}' 已在执行中，取消后将在后台完成。")
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(semaphore.release))
+            raise
+        except BrokenProcessPool:
+            # Every call on the pool sees this, not only the one whose worker died: retry once
+            _replace_executor(executor)
+            if attempt == 0:
+                continue
+            semaphore.release()
+            logger.error(f"[Async] '{input_path}' 重试后工作进程仍异常退出")
+            return _failure_result("工作进程异常退出（可能是该文件导致解析器崩溃或内存不足）", ERROR_RESOURCE)
+        except Exception as e:
+            semaphore.release()
+            logger.error(f"[Async] '{input_path}' 工作进程异常: {type(e).__name__}: {e}")
+            return _failure_result(f"工作进程异常: {e}")
+        semaphore.release()
+        return result
+
+async def batch_unlock_async(filepaths: Sequence[str], password: str = '',
+                             passwords: Optional[Sequence[str]] = None,
+                             output_dir: Optional[str] = None,
+                             output_paths: Optional[Sequence[str]] = None,
+                             **options) -> List[UnlockResult]:
+    """
+    Unlock many PDFs concurrently under the shared admission limit.
+
+    Cancelling the batch cancels every file that has not started yet.
+
+    Args:
+        filepaths (Sequence[str]): PDFs to unlock.
+        password (str): Password shared by every file.
+        passwords (Optional[Sequence[str]]): Per-file passwords, overriding ``password``.
+        output_dir (Optional[str]): Write outputs here instead of next to each input.
+        output_paths (Optional[Sequence[str]]): Explicit per-file outputs, overriding ``output_dir``.
+        **options: Any other unlock_pdf keyword.
+
+    Returns:
+        List[UnlockResult]: One result per file, in input order.
+    """
+    profile = options.get("profile", "default")
+    if profile not in SAVE_PROFILES:
+        raise ValueError(f"未知的保存配置: {profile}（可选: {', '.join(SAVE_PROFILES)}）")
+    return await asyncio.gather(*(
+        unlock_pdf_async(
+            path,
+            output_paths[idx] if output_paths is not None else _output_path_for(path, output_dir),
+            passwords[idx] if passwords is not None else password,
+            **options)
+        for idx, path in enumerate(filepaths)
+    ))
@@ -0,0 +1,8 @@
+"""
+benchmarks
+
+Reproducible performance measurements for pdf_unlocker.
+
+    python -m benchmarks --corpus /tmp/crackleaf-corpus --output baseline.json
+    python -m benchmarks --corpus /tmp/crackleaf-corpus --compare baseline.json
+"""
@@ -0,0 +1,45 @@
+"""
+Command-line entry point: python -m benchmarks
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.corpus import MANIFEST_NAME, generate_corpus, load_corpus
+from benchmarks.run import TARGETS, compare_reports, dump_report, format_comparison, run_benchmarks
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="CrackLeaf 解锁性能基准测试")
+    parser.add_argument("--corpus", required=True, help="语料目录；不存在 manifest.json 时自动生成")
+    parser.add_argument("--seed", type=int, default=0, help="生成语料使用的随机种子")
+    parser.add_argument("--regenerate", action="store_true", help="强制重新生成语料")
+    parser.add_argument("--target", action="append", choices=TARGETS, help="只运行指定目标（可重复）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个目标遍历语料的次数")
+    parser.add_argument("--jobs", type=int, default=1, help="batch_unlock_files 的 max_workers")
+    parser.add_argument("--output", help="把 JSON 报告写入文件，默认输出到 stdout")
+    parser.add_argument("--compare", help="与之前保存的 JSON 报告比较，变化写到 stderr")
+    args = parser.parse_args(argv)
+
+    if args.regenerate or not os.path.exists(os.path.join(args.corpus, MANIFEST_NAME)):
+        corpus = generate_corpus(args.corpus, seed=args.seed)
+    else:
+        corpus = load_corpus(args.corpus)
+
+    try:
+        report = run_benchmarks(corpus, targets=args.target or TARGETS, repeat=args.repeat, jobs=args.jobs)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    dump_report(report, args.output)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(format_comparison(compare_reports(baseline, report)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+benchmarks/corpus.py
+
+Generates a synthetic, reproducible corpus of encrypted PDFs with pikepdf.
+The same seed always yields the same documents, /ID and sizes (AES IVs are still random).
+"""
+
+import json
+import random
+from itertools import product
+from pathlib import Path
+from typing import List, Optional, TypedDict
+
+import pikepdf
+
+MANIFEST_NAME = "manifest.json"
+OWNER_PASSWORD = "owner-secret"
+USER_PASSWORD = "user-secret"
+
+# name -> keyword arguments for pikepdf.Encryption
+ALGORITHMS = {
+    "RC4-40": {"R": 2, "aes": False, "metadata": False},
+    "RC4-128": {"R": 3, "aes": False, "metadata": False},
+    "AES-128": {"R": 4, "aes": True},
+    "AES-256": {"R": 6, "aes": True},
+}
+PAGE_COUNTS = (1, 20, 200)
+PAYLOAD_SIZES = (0, 1 << 20)  # extra incompressible bytes per document
+
+
+class CorpusEntry(TypedDict):
+    path: str
+    algorithm: str
+    pages: int
+    payload_bytes: int
+    user_password: bool
+    damaged: bool
+    password: str  # password to pass to unlock_pdf
+    size: int
+
+
+def _build_document(pages: int, payload_bytes: int, rng: random.Random) -> pikepdf.Pdf:
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica
+    ))
+    for number in range(pages):
+        page = pdf.add_blank_page(page_size=(612, 792))
+        text = f"BT /F1 18 Tf 72 720 Td (crackleaf benchmark page {number + 1}) Tj ET".encode()
+        page.Contents = pdf.make_stream(text)
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+    if payload_bytes:
+        # Random bytes do not compress, so the file size really grows by payload_bytes
+        payload = rng.randbytes(payload_bytes)
+        pdf.Root.CrackleafPayload = pdf.make_stream(payload)
+    return pdf
+
+def _damage_xref(path: Path):
+    """Point startxref at a wrong offset, forcing readers into xref reconstruction."""
+    data = bytearray(path.read_bytes())
+    marker = data.rfind(b"startxref")
+    line_start = marker + len(b"startxref")
+    while data[line_start] in b"\r\n ":
+        line_start += 1
+    line_end = line_start
+    while data[line_end] in b"0123456789":
+        line_end += 1
+    bogus = str(int(data[line_start:line_end]) // 2).rjust(line_end - line_start, "0").encode()
+    data[line_start:line_end] = bogus
+    path.write_bytes(bytes(data))
+
+def generate_corpus(directory: str, seed: int = 0,
+                    page_counts=PAGE_COUNTS, payload_sizes=PAYLOAD_SIZES,
+                    algorithms: Optional[List[str]] = None) -> List[CorpusEntry]:
+    """
+    Write one PDF per combination of algorithm, page count, payload size, password mode and
+    xref damage into ``directory``, plus a manifest.json describing them.
+
+    Args:
+        directory (str): Target directory, created if missing.
+        seed (int): Seed for the payload bytes.
+        page_counts: Page counts to generate.
+        payload_sizes: Extra payload sizes in bytes.
+        algorithms (Optional[List[str]]): Subset of ALGORITHMS; all when None.
+
+    Returns:
+        List[CorpusEntry]: Description of every generated file.
+    """
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    entries: List[CorpusEntry] = []
+    combos = product(algorithms or list(ALGORITHMS), page_counts, payload_sizes, (False, True), (False, True))
+    for algorithm, pages, payload_bytes, user_password, damaged in combos:
+        name = (f"{algorithm}_p{pages}_s{payload_bytes}"
+                f"_{'user' if user_password else 'owner'}{'_damaged' if damaged else ''}.pdf")
+        path = root / name
+        encryption = pikepdf.Encryption(
+            owner=OWNER_PASSWORD,
+            user=USER_PASSWORD if user_password else "",
+            allow=pikepdf.Permissions(extract=False, modify_other=False),
+            **ALGORITHMS[algorithm],
+        )
+        with _build_document(pages, payload_bytes, rng) as pdf:
+            pdf.save(path, encryption=encryption, static_id=True,
+                     object_stream_mode=pikepdf.ObjectStreamMode.disable)
+        if damaged:
+            _damage_xref(path)
+        entries.append({
+            "path": str(path),
+            "algorithm": algorithm,
+            "pages": pages,
+            "payload_bytes": payload_bytes,
+            "user_password": user_password,
+            "damaged": damaged,
+            "password": USER_PASSWORD if user_password else "",
+            "size": path.stat().st_size,
+        })
+    (root / MANIFEST_NAME).write_text(json.dumps(entries, indent=2), encoding="utf-8")
+    return entries
+
+def load_corpus(directory: str) -> List[CorpusEntry]:
+    """Read the manifest written by generate_corpus."""
+    return json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding="utf-8"))
@@ -0,0 +1,211 @@
+"""
+benchmarks/run.py
+
+Runs pdf_unlocker against a corpus and reports throughput, latency percentiles and peak RSS.
+Each target runs in a fresh spawned process so its peak RSS is not polluted by the others.
+With --jobs > 1 the work happens in pool workers, whose peak is reported separately.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import CorpusEntry
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TARGETS = ("unlock_pdf", "_unlock_with_pikepdf", "_unlock_with_pypdf2", "batch_unlock_files")
+RESULT_POLL_SECONDS = 1.0
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def _peak_worker_rss_bytes() -> Optional[int]:
+    """Largest peak RSS among this process's finished children (pool workers), if available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _single_file_call(target: str) -> Callable[[CorpusEntry, str], bool]:
+    import pdf_unlocker
+
+    if target == "unlock_pdf":
+        return lambda entry, out: pdf_unlocker.unlock_pdf(entry["path"], out, entry["password"])["success"]
+    strategy = getattr(pdf_unlocker, target)
+
+    def call(entry: CorpusEntry, out: str) -> bool:
+        try:
+            return strategy(entry["path"], out, entry["password"])[0]
+        except pdf_unlocker.WrongPasswordError:
+            return False
+    return call
+
+def _run_target(target: str, corpus: List[CorpusEntry], repeat: int, jobs: int, queue):
+    """Child-process body: measure one target and put its raw numbers on ``queue``."""
+    import logging
+    logging.disable(logging.CRITICAL)  # strategy failures are expected on damaged files
+    import pdf_unlocker
+
+    workdir = tempfile.mkdtemp(prefix="crackleaf-bench-")
+    latencies: List[float] = []
+    successes = 0
+    files = 0
+    try:
+        # Copy the corpus before the clock starts; only the unlocking itself is measured
+        groups: Dict[str, List[str]] = {}
+        if target == "batch_unlock_files":
+            # batch_unlock_files takes one password, so run one batch per password group
+            for entry in corpus:
+                copy = shutil.copy(entry["path"], workdir)
+                groups.setdefault(entry["password"], []).append(copy)
+        started = time.perf_counter()
+        if target == "batch_unlock_files":
+            for _ in range(repeat):
+                for password, paths in groups.items():
+                    batch_started = time.perf_counter()
+                    results = pdf_unlocker.batch_unlock_files(paths, password, max_workers=jobs)
+                    latencies.append(time.perf_counter() - batch_started)
+                    successes += sum(1 for r in results if r["success"])
+                    files += len(paths)
+        else:
+            call = _single_file_call(target)
+            out = os.path.join(workdir, "out.pdf")
+            for _ in range(repeat):
+                for entry in corpus:
+                    file_started = time.perf_counter()
+                    successes += bool(call(entry, out))
+                    latencies.append(time.perf_counter() - file_started)
+                    files += 1
+        elapsed = time.perf_counter() - started
+        bytes_processed = sum(e["size"] for e in corpus) * repeat
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    queue.put({
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "files": files,
+        "successes": successes,
+        "bytes": bytes_processed,
+        "peak_rss_bytes": pdf_unlocker.peak_rss_bytes(),
+        # batch_unlock_files has shut its pool down by now, so every worker has been reaped
+        "peak_worker_rss_bytes": _peak_worker_rss_bytes(),
+    })
+
+def _wait_for_result(target: str, process, queue) -> dict:
+    """Wait for the child's numbers without hanging if it dies first (crash, OOM kill)."""
+    while True:
+        try:
+            return queue.get(timeout=RESULT_POLL_SECONDS)
+        except queue_module.Empty:
+            if process.is_alive():
+                continue
+        try:
+            return queue.get_nowait()  # put just before exiting
+        except queue_module.Empty:
+            process.join()
+            raise RuntimeError(f"测试目标 {target} 的进程异常退出 (exit code {process.exitcode})") from None
+
+def run_benchmarks(corpus: List[CorpusEntry], targets=TARGETS, repeat: int = 1, jobs: int = 1) -> dict:
+    """
+    Measure each target against the corpus.
+
+    Args:
+        corpus (List[CorpusEntry]): Files to unlock, as returned by generate_corpus/load_corpus.
+        targets: Names from TARGETS.
+        repeat (int): How many passes over the corpus per target.
+        jobs (int): max_workers passed to batch_unlock_files.
+
+    Returns:
+        dict: Machine-readable report; latencies are per file, except for batch_unlock_files
+        where they are per batch call. ``peak_rss_bytes`` is the measuring process itself,
+        ``peak_worker_rss_bytes`` the largest single pool worker (0 when nothing ran in one).
+
+    Raises:
+        RuntimeError: If a target's process exits without reporting (crash, OOM kill).
+    """
+    context = multiprocessing.get_context("spawn")
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": {
+            "files": len(corpus),
+            "bytes": sum(e["size"] for e in corpus),
+        },
+        "repeat": repeat,
+        "jobs": jobs,
+        "targets": {},
+    }
+    for target in targets:
+        if target not in TARGETS:
+            raise ValueError(f"未知的测试目标: {target}")
+        queue = context.Queue()
+        process = context.Process(target=_run_target, args=(target, corpus, repeat, jobs, queue))
+        process.start()
+        raw = _wait_for_result(target, process, queue)
+        process.join()
+        elapsed = raw["elapsed"] or 1e-9
+        report["targets"][target] = {
+            "files": raw["files"],
+            "successes": raw["successes"],
+            "elapsed_seconds": round(raw["elapsed"], 6),
+            "files_per_second": round(raw["files"] / elapsed, 3),
+            "mb_per_second": round(raw["bytes"] / elapsed / (1 << 20), 3),
+            "latency_p50_seconds": round(_percentile(raw["latencies"], 50), 6),
+            "latency_p99_seconds": round(_percentile(raw["latencies"], 99), 6),
+            "peak_rss_bytes": raw["peak_rss_bytes"],
+            "peak_worker_rss_bytes": raw["peak_worker_rss_bytes"],
+        }
+    return report
+
+def compare_reports(baseline: dict, current: dict) -> Dict[str, Dict[str, float]]:
+    """
+    Relative change (current / baseline - 1) of every numeric metric present in both reports.
+    """
+    changes: Dict[str, Dict[str, float]] = {}
+    for target, metrics in current["targets"].items():
+        base = baseline.get("targets", {}).get(target)
+        if not base:
+            continue
+        changes[target] = {
+            name: round(value / base[name] - 1, 4)
+            for name, value in metrics.items()
+            if isinstance(value, (int, float)) and isinstance(base.get(name), (int, float)) and base[name]
+        }
+    return changes
+
+def format_comparison(changes: Dict[str, Dict[str, float]]) -> str:
+    lines = []
+    for target, metrics in changes.items():
+        lines.append(target)
+        for name, change in metrics.items():
+            lines.append(f"  {name:<24} {change:+.1%}")
+    return "\n".join(lines)
+
+def dump_report(report: dict, path: Optional[str] = None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
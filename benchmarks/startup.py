@@ -0,0 +1,133 @@
+"""
+benchmarks/startup.py
+
+Import-time budget check for the entry-point modules:
+
+    python -m benchmarks.startup            # exit status 1 if any budget is exceeded
+    python -m benchmarks.startup --repeat 9 --scale 2
+
+Each module is imported in a fresh interpreter with ``-X importtime``; the cumulative time
+of the module's own line is used, so interpreter start-up is not counted. The check also
+fails when a module pulls in a library that is meant to be imported on first use.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Sequence, TypedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy libraries that must not be imported just by importing an entry point
+LAZY_MODULES = ("pikepdf", "PyPDF2", "PIL", "tkinterdnd2")
+
+
+class Budget(TypedDict):
+    module: str
+    max_ms: float
+
+
+# Generous enough for a cold CI runner, tight enough to catch an eager pikepdf import (~150 ms)
+BUDGETS: List[Budget] = [
+    {"module": "pdf_unlocker", "max_ms": 120.0},
+    {"module": "crackleaf", "max_ms": 150.0},
+    {"module": "main", "max_ms": 200.0},
+]
+
+
+def measure_import(module: str) -> tuple[float, List[str]]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        tuple[float, List[str]]: (cumulative import time in ms, LAZY_MODULES that got imported)
+    """
+    probe = (f"import sys, {module}; "
+             f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=ROOT,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        last_line = (completed.stderr.strip().splitlines() or ["?"])[-1]
+        raise RuntimeError(f"导入 {module} 失败: {last_line}")
+    cumulative_us = None
+    for line in completed.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    if cumulative_us is None:
+        raise RuntimeError(f"没有在 -X importtime 输出中找到 {module}")
+    eager = [name for name in completed.stdout.strip().split(",") if name]
+    return cumulative_us / 1000, eager
+
+def check_budgets(budgets: Sequence[Budget] = BUDGETS, repeat: int = 5, scale: float = 1.0) -> List[dict]:
+    """
+    Measure every budgeted module ``repeat`` times and compare the median with its budget.
+
+    Args:
+        budgets (Sequence[Budget]): Modules and their limits.
+        repeat (int): Fresh imports per module; the median is compared.
+        scale (float): Multiplier applied to every limit (e.g. 2 on a slow machine).
+
+    Returns:
+        List[dict]: One record per module with ``median_ms``, ``max_ms``, ``eager`` and ``ok``.
+    """
+    records = []
+    for budget in budgets:
+        timings, eager = [], set()
+        for _ in range(repeat):
+            elapsed_ms, imported = measure_import(budget["module"])
+            timings.append(elapsed_ms)
+            eager.update(imported)
+        limit = budget["max_ms"] * scale
+        median = statistics.median(timings)
+        records.append({
+            "module": budget["module"],
+            "median_ms": round(median, 1),
+            "min_ms": round(min(timings), 1),
+            "max_ms": limit,
+            "eager": sorted(eager),
+            "ok": median <= limit and not eager,
+        })
+    return records
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="检查入口模块的导入耗时预算")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块导入的次数，取中位数")
+    parser.add_argument("--scale", type=float, default=1.0, help="所有预算乘以该系数（慢速机器上可调大）")
+    parser.add_argument("--module", action="append", help="只检查指定模块（可重复）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    budgets: Sequence[Budget] = BUDGETS
+    if args.module:
+        known: Dict[str, Budget] = {budget["module"]: budget for budget in BUDGETS}
+        unknown = [name for name in args.module if name not in known]
+        if unknown:
+            parser.error(f"没有为这些模块定义预算: {', '.join(unknown)}")
+        budgets = [known[name] for name in args.module]
+
+    try:
+        records = check_budgets(budgets, repeat=args.repeat, scale=args.scale)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(records, ensure_ascii=False, indent=2))
+    else:
+        for record in records:
+            status = "OK  " if record["ok"] else "FAIL"
+            line = f"{status} {record['module']:<14} {record['median_ms']:8.1f} ms (预算 {record['max_ms']:.0f} ms)"
+            if record["eager"]:
+                line += f"，提前导入了 {', '.join(record['eager'])}"
+            print(line)
+    return 0 if all(record["ok"] for record in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
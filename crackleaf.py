@@ -0,0 +1,228 @@
+"""
+crackleaf.py
+
+Headless command-line entry point built on pdf_unlocker:
+
+    python -m crackleaf scans/ -r -o unlocked/ --jobs 8 > results.jsonl
+
+Prints one JSON object per file on stdout as soon as it finishes. Exit code 0 means every
+file was unlocked, 1 means at least one failed, 2 means bad usage or no input files.
+Deliberately imports nothing from the GUI (Tk, PIL, tkinterdnd2) so it starts fast.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pdf_unlocker
+from pdf_unlocker import SAVE_PROFILES, SCHEDULES, Keyring, MetricsAggregator, iter_unlock
+from output_sinks import DirectorySink, open_sink
+from result_cache import ResultCache
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+
+_GLOB_CHARS = set("*?[")
+
+
+def _is_output_name(path: str, suffix: str) -> bool:
+    return Path(path).stem.endswith(suffix)
+
+def collect_inputs(inputs: List[str], recursive: bool, suffix: str) -> List[Tuple[str, str]]:
+    """
+    Expand files, directories and glob patterns into PDF paths.
+
+    Returns:
+        List[Tuple[str, str]]: (path, path relative to the input it came from), de-duplicated,
+        in a stable order. Files that look like earlier outputs (``*<suffix>.pdf``) are skipped
+        when found through a directory or glob.
+    """
+    found: List[Tuple[str, str]] = []
+    seen = set()
+
+    def add(path: str, relative: str):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            found.append((path, relative))
+
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            for path in sorted(glob.glob(pattern, recursive=recursive)):
+                if path.lower().endswith(".pdf") and os.path.isfile(path) and not _is_output_name(path, suffix):
+                    add(path, os.path.relpath(path, item))
+        elif _GLOB_CHARS & set(item):
+            for path in sorted(glob.glob(item, recursive=recursive)):
+                if os.path.isfile(path) and not _is_output_name(path, suffix):
+                    add(path, os.path.basename(path))
+        else:
+            # Explicit file names are passed through even if missing, so they show up as failures
+            add(item, os.path.basename(item))
+    return found
+
+def output_path_for(path: str, relative: str, output_dir: Optional[str], suffix: str) -> str:
+    """Output next to the input with ``suffix``, or under ``output_dir`` mirroring ``relative``."""
+    if output_dir is None:
+        return str(Path(path).with_stem(Path(path).stem + suffix))
+    target = Path(output_dir) / relative
+    return str(target.with_stem(target.stem + suffix))
+
+def load_keyring(path: str) -> Keyring:
+    """
+    Read a password file: one candidate per line, blank lines and ``#`` comments ignored.
+
+    ``id:<hex> <password>`` binds a password to a document /ID and ``glob:<pattern> <password>``
+    to matching paths; any other line is a plain candidate, tried in file order.
+    """
+    keyring = Keyring()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            kind, _, rest = line.partition(":")
+            key, _, password = rest.partition(" ")
+            if kind == "id" and password:
+                keyring.add(password, document_id=key)
+            elif kind == "glob" and password:
+                keyring.add(password, pattern=key)
+            else:
+                keyring.add(line)
+    return keyring
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m crackleaf", description="批量解除 PDF 限制（无界面模式）")
+    parser.add_argument("inputs", nargs="+", help="PDF 文件、目录或 glob 模式（如 'scans/**/*.pdf'）")
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归处理目录，并让 ** 匹配子目录")
+    parser.add_argument("-o", "--output-dir", help="输出目录（保留相对目录结构）；默认写在原文件旁边")
+    parser.add_argument("--suffix", default="_unlocked", help="输出文件名后缀，默认 _unlocked")
+    parser.add_argument("--archive", help="把所有输出依次写入一个归档文件（.zip / .tar / .tar.gz），不生成单独的文件")
+    parser.add_argument("-p", "--password", default=os.environ.get("CRACKLEAF_PASSWORD", ""),
+                        help="解锁密码，默认读取环境变量 CRACKLEAF_PASSWORD")
+    parser.add_argument("--password-file",
+                        help="候选密码文件，每行一个；支持 'id:<十六进制 ID> 密码' 和 'glob:<模式> 密码'")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="并行进程数，0 表示使用全部 CPU 核心")
+    parser.add_argument("--chunksize", type=int, default=1, help="每次分配给工作进程的文件数")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="fifo",
+                        help="处理顺序：fifo 按输入顺序，sjf 先处理估计耗时最短的文件（降低中位等待时间）")
+    parser.add_argument("--large-file-mb", type=int, default=pdf_unlocker.LARGE_FILE_BYTES >> 20,
+                        help="不小于该大小的文件以内存映射方式打开，并交给单独的低并发进程池；0 表示关闭")
+    parser.add_argument("--large-jobs", type=int, default=1, help="大文件进程池的进程数")
+    parser.add_argument("--memory-budget-mb", type=int, default=0,
+                        help="每个文件的内存预算（MB），预计超出时跳过 PyPDF2 备用方法；0 表示不限制")
+    parser.add_argument("--timeout", type=float, default=0,
+                        help="每个文件的处理时限（秒），超时的文件在独立进程中被终止；0 表示不限制")
+    parser.add_argument("--memory-limit-mb", type=int, default=0,
+                        help="每个独立工作进程的内存上限（MB），超出的文件记为 memory_limit；0 表示不限制")
+    parser.add_argument("--profile", choices=sorted(SAVE_PROFILES), default="default", help="PikePDF 保存配置")
+    parser.add_argument("--adaptive", action="store_true", help="根据统计数据调整解密方法顺序")
+    parser.add_argument("--cache-dir", help="结果缓存目录；内容相同的文件直接复用之前的输出")
+    parser.add_argument("--cache-max-mb", type=int, default=2048, help="结果缓存的容量上限（MB）")
+    parser.add_argument("--metrics", choices=("prometheus", "jsonl"), help="结束时把汇总指标写到 stderr")
+    parser.add_argument("--watch", action="store_true",
+                        help="持续监视输入目录，新文件写入完成后立即解锁（Ctrl+C 退出）")
+    parser.add_argument("--settle", type=float, default=0.5, help="监视模式：文件停止变化多少秒后才处理")
+    parser.add_argument("--state-file", help="监视模式：记录已处理文件，重启后不再重复处理")
+    parser.add_argument("-v", "--verbose", action="store_true", help="在 stderr 输出详细日志")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    pdf_unlocker.logger.setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+
+    if args.jobs < 0:
+        parser.error("--jobs 不能为负数")
+    if args.timeout < 0 or args.memory_limit_mb < 0:
+        parser.error("--timeout 和 --memory-limit-mb 不能为负数")
+    if not args.suffix and args.output_dir is None and not args.archive:
+        parser.error("未指定 --output-dir 时 --suffix 不能为空，否则会覆盖原文件")
+
+    try:
+        args.keyring = load_keyring(args.password_file) if args.password_file else None
+    except OSError as e:
+        parser.error(f"无法读取密码文件: {e}")
+
+    if args.watch:
+        if args.archive:
+            parser.error("--archive 不能与 --watch 同时使用")
+        return watch(args, parser)
+
+    collected = collect_inputs(args.inputs, args.recursive, args.suffix)
+    if not collected:
+        print("未找到任何 PDF 文件。", file=sys.stderr)
+        return EXIT_USAGE
+
+    filepaths = [path for path, _ in collected]
+    if args.archive or args.output_dir is not None:
+        # Names relative to the archive / output directory, written through an OutputSink
+        try:
+            sink = open_sink(args.archive) if args.archive else DirectorySink(args.output_dir)
+        except OSError as e:
+            parser.error(f"无法创建输出: {e}")
+        output_paths = [output_path_for(rel, rel, None, args.suffix) for _, rel in collected]
+    else:
+        sink = None
+        output_paths = [output_path_for(path, rel, None, args.suffix) for path, rel in collected]
+
+    aggregator = MetricsAggregator() if args.metrics else None
+    cache = ResultCache(args.cache_dir, args.cache_max_mb << 20) if args.cache_dir else None
+    failures = 0
+    results = iter_unlock(filepaths, args.password, max_workers=args.jobs or None, chunksize=args.chunksize,
+                          output_paths=output_paths, adaptive=args.adaptive, profile=args.profile,
+                          instrument=aggregator is not None, cache=cache, keyring=args.keyring, sink=sink,
+                          schedule=args.schedule, large_file_bytes=(args.large_file_mb << 20) or None,
+                          large_workers=args.large_jobs, memory_budget=(args.memory_budget_mb << 20) or None,
+                          timeout=args.timeout or None, memory_limit=(args.memory_limit_mb << 20) or None)
+    try:
+        for idx, result in results:
+            failures += not result["success"]
+            if aggregator is not None:
+                aggregator.add(result)
+            record = {"index": idx, "input_path": filepaths[idx], **result}
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        results.close()
+        return 130
+    finally:
+        if sink is not None:
+            sink.close()
+
+    if aggregator is not None:
+        sys.stderr.write(aggregator.to_prometheus() if args.metrics == "prometheus" else aggregator.to_json_lines())
+    return EXIT_FAILURES if failures else EXIT_OK
+
+
+def watch(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    """Run a FolderWatcher on a single input directory until interrupted."""
+    from watch_folder import FolderWatcher
+
+    if len(args.inputs) != 1 or not os.path.isdir(args.inputs[0]):
+        parser.error("--watch 需要且只接受一个目录")
+
+    def emit(path: str, result):
+        sys.stdout.write(json.dumps({"input_path": path, **result}, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    watcher = FolderWatcher(args.inputs[0], args.password, output_dir=args.output_dir, suffix=args.suffix,
+                            recursive=args.recursive, max_workers=args.jobs or os.cpu_count() or 1,
+                            settle_seconds=args.settle, state_file=args.state_file, profile=args.profile,
+                            keyring=args.keyring, memory_budget=(args.memory_budget_mb << 20) or None,
+                            on_result=emit)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+isolated_unlocker.py
+
+Run each unlock in a separate, recycled worker process with a wall-clock timeout and a
+memory cap, so one pathological PDF costs at most ``timeout`` seconds and ``memory_limit``
+bytes instead of stalling (or swapping out) a whole batch or the GUI:
+
+    with IsolatedUnlocker(timeout=120, memory_limit=2 << 30) as unlocker:
+        result = unlocker.unlock("in.pdf", "out.pdf", "secret")
+        if result["status"] == STATUS_TIMEOUT:
+            ...
+
+A worker serves up to ``max_tasks`` files and is then replaced, so leaks in qpdf or PyPDF2
+cannot build up. The worker writes each output under a temporary name next to it and renames
+it into place only once the file is done, so an existing output is never left half
+overwritten. A worker that runs past its timeout or dies is killed and replaced before the
+next file, and whatever it was writing (that temporary file and the libraries' temp files
+next to it) is removed. The timeout only starts once a new worker has imported its libraries.
+Every result carries ``status`` (see STATUS_* in pdf_unlocker).
+
+For batches, ``iter_unlock(..., timeout=..., memory_limit=...)`` runs its jobs on an
+IsolatedPool: one babysitting thread and one isolated worker per slot.
+
+The memory cap is a setrlimit in the worker: RLIMIT_DATA on Linux (heap and anonymous
+mappings, so memory-mapped large inputs do not count against it), RLIMIT_AS elsewhere.
+Allocations beyond it fail with MemoryError and the file is reported as
+``memory_limit``. Platforms without the ``resource`` module only get the timeout.
+"""
+
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from pdf_unlocker import (ERROR_RESOURCE, ERROR_TIMEOUT, ERROR_UNKNOWN, STATUS_CRASHED, STATUS_FAILED,
+                          STATUS_MEMORY_LIMIT, STATUS_OK, STATUS_TIMEOUT, UnlockResult, _failure_result,
+                          _init_worker, unlock_pdf)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("crackleaf")
+
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_MAX_TASKS = 100
+_STOP_GRACE_SECONDS = 2.0
+_START_TIMEOUT_SECONDS = 60.0
+_READY = "ready"
+
+
+def _limit_memory(limit: int):
+    """Cap this process's memory; see the module docstring for which limit is used."""
+    if resource is None:
+        return
+    kind = resource.RLIMIT_DATA if sys.platform.startswith("linux") else resource.RLIMIT_AS
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(kind, (limit, hard))
+    except (ValueError, OSError) as e:
+        logger.warning(f"[Isolated] 无法设置内存上限: {e}")
+
+def _unlock_in_place(input_path: str, output_path: str, password: str, options: dict) -> UnlockResult:
+    """unlock_pdf into ``<output>.<pid>.isolated.tmp``, renamed over ``output_path`` on success."""
+    staged = f"{output_path}.{os.getpid()}.isolated.tmp"
+    try:
+        result = unlock_pdf(input_path, staged, password, **options)
+        if result["success"]:
+            os.replace(staged, output_path)
+            result["output_path"] = output_path
+        return result
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+
+def _worker_main(conn, memory_limit: Optional[int]):
+    """Worker loop: receive (input, output, password, options) jobs until None or EOF."""
+    _init_worker()
+    # Set after the libraries are imported, so the cap only has to cover document work
+    if memory_limit is not None:
+        _limit_memory(memory_limit)
+    conn.send(_READY)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        input_path, output_path, password, options = job
+        try:
+            result = _unlock_in_place(input_path, output_path, password, options)
+        except MemoryError:
+            result = _failure_result("内存不足，超出工作进程的内存上限。", ERROR_RESOURCE)
+        except Exception as e:
+            result = _failure_result(f"发生未知错误: {e}")
+        conn.send(result)
+    conn.close()
+
+
+class IsolatedUnlocker:
+    """
+    One recycled worker process; unlock() blocks the calling thread for at most ``timeout``.
+
+    Args:
+        timeout (Optional[float]): Wall-clock seconds per file; None waits indefinitely.
+        memory_limit (Optional[int]): Memory cap of the worker in bytes; None for no cap.
+        max_tasks (int): Files a worker serves before it is replaced.
+        context (Optional[str]): multiprocessing start method; the platform default if None.
+    """
+
+    def __init__(self, timeout: Optional[float] = DEFAULT_TIMEOUT, memory_limit: Optional[int] = None,
+                 max_tasks: int = DEFAULT_MAX_TASKS, context: Optional[str] = None):
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_tasks = max(1, max_tasks)
+        self._context = multiprocessing.get_context(context)
+        self._process = None
+        self._conn = None
+        self._tasks = 0
+        self._busy = False
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn, self.memory_limit),
+                                        name="crackleaf-isolated", daemon=True)
+        process.start()
+        child_conn.close()
+        self._process, self._conn, self._tasks = process, parent_conn, 0
+        # Wait until the libraries are imported, so start-up is not charged to the first file's timeout
+        if not parent_conn.poll(_START_TIMEOUT_SECONDS):
+            raise EOFError(f"工作进程 {_START_TIMEOUT_SECONDS:g} 秒内未能启动")
+        parent_conn.recv()
+
+    def _retire(self, kill: bool = False):
+        """Stop the current worker: politely, or with SIGKILL after a timeout or crash."""
+        process, conn = self._process, self._conn
+        self._process = self._conn = None
+        if process is None:
+            return
+        if not kill:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                kill = True
+        if not kill:
+            process.join(_STOP_GRACE_SECONDS)
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+
+    def unlock(self, input_path: str, output_path: str, password: str = '', **options) -> UnlockResult:
+        """
+        Unlock one file in the worker process.
+
+        Args:
+            input_path (str): PDF to unlock.
+            output_path (str): Where to write the unlocked PDF.
+            password (str): Password to open the document.
+            **options: Any other unlock_pdf keyword (profile, adaptive, keyring, ...).
+
+        Returns:
+            UnlockResult: The worker's result, or a failure if it timed out or died; always
+            with ``status`` set.
+        """
+        self._busy = True
+        try:
+            if self._process is None:
+                self._spawn()
+            self._conn.send((input_path, output_path, password, options))
+            answered = self._conn.poll(self.timeout)
+            result = self._conn.recv() if answered else None
+        except (EOFError, OSError):
+            result, answered = None, True
+        finally:
+            self._busy = False
+
+        if result is None:
+            process = self._process
+            self._retire(kill=True)
+            self._remove_partial(output_path, process.pid if process is not None else None)
+            if not answered:
+                logger.warning(f"[Isolated] '{input_path}' 超过 {self.timeout:g} 秒未完成，已终止工作进程。")
+                result = _failure_result(f"处理超时（超过 {self.timeout:g} 秒），已终止。", ERROR_TIMEOUT)
+                result["status"] = STATUS_TIMEOUT
+            else:
+                code = process.exitcode if process is not None else None
+                logger.error(f"[Isolated] '{input_path}' 的工作进程异常退出 (exit code {code})。")
+                result = _failure_result(f"工作进程异常退出 (exit code {code})", ERROR_UNKNOWN)
+                result["status"] = STATUS_CRASHED
+            result["bytes_read"] = 0
+            return result
+
+        self._tasks += 1
+        if self._tasks >= self.max_tasks:
+            self._retire()
+        if result["success"]:
+            result["status"] = STATUS_OK
+        elif result.get("error_kind") == ERROR_RESOURCE and self.memory_limit is not None:
+            result["status"] = STATUS_MEMORY_LIMIT
+        else:
+            result["status"] = STATUS_FAILED
+        return result
+
+    @staticmethod
+    def _remove_partial(output_path: str, pid: Optional[int]):
+        """Remove what a killed worker was writing; the output itself is only ever renamed into place."""
+        folder, name = os.path.split(os.path.abspath(output_path))
+        # pikepdf's atomic save (".pikepdf.<name>..."), the worker's "<name>.<pid>.isolated.tmp"
+        # and result_cache._place ("<name>.<pid>.<thread>.tmp", also of the staged name)
+        patterns = [f".pikepdf.{glob.escape(name)}*"]
+        if pid is not None:
+            patterns.append(f"{glob.escape(name)}.{pid}.*.tmp")
+        leftovers = [path for pattern in patterns for path in glob.glob(os.path.join(glob.escape(folder), pattern))]
+        for path in leftovers:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def interrupt(self):
+        """Kill the worker if it is busy (from another thread); the running unlock returns as crashed."""
+        process = self._process
+        if self._busy and process is not None:
+            process.kill()
+
+    def close(self):
+        """Stop the worker; a new one is started if unlock() is called again."""
+        self._retire()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class IsolatedPool(ThreadPoolExecutor):
+    """
+    Thread pool whose threads each drive their own IsolatedUnlocker.
+
+    Submit ``pool.unlock_chunk`` with a list of (input, output, password) jobs and the
+    unlock_pdf options, like pdf_unlocker._unlock_chunk on a process pool.
+    """
+
+    def __init__(self, max_workers: int, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 memory_limit: Optional[int] = None, max_tasks: int = DEFAULT_MAX_TASKS):
+        super().__init__(max_workers=max_workers, thread_name_prefix="crackleaf-isolated")
+        self._settings = {"timeout": timeout, "memory_limit": memory_limit, "max_tasks": max_tasks}
+        self._local = threading.local()
+        self._unlockers: List[IsolatedUnlocker] = []
+        self._unlockers_lock = threading.Lock()
+
+    def _unlocker(self) -> IsolatedUnlocker:
+        unlocker = getattr(self._local, "unlocker", None)
+        if unlocker is None:
+            unlocker = IsolatedUnlocker(**self._settings)
+            self._local.unlocker = unlocker
+            with self._unlockers_lock:
+                self._unlockers.append(unlocker)
+        return unlocker
+
+    def unlock_chunk(self, jobs: List[tuple[str, str, str]], options: Optional[dict] = None) -> List[UnlockResult]:
+        unlocker = self._unlocker()
+        return [unlocker.unlock(input_path, output_path, password, **(options or {}))
+                for input_path, output_path, password in jobs]
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._unlockers_lock:
+            unlockers = list(self._unlockers)
+        if cancel_futures:
+            # Running files would otherwise hold shutdown for up to their full timeout
+            for unlocker in unlockers:
+                unlocker.interrupt()
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        if wait:
+            for unlocker in unlockers:
+                unlocker.close()
@@ -3,15 +3,38 @@ from tkinter import filedialog, messagebox, ttk
 import tkinter.font as tkfont
 import os
 import threading
+import time
 import queue
-from pdf_unlocker import batch_unlock_files, unlock_pdf # 假设这些函数已存在且功能正常
-from PyPDF2 import PdfReader
-from PyPDF2.errors import PdfReadError
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pdf_unlocker import PdfProbeError, iter_unlock, preload_backends, probe_pdf # 假设这些函数已存在且功能正常
+from output_sinks import DirectorySink
+from asset_loader import AssetLoader
 from tkinter.simpledialog import askstring
-from tkinterdnd2 import TkinterDnD
-from PIL import Image, ImageTk # 确保导入 PIL 库
+# 导入本模块时不导入 PyPDF2 / pikepdf / PIL / tkinterdnd2（benchmarks/startup.py 会检查）。
+# 创建窗口时才导入 tkinterdnd2；构建界面时为了第一帧就显示 logo，会导入 PIL 并解码 logo 用到的几张图片，
+# 其余动画帧在第一次播放时才解码；PyPDF2 / pikepdf 由 warm_up_in_background 在窗口显示后于后台线程中导入
 
 ACCEPTED_EXTENSIONS = {'.pdf'}
+FRAME_CACHE_SIZE = 24 # 缓存的 (动画, 尺寸) 组合数，够放下几种窗口尺寸下的全部动画
+RESIZE_COALESCE_MS = 16 # 合并连续的 <Configure> 事件，大约每帧最多重新布局一次
+IMPORT_WORKERS = min(8, os.cpu_count() or 1) # 后台分析导入文件的线程数
+MAX_IMPORT_ERRORS_SHOWN = 10 # 导入结束后汇总提示时最多列出的错误条数
+UI_EVENT_POLL_MS = 50 # 主线程检查工作线程事件队列的间隔
+MAX_IMAGE_SIZE = 390 # 图片最大显示尺寸，解码后直接缩小到这个尺寸，减少常驻内存
+UNLOCK_TIMEOUT_SECONDS = 600 # 单个文件的处理时限，超时的文件在独立进程中被终止，不会卡住整批
+CLOSE_WAIT_SECONDS = 5 # 关闭窗口时最多等待解锁线程清理的时间
+
+# 动画名 -> 帧序列（图片名）。同一张图片在多个动画中出现时只解码一次，见 asset_loader.py
+ANIMATION_FRAMES = {
+    "idle": ["高兴1", "高兴2", "高兴3", "高兴4", "高兴4", "高兴3", "高兴2", "高兴1"],
+    "run": ["啄1", "啄2"],
+    "unlock_start": ["成功1", "成功2", "成功3", "成功4", "成功5"], # 新增的解锁开始动画
+    "success": ["高兴1", "高兴2", "高兴3", "高兴4"], # 解锁成功后的动画
+    "failure": ["高兴4", "高兴3", "高兴2", "高兴1"], # 失败反向动画
+    "crackleaf": ["crackleaf"], # 原始logo
+    "happy": ["高兴1", "高兴2"] # 导入文件后的默认/悬停图片
+}
 
 class Tooltip:
     # Tooltip 类保持不变
@@ -41,6 +64,161 @@ class Tooltip:
         if tw:
             tw.destroy()
 
+class TextFitter:
+    """按像素宽度截断文本。测量结果按字号缓存，截断用二分查找，每个名字只需 O(log n) 次测量。"""
+    ELLIPSIS = "..."
+    MAX_CACHE = 50000 # 缓存条目上限，超过后整体清空
+
+    def __init__(self, font):
+        self.font = font
+        self._size = None
+        self._widths = {}
+
+    def measure(self, text):
+        size = self.font.cget("size")
+        if size != self._size: # 字号变了，之前的测量全部作废
+            self._size = size
+            self._widths.clear()
+        width = self._widths.get(text)
+        if width is None:
+            if len(self._widths) >= self.MAX_CACHE:
+                self._widths.clear()
+            width = self._widths[text] = self.font.measure(text)
+        return width
+
+    def fit(self, text, max_width):
+        """返回宽度不超过 max_width 的文本，放不下时截断并以省略号结尾。"""
+        if self.measure(text) <= max_width:
+            return text
+        # 找到最长的前缀，使 前缀 + 省略号 仍能放下（至少保留一个字符）
+        low, high = 1, len(text) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.measure(text[:mid] + self.ELLIPSIS) <= max_width:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low] + self.ELLIPSIS
+
+
+class VirtualFileList(tk.Canvas):
+    """
+    只绘制可见行的文件列表，用来代替 Listbox，几千个文件也不会卡顿。
+
+    行内容通过 row_source(idx) -> (图标, 文件名) 按需获取，列表本身不保存文本。
+    保留了 Listbox 中用到的接口：nearest、selection_set/selection_clear、bbox("active")、yview。
+    """
+
+    PADDING_X = 4
+
+    def __init__(self, master, font, row_source, fg="#192F2A", selectbackground="#cce6ff", **kwargs):
+        super().__init__(master, highlightthickness=0, borderwidth=0, **kwargs)
+        self.font = font
+        self.row_source = row_source
+        self.fg = fg
+        self.selectbackground = selectbackground
+        self.fitter = TextFitter(font)
+        self.count = 0
+        self.selected = None
+        self._row_items = {} # 行号 -> 画布上的文字对象
+        self._row_height = 1
+        self._render_job = None
+
+        self.bind("<Configure>", lambda e: self.redraw())
+        self.bind("<MouseWheel>", lambda e: self.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        self.bind("<Button-4>", lambda e: self.yview_scroll(-1, "units"))
+        self.bind("<Button-5>", lambda e: self.yview_scroll(1, "units"))
+
+    def set_row_count(self, count):
+        """设置行数并整体重绘（导入文件、字号变化时调用）。"""
+        self.count = count
+        if self.selected is not None and self.selected >= count:
+            self.selected = None
+        self.redraw()
+
+    def redraw(self):
+        """丢弃所有已绘制的行，按当前字号和宽度重新绘制可见部分。"""
+        self._row_height = self.font.metrics("linespace") + 4
+        self.configure(scrollregion=(0, 0, self.winfo_width(), self.count * self._row_height),
+                       yscrollincrement=self._row_height)
+        self.delete("row")
+        self._row_items.clear()
+        self._render_visible()
+
+    def refresh_row(self, idx):
+        """某个文件状态变化时只更新这一行；不可见的行等滚动到时再绘制。"""
+        item = self._row_items.get(idx)
+        if item is not None:
+            self.itemconfigure(item, text=self._row_text(idx))
+
+    def _row_text(self, idx):
+        icon, name = self.row_source(idx)
+        prefix = f"{icon} "
+        available = self.winfo_width() - 2 * self.PADDING_X - self.fitter.measure(prefix)
+        return prefix + self.fitter.fit(name, available)
+
+    def _visible_range(self):
+        top = self.canvasy(0)
+        first = max(0, int(top // self._row_height))
+        last = min(self.count, int((top + self.winfo_height()) // self._row_height) + 1)
+        return first, last
+
+    def _render_visible(self):
+        self._render_job = None
+        first, last = self._visible_range()
+        # 删除滚出视野的行，只为新出现的行创建文字对象
+        for idx in [idx for idx in self._row_items if not first <= idx < last]:
+            self.delete(self._row_items.pop(idx))
+        for idx in range(first, last):
+            if idx not in self._row_items:
+                self._row_items[idx] = self.create_text(
+                    self.PADDING_X, idx * self._row_height + self._row_height // 2,
+                    text=self._row_text(idx), anchor=tk.W, font=self.font, fill=self.fg, tags="row")
+        self._draw_selection()
+
+    def yview(self, *args):
+        result = super().yview(*args)
+        if args and self._render_job is None:
+            # 滚动条拖动时事件很密集，合并到空闲时统一绘制
+            self._render_job = self.after_idle(self._render_visible)
+        return result
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    # --- Listbox 兼容接口 ---
+    def nearest(self, y):
+        if self.count == 0:
+            return -1
+        return min(self.count - 1, int(self.canvasy(y) // self._row_height))
+
+    def selection_clear(self, first=None, last=None):
+        self.selected = None
+        self.delete("selection")
+
+    def selection_set(self, idx):
+        self.selected = idx
+        self._draw_selection()
+
+    def _draw_selection(self):
+        self.delete("selection")
+        if self.selected is None:
+            return
+        top = self.selected * self._row_height
+        self.create_rectangle(0, top, self.winfo_width(), top + self._row_height,
+                              fill=self.selectbackground, outline="", tags="selection")
+        self.tag_lower("selection")
+
+    def bbox(self, *args):
+        if args == ("active",):
+            # 与 Listbox.bbox 相同的 (x, y, 宽, 高)，坐标相对于控件本身
+            if self.selected is None:
+                return (0, 0, 0, 0)
+            y = self.selected * self._row_height - int(self.canvasy(0))
+            return (0, y, self.winfo_width(), self._row_height)
+        return super().bbox(*args)
+
+
 class CrackLeafApp:
     def __init__(self, root):
         self.root = root
@@ -61,10 +239,18 @@ class CrackLeafApp:
         self.root.update_idletasks() 
 
         self.file_statuses = []  # List of dicts: {'path':..., 'password':..., 'icon':..., 'status':...}
+        self.file_index = {} # 规范化路径 -> file_statuses 下标，用于 O(1) 去重
+        self.importing = set() # 正在后台分析的规范化路径
+        self.click_count = 0 # 已点击过的文件数，用于确定解锁优先级
+        self.import_errors = [] # 本轮导入中出现的 (标题, 内容)，导入结束后一次性提示
+        self.import_pool = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="crackleaf-import")
+        self.ui_events = queue.Queue() # 工作线程 -> 主线程的事件，见 post_ui_event
         
         # 动画状态变量
         self.current_animation_id = None # 用于取消当前正在播放的动画
-        self.animation_frames = {} # 缓存所有动画帧图片
+        self.animation_frames = {} # 动画名 -> 帧序列（图片名），图片由 self.assets 按需解码
+        self.assets = AssetLoader(max_size=MAX_IMAGE_SIZE) # 按模块位置查找 assets，与工作目录无关
+        self.display_frame_cache = OrderedDict() # (动画, 尺寸) -> 已缩放的 PhotoImage 列表，LRU 淘汰
         self.animation_index = 0 # 当前动画帧索引
         self.is_animating = False # 标记是否有动画正在播放
 
@@ -96,7 +282,13 @@ class CrackLeafApp:
 
         self.drag_overlay = None
 
-        self.unlock_queue = queue.Queue()
+        self.unlocking = False # 解锁线程是否在运行
+        self.progress = None # 本轮解锁的进度统计，只在主线程中读写
+        self.root.after(UI_EVENT_POLL_MS, self._poll_ui_events)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self._resize_job = None # 已排队但尚未执行的重新布局
+        self._pending_size = None
+        self._applied_size = None
         self.root.bind("<Configure>", self.on_window_resize)
 
         # 初始时加载所有图片，并确保resize_logo_images在更新UI状态前被调用
@@ -113,37 +305,22 @@ class CrackLeafApp:
         self.large_font.config(size=new_large_font_size)
 
         self.update_ui_state() # 初始UI状态更新
+        self.root.after_idle(self.warm_up_in_background) # 等窗口画出来之后再预热
 
 
-    def load_all_animation_frames(self):
-        """预加载所有动画帧图片，避免运行时重复加载"""
-        frame_sets = {
-            "idle": ["高兴1", "高兴2", "高兴3", "高兴4", "高兴4", "高兴3", "高兴2", "高兴1"],
-            "run": ["啄1", "啄2"],
-            "unlock_start": ["成功1", "成功2", "成功3", "成功4", "成功5"], # 新增的解锁开始动画
-            "success": ["高兴1", "高兴2", "高兴3", "高兴4"], # 解锁成功后的动画
-            "failure": ["高兴4", "高兴3", "高兴2", "高兴1"], # 失败反向动画
-            "crackleaf": ["crackleaf"], # 原始logo
-            "happy": ["高兴1", "高兴2"] # 导入文件后的默认/悬停图片
-        }
-        
-        # 确保 assets 目录存在
-        if not os.path.exists("assets"):
-            print("Error: 'assets' directory not found. Please create it and place your images there.")
-            return
+    def warm_up_in_background(self):
+        """在后台线程中导入解锁用到的库，第一次解锁或分析文件时就不必再等待导入"""
+        def warm_up():
+            try:
+                preload_backends()
+                from PIL import ImageTk # noqa: F401
+            except ImportError as e:
+                print(f"Warning: 预加载失败，将在第一次使用时再导入: {e}")
+        threading.Thread(target=warm_up, name="crackleaf-warmup", daemon=True).start()
 
-        for anim_type, names in frame_sets.items():
-            self.animation_frames[anim_type] = []
-            for name in names:
-                try:
-                    # 仅加载原始图片，不在这里resize
-                    img = Image.open(f"assets/{name}.png")
-                    self.animation_frames[anim_type].append(img)
-                except FileNotFoundError:
-                    print(f"Warning: Image file 'assets/{name}.png' not found.")
-                    # 可以使用一个占位符图片
-                    placeholder_img = Image.new('RGB', (100, 100), color = 'red')
-                    self.animation_frames[anim_type].append(placeholder_img)
+    def load_all_animation_frames(self):
+        """登记所有动画的帧序列。图片不在这里解码，而是在动画第一次播放时由 get_display_frames 解码"""
+        self.animation_frames = {anim_type: list(names) for anim_type, names in ANIMATION_FRAMES.items()}
 
 
     def _play_animation_loop(self, frame_list_key, interval_ms, loop=True, on_complete_callback=None):
@@ -157,25 +334,12 @@ class CrackLeafApp:
         if self.current_animation_id:
             self.root.after_cancel(self.current_animation_id) # 取消之前的动画
         
-        frames = self.animation_frames.get(frame_list_key)
-        if not frames:
+        if not self.animation_frames.get(frame_list_key):
             print(f"Error: Animation frames for '{frame_list_key}' not loaded.")
             return
 
-        # 获取当前logo_label的尺寸，用于resize图片
-        current_size = self.logo_label.winfo_width() 
-        if current_size == 1: # 窗口可能还没完全渲染，使用预设的image_display_size
-            current_size = self.image_display_size
-
-        # 确保图片尺寸正确
-        display_frames = []
-        for img_orig in frames:
-            # 确保 img_orig 是 Image 对象
-            if isinstance(img_orig, Image.Image):
-                display_frames.append(ImageTk.PhotoImage(img_orig.resize((current_size, current_size))))
-            else:
-                # Fallback for placeholder or error
-                display_frames.append(ImageTk.PhotoImage(Image.new('RGB', (current_size, current_size), color = 'red')))
+        # 与静态logo使用同一尺寸，同一尺寸的帧只缩放一次
+        display_frames = self.get_display_frames(frame_list_key, self.image_display_size)
 
         self.is_animating = True
 
@@ -200,6 +364,30 @@ class CrackLeafApp:
         animate_frame()
 
 
+    def get_display_frames(self, frame_list_key, size):
+        """
+        返回缩放到 size×size 的动画帧 PhotoImage 列表。
+        按 (动画, 尺寸) 缓存，超过 FRAME_CACHE_SIZE 时淘汰最久未使用的一组。
+        """
+        key = (frame_list_key, size)
+        frames = self.display_frame_cache.get(key)
+        if frames is not None:
+            self.display_frame_cache.move_to_end(key)
+            return frames
+
+        from PIL import ImageTk
+        # 同一动画里重复出现的帧（如 idle 的往返）共用一个 PhotoImage
+        scaled = {}
+        frames = []
+        for name in self.animation_frames.get(frame_list_key, []):
+            if name not in scaled:
+                scaled[name] = ImageTk.PhotoImage(self.assets.image(name).resize((size, size)))
+            frames.append(scaled[name])
+        self.display_frame_cache[key] = frames
+        if len(self.display_frame_cache) > FRAME_CACHE_SIZE:
+            self.display_frame_cache.popitem(last=False)
+        return frames
+
     def stop_current_animation(self):
         """停止当前正在播放的动画，并重置logo显示"""
         self.is_animating = False
@@ -265,18 +453,11 @@ class CrackLeafApp:
 
 
     def create_widgets(self):
-        from PIL import Image, ImageTk
         self.main_frame = tk.Frame(self.root, bg="#FCF5EA")
         self.main_frame.pack(expand=True, fill=tk.BOTH, padx=20, pady=20)
 
         # Persistent top frame with logo and label_hint
         self.top_frame = tk.Frame(self.main_frame, bg="#FCF5EA")
-        # Load original images for dynamic resizing
-        # 这些图片现在从 load_all_animation_frames 中获取原始Image对象
-        self.original_logo_img = self.animation_frames.get("crackleaf", [None])[0]
-        self.original_happy1 = self.animation_frames.get("happy", [None, None])[0]
-        self.original_happy2 = self.animation_frames.get("happy", [None, None])[1]
-
         self.logo_label = ttk.Label(self.top_frame, background="#FCF5EA")
         self.logo_label.pack(pady=(10, 5))
         # 初始界面的文字
@@ -298,11 +479,9 @@ class CrackLeafApp:
         scrollbar = tk.Scrollbar(self.file_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        # 动态高度的Listbox，初始height=1，后续随文件数调整
-        self.file_listbox = tk.Listbox(self.file_frame, height=1, width=50, yscrollcommand=scrollbar.set, activestyle='none', bg="#FCF5EA", relief=tk.FLAT, selectbackground="#cce6ff", highlightthickness=0, borderwidth=0, font=self.custom_font, fg="#192F2A")
+        # 虚拟列表：只绘制可见的行，文件再多也只创建一屏的文字对象
+        self.file_listbox = VirtualFileList(self.file_frame, font=self.custom_font, row_source=self.file_row, yscrollcommand=scrollbar.set, bg="#FCF5EA", relief=tk.FLAT, selectbackground="#cce6ff", fg="#192F2A")
         self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        # 绑定Configure事件，动态调整高度
-        self.file_listbox.bind("<Configure>", lambda e: self.file_listbox.config(height=len(self.file_statuses)))
 
         scrollbar.config(command=self.file_listbox.yview)
 
@@ -310,8 +489,17 @@ class CrackLeafApp:
         self.animation_frame_container = tk.Frame(self.main_frame, bg="#FCF5EA")
         self.animation_label = tk.Label(self.animation_frame_container, text="", font=self.custom_font, bg="#FCF5EA", fg="gray")
         self.result_label = tk.Label(self.animation_frame_container, text="", font=self.custom_font, bg="#FCF5EA", fg="#192F2A")
+        self.progress_label = tk.Label(self.animation_frame_container, text="", font=self.custom_font, bg="#FCF5EA", fg="gray")
         self.animation_label.pack()
         self.result_label.pack()
+        self.progress_label.pack()
+
+        # 暂停/取消按钮，只在解锁过程中显示
+        self.control_frame = tk.Frame(self.animation_frame_container, bg="#FCF5EA")
+        self.pause_button = ttk.Button(self.control_frame, text="暂停", command=self.toggle_pause)
+        self.cancel_button = ttk.Button(self.control_frame, text="取消", command=self.cancel_unlock)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
 
         self.file_listbox.bind("<Button-1>", self.on_file_click)
 
@@ -405,14 +593,12 @@ class CrackLeafApp:
         width = self.root.winfo_width()
         # 图片尺寸统一按照窗口长或者宽的50%来进行缩放
         # 由于窗口宽度固定为390，所以直接使用宽度
-        self.image_display_size = int(width * 0.5) 
-        size = self.image_display_size
-        size = max(60, min(size, 390)) # 确保尺寸在合理范围
-        
-        # 重新生成PhotoImage对象
-        self.logo_img = ImageTk.PhotoImage(self.animation_frames["crackleaf"][0].resize((size, size)))
-        self.happy_img1 = ImageTk.PhotoImage(self.animation_frames["happy"][0].resize((size, size)))
-        self.happy_img2 = ImageTk.PhotoImage(self.animation_frames["happy"][1].resize((size, size)))
+        size = max(60, min(int(width * 0.5), MAX_IMAGE_SIZE)) # 确保尺寸在合理范围
+        self.image_display_size = size
+
+        # 从缓存取对应尺寸的PhotoImage，尺寸没变时不会重新缩放
+        self.logo_img = self.get_display_frames("crackleaf", size)[0]
+        self.happy_img1, self.happy_img2 = self.get_display_frames("happy", size)[:2]
 
         # 更新当前显示的图片，避免闪烁
         # 只有当非动画状态时才强制更新logo_label的图片
@@ -424,12 +610,26 @@ class CrackLeafApp:
 
 
     def on_window_resize(self, event):
+        # <Configure> 绑定在 root 上，所有子控件的事件也会到这里，只处理窗口本身
+        if event.widget is not self.root:
+            return
         if event.width < 100 or event.height < 100:
             return
+        # 连续的尺寸变化只记录最新尺寸，合并成一次重新布局
+        self._pending_size = (event.width, event.height)
+        if self._resize_job is None:
+            self._resize_job = self.root.after(RESIZE_COALESCE_MS, self._apply_resize)
+
+    def _apply_resize(self):
+        self._resize_job = None
+        if self._pending_size == self._applied_size:
+            return
+        self._applied_size = self._pending_size
+        width = self._applied_size[0]
         self.resize_logo_images()
         # Dynamically scale font size
         base_width = 390
-        scale = event.width / base_width
+        scale = width / base_width
         new_font_size = max(10, int(24 * scale)) # 使用24作为基准字号
         new_large_font_size = max(12, int(36 * scale))
         self.custom_font.config(size=new_font_size)
@@ -438,45 +638,123 @@ class CrackLeafApp:
         self.update_ui_state() 
 
 
+    # --- 工作线程与主线程之间的事件通道 ---
+    def post_ui_event(self, kind, *payload):
+        """
+        从任意线程向主线程投递事件。工作线程只把数据放进 ui_events 队列，从不调用 Tk，
+        也从不修改界面或 file_statuses；主线程每 UI_EVENT_POLL_MS 毫秒在 _poll_ui_events 中处理。
+        """
+        self.ui_events.put((kind, payload))
+
+    def _poll_ui_events(self):
+        """主线程：处理队列中的事件，然后安排下一次检查"""
+        try:
+            if not self.ui_events.empty():
+                self._on_ui_event()
+        finally:
+            self.root.after(UI_EVENT_POLL_MS, self._poll_ui_events)
+
+    def _on_ui_event(self):
+        # 一次取完队列中的全部事件，同一批事件只刷新一次界面
+        handlers = {
+            "imported": self._on_file_imported,
+            "expanded": self.handle_files,
+            "unlock_started": self._on_unlock_started,
+            "unlocked": self._on_file_unlocked,
+            "unlock_error": self._on_unlock_error,
+            "unlock_finished": self._on_unlock_finished,
+        }
+        old_count = len(self.file_statuses)
+        while True:
+            try:
+                kind, payload = self.ui_events.get_nowait()
+            except queue.Empty:
+                break
+            handlers[kind](*payload)
+        if len(self.file_statuses) != old_count:
+            self._on_files_added(old_count)
+        self._update_import_hint()
+
+    # --- 后台导入 ---
+    @staticmethod
+    def _path_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
     def handle_files(self, filepaths):
+        """
+        在后台线程池中分析文件，不阻塞界面。分析完成的文件通过事件通道逐个加入列表，
+        已经分析完的文件可以在其余文件仍在分析时就开始解锁。拖入的文件夹会在后台展开。
+        """
         for path in filepaths:
-            file_info = self.analyze_file(path)
-            if file_info is not None:
-                # Avoid duplicates
-                if not any(f['path'] == path for f in self.file_statuses):
-                    self.file_statuses.append(file_info)
-        self.update_file_display()
-        self.update_ui_state() # 确保UI状态在文件处理后更新
+            if os.path.isdir(path):
+                self.import_pool.submit(self._expand_directory, path)
+                continue
+            key = self._path_key(path)
+            if key in self.file_index or key in self.importing: # Avoid duplicates
+                continue
+            if os.path.splitext(path)[1].lower() not in ACCEPTED_EXTENSIONS:
+                self.import_errors.append(("错误", f"只能处理pdf文件: {path}"))
+                continue
+            self.importing.add(key)
+            self.import_pool.submit(self._import_worker, path, key)
+        self._update_import_hint()
+
+    def _expand_directory(self, directory):
+        """工作线程：列出文件夹中的全部 PDF，交回主线程去重后导入"""
+        found = []
+        for dirpath, _, filenames in os.walk(directory):
+            found.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                         if os.path.splitext(name)[1].lower() in ACCEPTED_EXTENSIONS)
+        self.post_ui_event("expanded", found)
+
+    def _import_worker(self, path, key):
+        """工作线程：分析单个文件，结果交给主线程"""
+        try:
+            file_info, error = self.analyze_file(path)
+        except Exception as e:
+            file_info, error = None, ("读取失败", f"{os.path.basename(path)} 无法读取: {e}")
+        self.post_ui_event("imported", key, file_info, error)
+
+    def _on_file_imported(self, key, file_info, error):
+        self.importing.discard(key)
+        if file_info is not None and key not in self.file_index:
+            self.file_index[key] = len(self.file_statuses)
+            self.file_statuses.append(file_info)
+        if error is not None:
+            self.import_errors.append(error)
+
+    def _on_files_added(self, old_count):
+        count = len(self.file_statuses)
+        if min(old_count, 9) != min(count, 9):
+            # 布局只在 0/1/2…9 个文件之间变化，超过之后只需要刷新列表
+            self.update_ui_state()
+        else:
+            self.label_hint.config(text=f"已导入 {count} 个文件")
+            self.update_file_display()
+
+    def _update_import_hint(self):
+        if self.importing:
+            self.animation_label.config(text=f"正在分析 {len(self.importing)} 个文件...")
+            return
+        self.animation_label.config(text="")
+        if self.import_errors:
+            # 导入结束后一次性提示，避免几百个文件各弹一个对话框
+            errors, self.import_errors = self.import_errors, []
+            lines = [message for _, message in errors[:MAX_IMPORT_ERRORS_SHOWN]]
+            if len(errors) > MAX_IMPORT_ERRORS_SHOWN:
+                lines.append(f"……另有 {len(errors) - MAX_IMPORT_ERRORS_SHOWN} 个文件未能导入")
+            messagebox.showerror(errors[0][0] if len(errors) == 1 else "部分文件未能导入", "\n".join(lines))
 
     def update_file_display(self):
         count = len(self.file_statuses)
-        self.file_listbox.delete(0, tk.END) # 清空Listbox
-
-        if count == 1:
-            # 单文件信息已经在 update_ui_state 中更新到 label_hint
-            pass
-        elif count > 1:
-            window_width = self.root.winfo_width()
-            max_pixel_width = window_width - 40  # Adjusted for padding/margin
-            fnt = self.custom_font
-            for file_info in self.file_statuses:
-                filename = os.path.basename(file_info["path"])
-                display_name = filename
-                # Truncate by pixel width using font measure
-                # 假设文件图标（emoji）宽度固定，这里只截断文件名部分
-                icon_width = fnt.measure(file_info['icon'] + " ") # 估算图标宽度
-                
-                # 调整 max_pixel_width，为图标和可能的间隔留出空间
-                available_width_for_text = max_pixel_width - icon_width
-                
-                while fnt.measure(display_name) > available_width_for_text and len(display_name) > 4:
-                    display_name = display_name[:-1]
-                if display_name != filename:
-                    display_name = display_name[:-3] + "..." # 确保省略号不会被截断
-                
-                display_text = f"{file_info['icon']} {display_name}"
-                self.file_listbox.insert(tk.END, display_text)
-        # For zero files, no display update needed for listbox
+        # 单文件信息已经在 update_ui_state 中更新到 label_hint，列表只在多文件时显示内容
+        # 虚拟列表按需向 file_row 取每一行，这里只需告诉它行数
+        self.file_listbox.set_row_count(count if count > 1 else 0)
+
+    def file_row(self, idx):
+        """虚拟列表的数据源：返回第 idx 个文件的 (图标, 文件名)"""
+        file_info = self.file_statuses[idx]
+        return file_info['icon'], os.path.basename(file_info["path"])
 
     # 以下函数保持不变，无需修改：
     def import_file(self):
@@ -484,26 +762,40 @@ class CrackLeafApp:
         self.handle_files(filepaths)
 
     def analyze_file(self, path):
+        """
+        分析单个文件。在工作线程中调用，因此不触碰任何界面元素。
+        返回 (file_info, error)：error 为 (标题, 内容) 或 None；二者都为 None 表示静默跳过。
+        """
         ext = os.path.splitext(path)[1].lower()
         if ext not in ACCEPTED_EXTENSIONS:
-            messagebox.showerror("错误", f"只能处理pdf文件: {path}")
-            return None
+            return None, ("错误", f"只能处理pdf文件: {path}")
+        try:
+            # 只读取 trailer 和 /Encrypt 字典，结果按 (路径, 大小, 修改时间) 缓存
+            probe = probe_pdf(path)
+            if probe["encrypted"]:
+                return {"path": path, "password": "", "icon": "🔒", "status": "加密受限"}, None
+            return {"path": path, "password": "", "icon": "🔒", "status": "未解锁"}, None
+        except PdfProbeError:
+            pass # trailer 损坏时退回到完整解析
+        except OSError as e:
+            return None, ("读取失败", f"{os.path.basename(path)} 无法读取: {e}")
+        from PyPDF2 import PdfReader
+        from PyPDF2.errors import PdfReadError
         try:
             reader = PdfReader(path)
             if reader.is_encrypted:
                 password = ""
-                return {"path": path, "password": password, "icon": "🔒", "status": "加密受限"}
+                return {"path": path, "password": password, "icon": "🔒", "status": "加密受限"}, None
             else:
                 password = ""
         except PdfReadError as e:
             if "PyCryptodome" in str(e):
-                return None
+                return None, None
             else:
-                return None
+                return None, None
         except Exception as e:
-            messagebox.showerror("读取失败", f"{os.path.basename(path)} 无法读取: {e}")
-            return None
-        return {"path": path, "password": password, "icon": "🔒", "status": "未解锁"}
+            return None, ("读取失败", f"{os.path.basename(path)} 无法读取: {e}")
+        return {"path": path, "password": password, "icon": "🔒", "status": "未解锁"}, None
 
     def setup_drag_and_drop(self):
         self.root.drop_target_register('*')
@@ -551,8 +843,13 @@ class CrackLeafApp:
         return "break"
 
     def start_unlock(self):
+        if self.unlocking:
+            return # 已经在解锁中，忽略重复点击
         if not self.file_statuses:
-            messagebox.showwarning("提示", "请先导入PDF文件")
+            if self.importing:
+                messagebox.showwarning("提示", "文件仍在分析中，请稍候")
+            else:
+                messagebox.showwarning("提示", "请先导入PDF文件")
             return
         
         # 播放解锁开始动画，动画结束后才启动解锁线程
@@ -561,86 +858,200 @@ class CrackLeafApp:
 
     def run_unlock_in_thread_after_animation(self):
         """在解锁开始动画播放完毕后，启动实际的解锁线程"""
-        self.unlock_queue = queue.Queue()
-        self.unlock_thread = threading.Thread(target=self.run_unlock_in_thread)
+        if self.unlocking:
+            return
+        # 在主线程中确定本轮要处理的文件；之后导入的文件不受影响
+        batch = [(idx, info["path"], info.get("password", "")) for idx, info in enumerate(self.file_statuses)]
+        # 用户点过的文件优先处理，先点的排在前面；其余文件按估计耗时从小到大处理
+        last_click = max((info.get("clicked_at", 0) for info in self.file_statuses), default=0)
+        priorities = [last_click + 1 - info["clicked_at"] if info.get("clicked_at") else 0
+                      for info in self.file_statuses]
+        for idx, _, _ in batch:
+            self.file_statuses[idx]["status"] = "排队中"
+        self.unlocking = True
+        self.unlock_cancel = threading.Event()
+        self.unlock_abort = threading.Event()
+        self.unlock_resume = threading.Event()
+        self.unlock_resume.set()
+        self.progress = {"total": len(batch), "total_bytes": 0, "done": 0, "succeeded": 0, "bytes": 0,
+                         "started": time.monotonic(), "paused_at": None, "paused_seconds": 0.0,
+                         "pending": {idx for idx, _, _ in batch}}
+        self.pause_button.config(text="暂停")
+        self.control_frame.pack(pady=(5, 0))
+        self.start_unlock_animation()
+        self.unlock_thread = threading.Thread(target=self.run_unlock_in_thread, args=(batch, priorities), daemon=True)
         self.unlock_thread.start()
-        self.root.after(200, self.check_unlock_status) # 定时检查解锁状态
 
-    def run_unlock_in_thread(self):
+    def run_unlock_in_thread(self, batch, priorities=None):
+        """
+        工作线程：解锁 batch 中的 (下标, 路径, 密码)。
+        priorities 高的先处理，同优先级时小文件先处理，结果按完成顺序返回。
+        每个结果都通过 post_ui_event 交给主线程处理，这里不修改任何界面状态。
+        暂停和取消都由 iter_unlock 在开始下一个文件之前检查：暂停时正在处理的文件仍会完成，
+        但不再开始新的文件；取消后等正在处理的文件完成就结束，已写出的文件不受影响。
+        """
         downloads = os.path.join(os.path.expanduser("~"), "Downloads")
-        for idx, file_info in enumerate(self.file_statuses):
-            filepath = file_info['path']
-            filename = os.path.basename(filepath)
-            output_path = os.path.join(downloads, os.path.splitext(filename)[0] + "_unlocked.pdf")
-            password = file_info.get("password", "")
-            
-            # 模拟耗时操作
-            # import time
-            # time.sleep(1) 
+        indices = [idx for idx, _, _ in batch]
+        filepaths = [path for _, path, _ in batch]
+        passwords = [password for _, _, password in batch]
 
-            result = unlock_pdf(filepath, output_path, password)
-            if result is None or 'success' not in result:
-                result = {'success': False, 'input_path': filepath, 'reason': '未知错误'}
-            else:
-                if 'input_path' not in result:
-                    result['input_path'] = filepath
-            
-            # 更新file_statuses中的状态
-            icon = "🔓" if result.get('success') else "❌"
-            status = "解锁成功" if result.get('success') else "解锁失败"
-            self.file_statuses[idx]["icon"] = icon
-            self.file_statuses[idx]["status"] = status
-            
-            # 将更新信息放入队列，供主线程处理
-            self.unlock_queue.put((idx, result))
-
-    def check_unlock_status(self):
-        updated = False
-        while not self.unlock_queue.empty():
-            idx, result = self.unlock_queue.get()
-            updated = True
-            # 实时更新Listbox中的文件状态
-            if len(self.file_statuses) > 1: # 只有多文件才在Listbox中更新
-                filename = os.path.basename(self.file_statuses[idx]["path"])
-                display_name = filename
-                window_width = self.root.winfo_width()
-                max_pixel_width = window_width - 40
-                fnt = self.custom_font
-                icon_width = fnt.measure(file_info['icon'] + " ") # 这里file_info未定义，应使用self.file_statuses[idx]['icon']
-                available_width_for_text = max_pixel_width - icon_width
-                
-                while fnt.measure(display_name) > available_width_for_text and len(display_name) > 4:
-                    display_name = display_name[:-1]
-                if display_name != filename:
-                    display_name = display_name[:-3] + "..." # 确保省略号不会被截断
-                
-                display_text = f"{self.file_statuses[idx]['icon']} {display_name}"
-                self.file_listbox.delete(idx)
-                self.file_listbox.insert(idx, display_text)
-
-        if hasattr(self, "unlock_thread") and self.unlock_thread.is_alive():
-            self.root.after(200, self.check_unlock_status) # 继续检查
+        total_bytes = 0
+        for path in filepaths:
+            try:
+                total_bytes += os.path.getsize(path)
+            except OSError:
+                pass
+        self.post_ui_event("unlock_started", total_bytes)
+
+        # iter_unlock 每完成一个文件就返回一次结果，无需在这里重复实现循环
+        # DirectorySink 先写临时文件再原子重命名，下载目录里不会出现写了一半的 PDF
+        # schedule="sjf" 让排在大文件后面的小文件不必等它，整体等待时间更短
+        # timeout 让每个文件在独立进程中处理，损坏或恶意构造的 PDF 最多占用 UNLOCK_TIMEOUT_SECONDS 秒
+        results = iter_unlock(filepaths, passwords=passwords, sink=DirectorySink(downloads),
+                              schedule="sjf", priorities=priorities, timeout=UNLOCK_TIMEOUT_SECONDS,
+                              resume=self.unlock_resume, cancel=self.unlock_cancel, abort=self.unlock_abort)
+        try:
+            for pos, result in results:
+                self.post_ui_event("unlocked", indices[pos], result)
+        except Exception as e:
+            self.post_ui_event("unlock_error", f"{type(e).__name__}: {e}")
+        finally:
+            results.close() # 出错退出时清理尚未完成的文件
+            self.post_ui_event("unlock_finished", self.unlock_cancel.is_set())
+
+    def toggle_pause(self):
+        if not self.unlocking:
+            return
+        if self.unlock_resume.is_set():
+            self.unlock_resume.clear()
+            self.progress["paused_at"] = time.monotonic()
+            self.pause_button.config(text="继续")
+            self.stop_current_animation()
         else:
-            # 解锁线程完成
-            self.stop_current_animation() # 停止啄动画
-            
-            success_count = sum(1 for f in self.file_statuses if f["icon"] == "🔓")
-            
-            if success_count == len(self.file_statuses): # 所有文件都成功
-                self.show_success_animation()
-                self.result_label.config(text="解锁成功")
-            else: # 部分或全部失败
-                self.show_failure_animation()
-                self.result_label.config(text="解锁失败")
-            
-            # 如果是单文件，更新label_hint
-            if len(self.file_statuses) == 1:
-                file_info = self.file_statuses[0]
-                filename = os.path.basename(file_info["path"])
-                self.label_hint.config(text=f"{file_info['icon']} {filename}")
+            self.progress["paused_seconds"] += time.monotonic() - self.progress["paused_at"]
+            self.progress["paused_at"] = None
+            self.unlock_resume.set()
+            self.pause_button.config(text="暂停")
+            self.start_unlock_animation()
+        self._update_progress_label()
+
+    def cancel_unlock(self):
+        if not self.unlocking:
+            return
+        self.unlock_cancel.set()
+        self.unlock_resume.set() # 暂停中也要唤醒工作线程，让它退出
+        self.cancel_button.state(["disabled"])
+        self.progress_label.config(text="正在取消，正在处理的文件完成后停止...")
+
+    def on_close(self):
+        """
+        关闭窗口：中止本轮解锁并停止后台导入，再销毁窗口。
+        隔离执行的线程池和导入线程池都不是守护线程，解释器退出时会等待它们；
+        不先中止的话，正在处理的文件最长要等 UNLOCK_TIMEOUT_SECONDS 秒才能退出。
+        """
+        if self.unlocking:
+            # abort 让 iter_unlock 立即返回，退出时以 cancel_futures=True 关闭线程池，终止正在运行的工作进程
+            self.unlock_cancel.set()
+            self.unlock_abort.set()
+            self.unlock_resume.set()
+        self.import_pool.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+        if self.unlocking:
+            self.unlock_thread.join(CLOSE_WAIT_SECONDS)
+
+    def _on_unlock_started(self, total_bytes):
+        self.progress["total_bytes"] = total_bytes
+        self._update_progress_label()
+
+    def _on_file_unlocked(self, idx, result):
+        """主线程：把一个文件的解锁结果写入 file_statuses，并只刷新对应的一行"""
+        success = bool(result.get("success"))
+        file_info = self.file_statuses[idx]
+        file_info["icon"] = "🔓" if success else "❌"
+        file_info["status"] = "解锁成功" if success else f"解锁失败：{result.get('message', '未知错误')}"
+        if len(self.file_statuses) > 1: # 只有多文件才在列表中更新
+            self.file_listbox.refresh_row(idx)
+        else:
+            self.label_hint.config(text=f"{file_info['icon']} {os.path.basename(file_info['path'])}")
+
+        progress = self.progress
+        if progress["paused_at"] is not None:
+            # 暂停后仍在运行的文件刚刚完成：暂停时间从现在起算，吞吐量不会因此虚高
+            progress["paused_at"] = time.monotonic()
+        progress["pending"].discard(idx)
+        progress["done"] += 1
+        progress["succeeded"] += success
+        progress["bytes"] += result.get("bytes_read", 0)
+        self._update_progress_label()
+
+    def _update_progress_label(self):
+        """显示 已完成/总数、文件/秒、字节/秒 和预计剩余时间"""
+        progress = self.progress
+        now = progress["paused_at"] or time.monotonic()
+        elapsed = max(now - progress["started"] - progress["paused_seconds"], 1e-6)
+        files_rate = progress["done"] / elapsed
+        bytes_rate = progress["bytes"] / elapsed
+        parts = [f"{progress['done']}/{progress['total']}",
+                 f"{files_rate:.1f} 个/秒", f"{self._format_bytes(bytes_rate)}/秒"]
+        if progress["done"]:
+            # 优先按剩余字节估算，大小差异大的文件也比较准确
+            if bytes_rate > 0 and progress["total_bytes"] > progress["bytes"]:
+                remaining = (progress["total_bytes"] - progress["bytes"]) / bytes_rate
             else:
-                # 多文件时，可以显示总数或第一个文件信息
-                self.label_hint.config(text=f"已导入 {len(self.file_statuses)} 个文件")
+                remaining = (progress["total"] - progress["done"]) / files_rate
+            parts.append(f"剩余约 {self._format_duration(remaining)}")
+        if progress["paused_at"] is not None:
+            parts.append("已暂停")
+        self.progress_label.config(text=" · ".join(parts))
+
+    @staticmethod
+    def _format_bytes(count):
+        for unit in ("B", "KB", "MB", "GB"):
+            if count < 1024 or unit == "GB":
+                return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+            count /= 1024
+
+    @staticmethod
+    def _format_duration(seconds):
+        seconds = int(seconds + 0.5)
+        if seconds < 60:
+            return f"{seconds} 秒"
+        if seconds < 3600:
+            return f"{seconds // 60} 分 {seconds % 60} 秒"
+        return f"{seconds // 3600} 小时 {seconds % 3600 // 60} 分"
+
+    def _on_unlock_error(self, message):
+        messagebox.showerror("解锁出错", message)
+
+    def _on_unlock_finished(self, cancelled):
+        """主线程：解锁线程结束（完成或取消）后收尾"""
+        self.unlocking = False
+        self.control_frame.pack_forget()
+        self.cancel_button.state(["!disabled"])
+        self.stop_current_animation() # 停止啄动画
+
+        progress = self.progress
+        for idx in progress["pending"]: # 取消后没有处理的文件
+            self.file_statuses[idx]["status"] = "已取消"
+        self._update_progress_label()
+
+        if cancelled:
+            self.result_label.config(text=f"已取消（完成 {progress['done']}/{progress['total']}）")
+        elif progress["succeeded"] == progress["total"]: # 所有文件都成功
+            self.show_success_animation()
+            self.result_label.config(text="解锁成功")
+        else: # 部分或全部失败
+            self.show_failure_animation()
+            self.result_label.config(text="解锁失败")
+        
+        # 如果是单文件，更新label_hint
+        if len(self.file_statuses) == 1:
+            file_info = self.file_statuses[0]
+            filename = os.path.basename(file_info["path"])
+            self.label_hint.config(text=f"{file_info['icon']} {filename}")
+        else:
+            # 多文件时，可以显示总数或第一个文件信息
+            self.label_hint.config(text=f"已导入 {len(self.file_statuses)} 个文件")
 
 
     def on_file_click(self, event):
@@ -648,6 +1059,10 @@ class CrackLeafApp:
         if idx < 0 or idx >= len(self.file_statuses):
             return
         self.current_drag_path = self.file_statuses[idx]['path']
+        # 记录第一次点击的顺序，解锁时优先处理
+        if not self.file_statuses[idx].get("clicked_at"):
+            self.click_count += 1
+            self.file_statuses[idx]["clicked_at"] = self.click_count
         # 这里不再通过点击Listbox条目来触发single_unlock
         # 单文件解锁现在只通过点击logo_label触发
         pass 
@@ -683,6 +1098,7 @@ class CrackLeafApp:
     # Removed single_unlock_button_clicked; now single file unlock is via logo_label click
 
 if __name__ == "__main__":
+    from tkinterdnd2 import TkinterDnD
     # 使用 TkinterDnD.Tk() 替代 tk.Tk()，以支持拖拽功能
     root = TkinterDnD.Tk()
     app = CrackLeafApp(root)
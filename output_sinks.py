@@ -0,0 +1,231 @@
+"""
+output_sinks.py
+
+Pluggable destinations for batch output.
+
+Workers always write to a plain file path, possibly in another process, so a sink hands
+out a *staging* path per file and, once the file's result comes back to the parent,
+either publishes it or throws it away:
+
+    with ZipSink("unlocked.zip") as sink:
+        for idx, result in iter_unlock(paths, sink=sink, max_workers=8):
+            ...
+
+DirectorySink writes each file to its own temp file next to the final name and renames
+it into place, so a reader never sees a half-written PDF. ZipSink and TarSink append each
+finished file to one archive as results arrive and delete the staged copy right away;
+files are streamed in chunks, so memory and staging disk use stay bounded by the files in
+flight, not the batch size.
+
+Sinks are not thread-safe: stage() and finish() must be called from one thread (the one
+consuming iter_unlock).
+"""
+
+import abc
+import itertools
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from pathlib import PurePath, PurePosixPath
+from typing import BinaryIO, Dict, Optional, Union
+
+from pdf_unlocker import UnlockResult
+
+# Numbers DirectorySink temp files, so no two stage() calls in this process share one
+_stage_numbers = itertools.count(1)
+
+
+def _unique_name(path: PurePath, taken: set[str]) -> str:
+    """Return ``path``, or with " (2)", " (3)"... added like a file manager if taken; marks it taken."""
+    candidate, n = str(path), 1
+    while candidate in taken:
+        n += 1
+        candidate = str(path.with_stem(f"{path.stem} ({n})"))
+    taken.add(candidate)
+    return candidate
+
+
+class OutputSink(abc.ABC):
+    """Interface shared by every sink; subclasses implement stage() and commit()."""
+
+    @abc.abstractmethod
+    def stage(self, name: str) -> str:
+        """Reserve ``name`` (a relative path) and return where the unlock should write it."""
+
+    @abc.abstractmethod
+    def commit(self, name: str, staged_path: str, result: UnlockResult) -> UnlockResult:
+        """Publish a successfully written file and return the result pointing at it."""
+
+    def discard(self, staged_path: str):
+        """Remove whatever a failed unlock left at ``staged_path``."""
+        try:
+            os.remove(staged_path)
+        except FileNotFoundError:
+            pass
+
+    def finish(self, name: str, staged_path: str, result: UnlockResult) -> UnlockResult:
+        """commit() on success, discard() otherwise."""
+        if result["success"]:
+            return self.commit(name, staged_path, result)
+        self.discard(staged_path)
+        return result
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DirectorySink(OutputSink):
+    """
+    Write under ``directory`` via a temp file in the same folder plus an atomic os.replace.
+
+    Every stage() gets its own temp file, and a name staged twice (e.g. ``x.pdf`` from two
+    input folders) gets " (2)", " (3)"... so no job overwrites another job's output. Files
+    left over from earlier runs are replaced.
+
+    Args:
+        directory (str): Output root; relative names may contain subdirectories.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self._taken: set[str] = set()
+        self._finals: Dict[str, str] = {}  # staged path -> final path
+
+    def stage(self, name: str) -> str:
+        final = _unique_name(PurePath(os.path.normpath(os.path.join(self.directory, name))), self._taken)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        staged_path = f"{final}.{os.getpid()}-{next(_stage_numbers)}.part"
+        self._finals[staged_path] = final
+        return staged_path
+
+    def commit(self, name: str, staged_path: str, result: UnlockResult) -> UnlockResult:
+        final = self._finals.pop(staged_path)
+        os.replace(staged_path, final)
+        return {**result, "output_path": final}
+
+    def discard(self, staged_path: str):
+        self._finals.pop(staged_path, None)
+        super().discard(staged_path)
+
+
+class _ArchiveSink(OutputSink):
+    """Shared staging and member naming for the archive sinks."""
+
+    def __init__(self, target: Union[str, BinaryIO], staging_dir: Optional[str] = None):
+        self.path = os.path.abspath(target) if isinstance(target, str) else None
+        self._members: set[str] = set()
+        self._counter = 0
+        # Open the archive first, so a target that cannot be opened leaves no staging dir behind
+        self._open(target)
+        try:
+            self._staging = tempfile.mkdtemp(prefix="crackleaf-", dir=staging_dir)
+        except BaseException:
+            self._close_archive()
+            raise
+
+    def _member_name(self, name: str) -> str:
+        # Archives want forward slashes; a repeated name gets " (2)", " (3)"...
+        return _unique_name(PurePosixPath(*os.path.normpath(name).split(os.sep)), self._members)
+
+    def stage(self, name: str) -> str:
+        self._counter += 1
+        return os.path.join(self._staging, f"{self._counter}.pdf")
+
+    def commit(self, name: str, staged_path: str, result: UnlockResult) -> UnlockResult:
+        member = self._member_name(name)
+        try:
+            self._add(staged_path, member)
+        finally:
+            self.discard(staged_path)
+        return {**result, "output_path": self.path, "archive_member": member}
+
+    @abc.abstractmethod
+    def _open(self, target: Union[str, BinaryIO]):
+        """Open the archive for writing."""
+
+    @abc.abstractmethod
+    def _add(self, staged_path: str, member: str):
+        """Append the staged file to the archive as ``member``."""
+
+    @abc.abstractmethod
+    def _close_archive(self):
+        """Finish and close the archive."""
+
+    def close(self):
+        try:
+            self._close_archive()
+        finally:
+            shutil.rmtree(self._staging, ignore_errors=True)
+
+
+class ZipSink(_ArchiveSink):
+    """
+    Stream finished files into one ZIP archive.
+
+    Args:
+        target (Union[str, BinaryIO]): Archive path, or a writable (even unseekable) stream.
+        compression (int): zipfile constant; ZIP_STORED by default since PDFs are compressed already.
+        staging_dir (Optional[str]): Where workers write before files are archived.
+    """
+
+    def __init__(self, target: Union[str, BinaryIO], compression: int = zipfile.ZIP_STORED,
+                 staging_dir: Optional[str] = None):
+        self.compression = compression
+        super().__init__(target, staging_dir)
+
+    def _open(self, target: Union[str, BinaryIO]):
+        self._zip = zipfile.ZipFile(target, "w", compression=self.compression, allowZip64=True)
+
+    def _add(self, staged_path: str, member: str):
+        self._zip.write(staged_path, arcname=member)
+
+    def _close_archive(self):
+        self._zip.close()
+
+
+class TarSink(_ArchiveSink):
+    """
+    Stream finished files into one tar archive.
+
+    Args:
+        target (Union[str, BinaryIO]): Archive path, or a writable stream (written in stream mode).
+        compression (str): "" for plain tar, or "gz", "bz2", "xz".
+        staging_dir (Optional[str]): Where workers write before files are archived.
+    """
+
+    def __init__(self, target: Union[str, BinaryIO], compression: str = "",
+                 staging_dir: Optional[str] = None):
+        self.compression = compression
+        super().__init__(target, staging_dir)
+
+    def _open(self, target: Union[str, BinaryIO]):
+        if isinstance(target, str):
+            self._tar = tarfile.open(target, f"w:{self.compression}")
+        else:
+            self._tar = tarfile.open(fileobj=target, mode=f"w|{self.compression}")
+
+    def _add(self, staged_path: str, member: str):
+        self._tar.add(staged_path, arcname=member)
+
+    def _close_archive(self):
+        self._tar.close()
+
+
+def open_sink(target: str, **options) -> OutputSink:
+    """Pick a sink from the target name: .zip, .tar[.gz|.bz2|.xz]/.tgz, or a directory."""
+    lowered = target.lower()
+    if lowered.endswith(".zip"):
+        return ZipSink(target, **options)
+    for suffix, compression in ((".tar", ""), (".tar.gz", "gz"), (".tgz", "gz"),
+                                (".tar.bz2", "bz2"), (".tar.xz", "xz")):
+        if lowered.endswith(suffix):
+            return TarSink(target, compression, **options)
+    return DirectorySink(target)
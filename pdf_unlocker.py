@@ -3,15 +3,34 @@ pdf_unlocker.py
 
 Provides a unified interface for unlocking password-protected PDF files
 using PikePDF (structural removal) or PyPDF2 (page reconstruction).
+
+Both libraries are imported on first use, so importing this module (for probing,
+the cache, the CLI's argument parsing or the GUI's first paint) stays cheap;
+call preload_backends() to pay that cost up front, e.g. from a background thread.
 """
 
-import pikepdf
-from pikepdf import PasswordError as PikePasswordError
-from PyPDF2 import PdfReader, PdfWriter
-from PyPDF2.errors import DependencyError as PyPDF2DependencyError
-from typing import Optional, TypedDict
+from typing import Optional, TypedDict, NamedTuple
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, List, Iterator, Sequence, Union
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import fnmatch
+import hashlib
+import io
+import json
+import mmap
+import os
+import signal
+import sys
+import threading
+import time
+import zlib
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 import logging
 logger = logging.getLogger("crackleaf")
 logging.basicConfig(level=logging.INFO)
@@ -19,121 +38,686 @@ logging.basicConfig(level=logging.INFO)
 
 class WrongPasswordError(Exception): pass
 
-class UnlockResult(TypedDict):
+class _UnlockResultBase(TypedDict):
     success: bool
     message: str
     method: str
     output_path: Optional[str]
 
+class UnlockResult(_UnlockResultBase, total=False):
+    bytes_read: int  # bytes actually read from the input file
+    profile: str  # save profile used by PikePDF
+    save_seconds: float  # wall time spent writing the output
+    output_size: int  # size of the written output in bytes
+    error_kind: str  # ERROR_* classification of the failure
+    cache_hit: bool  # output came from a ResultCache without opening the PDF
+    archive_member: str  # name inside the archive when written through a ZipSink/TarSink
+    large_file: bool  # input was memory-mapped instead of read (see LARGE_FILE_BYTES)
+    status: str  # STATUS_* outcome, set when run in an isolated worker (timeout, memory cap...)
+    metrics: "UnlockMetrics"  # only present when unlock_pdf(..., instrument=True)
+
+class PhaseTiming(TypedDict):
+    wall_seconds: float
+    cpu_seconds: float  # CPU time of the calling thread
+
+class UnlockMetrics(TypedDict):
+    phases: dict[str, PhaseTiming]  # e.g. "read", "pikepdf.open", "pikepdf.save", "pypdf2.rebuild"
+    input_bytes: int
+    output_bytes: int
+    peak_rss_bytes: Optional[int]  # high-water mark of this process, None where unsupported
+    strategies_tried: List[str]
+
+# --- Output save profiles for PikePDF (keyword arguments for pikepdf.Pdf.save) ---
+# Enum options are given by member name and resolved in _save_options(), so the profiles
+# can be listed and validated without importing pikepdf.
+SAVE_PROFILES = {
+    # qpdf defaults, the historical behaviour
+    "default": {},
+    # Copy streams as they are: no decoding, no recompression, object streams untouched
+    "fast": {
+        "compress_streams": False,
+        "stream_decode_level": "none",
+        "object_stream_mode": "preserve",
+        "recompress_flate": False,
+        "fix_metadata_version": False,
+    },
+    # Smallest output: pack objects into object streams and recompress every Flate stream
+    "compact": {
+        "compress_streams": True,
+        "stream_decode_level": "generalized",
+        "object_stream_mode": "generate",
+        "recompress_flate": True,
+    },
+    # Linearized ("fast web view") output for page-at-a-time delivery
+    "linearized": {
+        "linearize": True,
+    },
+}
+
+_SAVE_ENUMS = {"stream_decode_level": "StreamDecodeLevel", "object_stream_mode": "ObjectStreamMode"}
+
+def _save_options(profile: str) -> dict:
+    """Keyword arguments for pikepdf.Pdf.save for ``profile``, with enum names resolved."""
+    import pikepdf
+    options = dict(SAVE_PROFILES[profile])
+    for key, enum_name in _SAVE_ENUMS.items():
+        if key in options:
+            options[key] = getattr(getattr(pikepdf, enum_name), options[key])
+    return options
+
+# --- Lazy backends ---
+def preload_backends():
+    """Import pikepdf and PyPDF2 now instead of on the first unlock."""
+    import pikepdf  # noqa: F401
+    import PyPDF2  # noqa: F401
+
+def _loaded_types(module_name: str, *names: str) -> tuple:
+    """
+    Exception classes from ``module_name`` if it has been imported, else an empty tuple.
+
+    An exception can only come from a library that was imported, so isinstance checks
+    against these never force an import.
+    """
+    module = sys.modules.get(module_name)
+    return tuple(getattr(module, name) for name in names) if module is not None else ()
+
+@contextmanager
+def _phase(metrics: Optional[dict], name: str):
+    """Add the wall and thread CPU time of the block to ``metrics["phases"][name]``."""
+    if metrics is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        timing = metrics.setdefault("phases", {}).setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+        timing["wall_seconds"] += time.perf_counter() - wall
+        timing["cpu_seconds"] += time.thread_time() - cpu
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process in bytes, or None where it is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class _SourceBuffer(io.BytesIO):
+    """BytesIO view of a loaded input that still names the original file in library errors."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+def _open_source(input_path: str, source: Optional[bytes]):
+    """Return a fresh stream over the shared input buffer, or the path when none was loaded."""
+    if source is None or _is_mapped(source):
+        return input_path  # a BytesIO over a mapping would copy the whole file
+    return _SourceBuffer(source, input_path)
+
+# --- Large-file mode ---
+# Inputs at least this big are memory-mapped instead of read into memory, and batches run
+# them in their own low-concurrency lane (see iter_unlock)
+LARGE_FILE_BYTES = 256 << 20
+# PyPDF2 keeps every page's object graph alive while it rebuilds: rough peak per input byte
+_PYPDF2_MEMORY_FACTOR = 4
+
+def _is_mapped(source) -> bool:
+    return isinstance(source, mmap.mmap)
+
+def _source_reader(source) -> BinaryIO:
+    """Seekable reader over the loaded input; a mapping is read in place rather than copied."""
+    if _is_mapped(source):
+        source.seek(0)
+        return source
+    return io.BytesIO(source)
+
+def _map_input(f) -> mmap.mmap:
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _pypdf2_memory_estimate(size: int) -> int:
+    return size * _PYPDF2_MEMORY_FACTOR
+
+# --- Failure classification: decides whether another strategy is worth trying ---
+ERROR_PASSWORD = "password"                # wrong or missing password
+ERROR_NOT_PDF = "not_pdf"                  # no header/trailer at all, nothing to recover
+ERROR_TRUNCATED = "truncated"              # file cut short; qpdf already tried to reconstruct it
+ERROR_DAMAGED = "damaged"                  # structural damage another parser may tolerate
+ERROR_UNSUPPORTED = "unsupported_encryption"
+ERROR_DEPENDENCY = "missing_dependency"    # e.g. PyPDF2 without PyCryptodome for AES
+ERROR_IO = "io"                            # cannot read input or write output
+ERROR_RESOURCE = "resource"                # out of memory (or over an isolated worker's memory cap)
+ERROR_TIMEOUT = "timeout"                  # isolated worker killed after its wall-clock timeout
+ERROR_UNKNOWN = "unknown"
+
+# Outcome of an isolated run (UnlockResult["status"], see isolated_unlocker.py)
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"                   # the unlock itself failed, see error_kind
+STATUS_TIMEOUT = "timeout"
+STATUS_MEMORY_LIMIT = "memory_limit"
+STATUS_CRASHED = "crashed"                 # worker process died without answering
+
+# Only these failures leave a realistic chance for the next strategy
+_RECOVERABLE_ERRORS = {ERROR_DAMAGED, ERROR_UNKNOWN}
+
+def classify_error(error: BaseException) -> str:
+    """
+    Map an exception raised while unlocking to one of the ``ERROR_*`` kinds.
+
+    Args:
+        error (BaseException): The exception raised by a strategy.
+
+    Returns:
+        str: The failure kind.
+    """
+    if isinstance(error, (WrongPasswordError, *_loaded_types("pikepdf", "PasswordError"))):
+        return ERROR_PASSWORD
+    if isinstance(error, (ImportError, *_loaded_types("PyPDF2.errors", "DependencyError"))):
+        return ERROR_DEPENDENCY
+    if isinstance(error, MemoryError):
+        return ERROR_RESOURCE
+    if isinstance(error, OSError):
+        return ERROR_IO
+    if isinstance(error, NotImplementedError):
+        return ERROR_UNSUPPORTED
+
+    text = str(error).lower()
+    if "unsupported encryption" in text or "security handler" in text or "unsupported" in text and "encrypt" in text:
+        return ERROR_UNSUPPORTED
+    if "pycryptodome" in text or "cryptography" in text:
+        return ERROR_DEPENDENCY
+    if "unable to find trailer" in text or "not a pdf" in text or "can't find pdf header" in text:
+        return ERROR_NOT_PDF
+    if "eof marker not found" in text or "unexpected eof" in text or "premature end" in text:
+        return ERROR_TRUNCATED
+    if isinstance(error, _loaded_types("pikepdf", "PdfError", "DataDecodingError")) or "damaged" in text or "xref" in text:
+        return ERROR_DAMAGED
+    return ERROR_UNKNOWN
+
+def _pypdf2_has_aes() -> bool:
+    try:
+        import Crypto.Cipher.AES  # noqa: F401  PyPDF2 3.x only uses PyCryptodome for AES
+    except ImportError:
+        return False
+    return True
+
+def _document_family(source: bytes) -> str:
+    """Group documents by security handler, used to keep per-family strategy statistics."""
+    try:
+        probe = _probe_stream(_source_reader(source), check_password=False)
+    except Exception:  # includes RecursionError; statistics must never decide whether an unlock succeeds
+        return "unparsable"
+    if not probe["encrypted"]:
+        return "plain"
+    return f"{probe['algorithm']}/R{probe['revision']}"
+
+# --- Per-process strategy statistics (used by the adaptive mode) ---
+ADAPTIVE_MIN_SAMPLES = 5
+
+_stats_lock = threading.Lock()
+_strategy_stats: dict[str, dict] = {}
+_family_stats: dict[tuple[str, str], list[int]] = {}  # (family, strategy) -> [successes, failures]
+
+def _record_attempt(strategy: str, family: str, success: bool, kind: Optional[str], seconds: float):
+    with _stats_lock:
+        stats = _strategy_stats.setdefault(strategy, {
+            "attempts": 0, "successes": 0, "total_seconds": 0.0, "max_seconds": 0.0, "failures": {}
+        })
+        stats["attempts"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if success:
+            stats["successes"] += 1
+        else:
+            stats["failures"][kind] = stats["failures"].get(kind, 0) + 1
+        # Password failures say nothing about whether the strategy suits this family
+        if kind != ERROR_PASSWORD:
+            counts = _family_stats.setdefault((family, strategy), [0, 0])
+            counts[0 if success else 1] += 1
+
+def get_strategy_stats() -> dict[str, dict]:
+    """
+    Return a snapshot of per-strategy statistics collected in this process.
+
+    Returns:
+        dict[str, dict]: For each strategy: attempts, successes, failures by kind,
+        total/mean/max latency in seconds, and success counts per document family.
+    """
+    with _stats_lock:
+        snapshot = {}
+        for strategy, stats in _strategy_stats.items():
+            entry = dict(stats, failures=dict(stats["failures"]))
+            entry["mean_seconds"] = stats["total_seconds"] / stats["attempts"]
+            entry["families"] = {
+                family: {"successes": counts[0], "failures": counts[1]}
+                for (family, name), counts in _family_stats.items() if name == strategy
+            }
+            snapshot[strategy] = entry
+        return snapshot
+
+def reset_strategy_stats():
+    """Forget all collected strategy statistics."""
+    with _stats_lock:
+        _strategy_stats.clear()
+        _family_stats.clear()
+
+def _strategy_order(family: str) -> List[str]:
+    """
+    Order strategies for a document family by observed success rate.
+
+    A strategy that has never succeeded on this family after ADAPTIVE_MIN_SAMPLES attempts is
+    dropped, as long as another strategy has succeeded on it.
+    """
+    with _stats_lock:
+        counts = {name: list(_family_stats.get((family, name), (0, 0))) for name in _STRATEGIES}
+
+    def success_rate(name: str) -> float:
+        successes, failures = counts[name]
+        return successes / (successes + failures) if successes + failures else 0.5
+
+    order = sorted(_STRATEGIES, key=success_rate, reverse=True)  # stable: PikePDF wins ties
+    if any(counts[name][0] for name in order):
+        order = [
+            name for name in order
+            if counts[name][0] or sum(counts[name]) < ADAPTIVE_MIN_SAMPLES
+        ]
+    return order
+
 # --- Strategy 1: Use PikePDF for high-fidelity structural unlocking ---
-def _unlock_with_pikepdf(input_path: str, output_path: str, password: str) -> tuple[bool, str]:
+def _unlock_with_pikepdf(input_path: str, output_path: Union[str, BinaryIO], password: str,
+                         source: Optional[bytes] = None, profile: str = "default",
+                         metrics: Optional[dict] = None) -> tuple[bool, str, Optional[str]]:
     """
     Attempt to unlock a PDF using PikePDF by structurally removing encryption.
 
     Args:
-        input_path (str): Path to the encrypted PDF.
-        output_path (str): Destination for the unlocked PDF.
+        input_path (str): Path to the encrypted PDF (only used for messages when ``source`` is given).
+        output_path (Union[str, BinaryIO]): Destination path or writable binary stream.
         password (str): Password for decryption.
+        source (Optional[bytes]): Already-loaded file contents; read from input_path if None.
+        profile (str): Name of the SAVE_PROFILES entry used to write the output.
+        metrics (Optional[dict]): Receives per-phase timings under ``phases`` when given.
 
     Returns:
-        tuple[bool, str]: (success status, message)
+        tuple[bool, str, Optional[str]]: (success status, message, failure kind or None)
     """
     try:
+        with _phase(metrics, "pikepdf.import"):
+            import pikepdf
         # Attempt to open and save PDF without the encryption dictionary
-        with pikepdf.open(input_path, password=password) as pdf:
-            pdf.save(output_path)
-        return True, "成功：已通过高保真模式移除限制。"
-    except PikePasswordError:
-        raise
+        # A mapped input is reopened by path with qpdf's own mmap access: pages are read on demand
+        access = pikepdf.AccessMode.mmap if _is_mapped(source) else pikepdf.AccessMode.default
+        with _phase(metrics, "pikepdf.open"):
+            pdf = pikepdf.open(_open_source(input_path, source), password=password, access_mode=access)
+        with pdf, _phase(metrics, "pikepdf.save"):
+            pdf.save(output_path, **_save_options(profile))
+        return True, "成功：已通过高保真模式移除限制。", None
     except Exception as e:
-        logger.error(f"[PikePDF] 解密失败 ({input_path})，准备尝试备用方法。错误类型: {type(e).__name__}, 错误: {e}", exc_info=True)
-        return False, f"PikePDF 失败: {e}"
+        if isinstance(e, _loaded_types("pikepdf", "PasswordError")):
+            raise WrongPasswordError(str(e)) from e
+        kind = classify_error(e)
+        logger.error(f"[PikePDF] 解密失败 ({input_path})，错误分类: {kind}。错误类型: {type(e).__name__}, 错误: {e}", exc_info=True)
+        return False, f"PikePDF 失败: {e}", kind
 
 # --- Strategy 2: Use PyPDF2 for fallback page-level reconstruction ---
-def _unlock_with_pypdf2(input_path: str, output_path: str, password: str) -> tuple[bool, str]:
+def _unlock_with_pypdf2(input_path: str, output_path: Union[str, BinaryIO], password: str,
+                        source: Optional[bytes] = None, profile: str = "default",
+                        metrics: Optional[dict] = None) -> tuple[bool, str, Optional[str]]:
     """
     Attempt to unlock a PDF using PyPDF2 by reconstructing the content.
 
     Args:
-        input_path (str): Path to the encrypted PDF.
-        output_path (str): Destination for the rebuilt PDF.
+        input_path (str): Path to the encrypted PDF (only used for messages when ``source`` is given).
+        output_path (Union[str, BinaryIO]): Destination path or writable binary stream.
         password (str): Password for decryption.
+        source (Optional[bytes]): Already-loaded file contents; read from input_path if None.
+        profile (str): Accepted for interface parity; PyPDF2 always rebuilds the document.
+        metrics (Optional[dict]): Receives per-phase timings under ``phases`` when given.
 
     Returns:
-        tuple[bool, str]: (success status, message)
+        tuple[bool, str, Optional[str]]: (success status, message, failure kind or None)
     """
     try:
-        reader = PdfReader(input_path)
+        with _phase(metrics, "pypdf2.import"):
+            from PyPDF2 import PdfReader, PdfWriter
+        with _phase(metrics, "pypdf2.open"):
+            reader = PdfReader(_open_source(input_path, source))
         if reader.is_encrypted:
-            if not reader.decrypt(password):
-                raise WrongPasswordError("密码错误")
+            with _phase(metrics, "pypdf2.decrypt"):
+                if not reader.decrypt(password):
+                    raise WrongPasswordError("密码错误")
 
         # Rebuild document without encryption
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
+        with _phase(metrics, "pypdf2.rebuild"):
+            writer = PdfWriter()
+            for page in reader.pages:
+                writer.add_page(page)
 
-        with open(output_path, "wb") as f:
-            writer.write(f)
+        with _phase(metrics, "pypdf2.save"):
+            if isinstance(output_path, str):
+                with open(output_path, "wb") as f:
+                    writer.write(f)
+            else:
+                writer.write(output_path)
         
-        return True, "成功：已通过备用模式移除限制（书签等可能丢失）。"
+        return True, "成功：已通过备用模式移除限制（书签等可能丢失）。", None
     except WrongPasswordError as e:
         raise
     except Exception as e:
-        logger.error(f"[PyPDF2] 备用解密失败 ({input_path})。错误类型: {type(e).__name__}, 错误: {e}", exc_info=True)
-        return False, f"PyPDF2 失败: {e}"
+        kind = classify_error(e)
+        logger.error(f"[PyPDF2] 备用解密失败 ({input_path})，错误分类: {kind}。错误类型: {type(e).__name__}, 错误: {e}", exc_info=True)
+        return False, f"PyPDF2 失败: {e}", kind
+
+# Strategy registry: name -> (implementation, method label reported in UnlockResult)
+_STRATEGIES = {
+    "pikepdf": (_unlock_with_pikepdf, "PikePDF (高保真)"),
+    "pypdf2": (_unlock_with_pypdf2, "PyPDF2 (备用)"),
+}
 
 # --- Unified unlocking interface exposed to external callers ---
-def unlock_pdf(input_path: str, output_path: str, password: str = '') -> UnlockResult:
+def unlock_pdf(input_path: str, output_path: str, password: str = '', adaptive: bool = False,
+               profile: str = "default", instrument: bool = False, cache=None,
+               keyring: Optional["Keyring"] = None, large_file_bytes: Optional[int] = LARGE_FILE_BYTES,
+               memory_budget: Optional[int] = None) -> UnlockResult:
     """
     Attempt to unlock a PDF using PikePDF (preferred) or PyPDF2 (fallback).
     Returns a dictionary describing the outcome.
+
+    The fallback only runs when the first failure is one it could plausibly fix (see
+    classify_error). With ``adaptive=True`` strategies are reordered, or skipped, for the
+    document's family based on the statistics collected in this process.
+
+    ``profile`` selects how PikePDF writes the output (see SAVE_PROFILES); the result
+    reports the profile, the save time and the output size. With ``instrument=True`` the
+    result also carries an UnlockMetrics dict under ``metrics``.
+
+    ``cache`` is an optional result_cache.ResultCache: an input seen before (same content,
+    password and profile) is served from it without opening the PDF.
+
+    ``keyring`` is an optional Keyring: its candidates are checked against the /Encrypt
+    dictionary first and the accepted one is used, ``password`` being one of them. A
+    winning non-empty password is remembered for later files from the same folder.
+
+    Inputs of at least ``large_file_bytes`` (None: never), or bigger than ``memory_budget``,
+    are memory-mapped rather than read, and PikePDF opens them with mmap access. With a
+    ``memory_budget`` (bytes per file) the PyPDF2 fallback, which holds the whole rebuilt
+    document in memory, is skipped when its estimated peak would exceed the budget.
+    """
+    if profile not in SAVE_PROFILES:
+        raise ValueError(f"未知的保存配置: {profile}（可选: {', '.join(SAVE_PROFILES)}）")
+    metrics: dict = {"phases": {}, "strategies_tried": []}
+    result = _unlock_pdf_measured(input_path, output_path, password, adaptive, profile, metrics,
+                                  cache, keyring, large_file_bytes, memory_budget)
+    return _attach_metrics(result, metrics, instrument)
+
+def unlock_stream(source: Union[bytes, BinaryIO], output: BinaryIO, password: str = '',
+                  adaptive: bool = False, profile: str = "default", instrument: bool = False,
+                  keyring: Optional["Keyring"] = None, name: str = "<stream>",
+                  memory_budget: Optional[int] = None) -> UnlockResult:
     """
+    Unlock a PDF held in memory, writing the unlocked document to a binary stream.
+
+    Same strategies, fallback rules and UnlockResult as unlock_pdf, but nothing touches the
+    filesystem: ``source`` is bytes or a readable binary stream, and ``output`` only ever
+    receives the output of the strategy that succeeded. ``output_path`` in the result is None.
+
+    Args:
+        source (Union[bytes, BinaryIO]): The encrypted PDF, or a stream to read it from.
+        output (BinaryIO): Writable binary stream for the unlocked PDF.
+        password (str): Password to open the document.
+        adaptive (bool): See unlock_pdf.
+        profile (str): PikePDF save profile, see SAVE_PROFILES.
+        instrument (bool): Attach per-phase UnlockMetrics under ``metrics``.
+        keyring (Optional[Keyring]): Candidate passwords checked before ``password``.
+        name (str): How the document is named in log messages and keyring patterns.
+        memory_budget (Optional[int]): Per-file memory budget in bytes, see unlock_pdf.
+
+    Returns:
+        UnlockResult: Outcome, with ``output_size`` the number of bytes written to ``output``.
+    """
+    if profile not in SAVE_PROFILES:
+        raise ValueError(f"未知的保存配置: {profile}（可选: {', '.join(SAVE_PROFILES)}）")
+    metrics: dict = {"phases": {}, "strategies_tried": []}
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        try:
+            with _phase(metrics, "read"):
+                source = source.read()
+        except OSError as e:
+            logger.error(f"[Unlocker] 无法读取 '{name}': {e}")
+            result = _failure_result(f"无法读取输入: {e}", ERROR_IO)
+            result["bytes_read"] = 0
+            return _attach_metrics(result, metrics, instrument)
+    result = _unlock_source(name, bytes(source), output, password, adaptive, profile, metrics,
+                            keyring=keyring, memory_budget=memory_budget)
+    return _attach_metrics(result, metrics, instrument)
+
+def unlock_bytes(data: bytes, password: str = '', **options) -> tuple[Optional[bytes], UnlockResult]:
+    """
+    Unlock a PDF entirely in memory.
+
+    Args:
+        data (bytes): The encrypted PDF.
+        password (str): Password to open the document.
+        **options: Any other unlock_stream keyword (adaptive, profile, instrument, keyring, name,
+            memory_budget).
+
+    Returns:
+        tuple[Optional[bytes], UnlockResult]: The unlocked PDF (None on failure) and the outcome.
+    """
+    output = io.BytesIO()
+    result = unlock_stream(data, output, password, **options)
+    return (output.getvalue() if result["success"] else None), result
+
+def _attach_metrics(result: UnlockResult, metrics: dict, instrument: bool) -> UnlockResult:
+    if instrument:
+        result["metrics"] = {
+            "phases": metrics["phases"],
+            "input_bytes": result.get("bytes_read", 0),
+            "output_bytes": result.get("output_size", 0),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "strategies_tried": metrics["strategies_tried"],
+        }
+    return result
+
+def _cache_lookup(cache, input_path: str, password: str, profile: str, output_path: str,
+                  source: Optional[bytes] = None) -> Optional[UnlockResult]:
+    try:
+        return cache.lookup(input_path, password, profile, output_path, source)
+    except Exception as e:
+        # A broken cache must never fail the unlock itself
+        logger.warning(f"[Cache] 查询缓存失败，忽略缓存: {type(e).__name__}: {e}")
+        return None
+
+def _cache_store(cache, input_path: str, password: str, profile: str, result: UnlockResult, source: bytes):
+    try:
+        cache.store(input_path, password, profile, result, source)
+    except Exception as e:
+        logger.warning(f"[Cache] 写入缓存失败: {type(e).__name__}: {e}")
+
+def _unlock_pdf_measured(input_path: str, output_path: str, password: str, adaptive: bool,
+                         profile: str, metrics: dict, cache=None, keyring=None,
+                         large_file_bytes: Optional[int] = LARGE_FILE_BYTES,
+                         memory_budget: Optional[int] = None) -> UnlockResult:
+    """Body of unlock_pdf; records phase timings and attempted strategies into ``metrics``."""
     if not output_path:
         return {
             "success": False,
             "message": "未指定输出路径。",
             "method": "失败",
-            "output_path": None
+            "output_path": None,
+            "error_kind": ERROR_IO
         }
+    if cache is not None and keyring is None:
+        # Fast path: unchanged (path, size, mtime) seen before, nothing is read
+        with _phase(metrics, "cache"):
+            hit = _cache_lookup(cache, input_path, password, profile, output_path)
+        if hit is not None:
+            return hit
     try:
-        # Preferred method: PikePDF for high-fidelity unlocking
-        success, message = _unlock_with_pikepdf(input_path, output_path, password)
-        if success:
-            return {
-                "success": True,
-                "message": message,
-                "method": "PikePDF (高保真)",
-                "output_path": output_path
-            }
+        # Read the input once; both strategies parse from the same buffer. Large inputs are
+        # mapped instead, so only the pages actually touched become resident
+        with _phase(metrics, "read"), open(input_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            mapped = size > 0 and ((large_file_bytes is not None and size >= large_file_bytes)
+                                   or (memory_budget is not None and size > memory_budget))
+            source = _map_input(f) if mapped else f.read()
+    except (OSError, ValueError) as e:
+        logger.error(f"[Unlocker] 无法读取 '{input_path}': {e}")
+        return {
+            "success": False,
+            "message": f"无法读取输入文件: {e}",
+            "method": "失败",
+            "output_path": None,
+            "bytes_read": 0,
+            "error_kind": ERROR_IO
+        }
+    try:
+        return _unlock_source(input_path, source, output_path, password, adaptive, profile, metrics,
+                              cache, keyring, memory_budget)
+    finally:
+        if mapped:
+            source.close()
 
-        # If PikePDF fails (non-password), fallback to PyPDF2
-        logger.info(f"[Unlocker] '{input_path}' 的高保真解密失败，尝试备用方法...")
-        success, message = _unlock_with_pypdf2(input_path, output_path, password)
-        if success:
+def _discard_partial(target: Union[str, BinaryIO], start: int):
+    """Drop whatever a failed strategy wrote to a stream (a path is simply overwritten next time)."""
+    if not isinstance(target, str):
+        target.seek(start)
+        target.truncate()
+
+def _unlock_source(input_path: str, source: bytes, output: Union[str, BinaryIO], password: str,
+                   adaptive: bool, profile: str, metrics: dict, cache=None, keyring=None,
+                   memory_budget: Optional[int] = None) -> UnlockResult:
+    """
+    Run the strategies over already-loaded bytes, writing to a path or a binary stream.
+
+    ``input_path`` only names the document in messages, patterns and the cache. A stream
+    output only ever receives the successful strategy's output: an empty seekable stream is
+    written directly and truncated after a failed attempt, anything else from a buffer.
+    ``source`` may also be a read-only mmap of the input file (large-file mode).
+    """
+    to_path = isinstance(output, str)
+    cache = cache if to_path else None
+    if keyring is not None:
+        with _phase(metrics, "keyring"):
+            resolved = keyring.resolve(input_path, source, password)
+        if resolved is None:
+            msg = "钥匙串中没有能打开此文件的密码。"
+            logger.warning(f"[Unlocker] '{input_path}' 解密失败: {msg}")
             return {
-                "success": True,
-                "message": message,
-                "method": "PyPDF2 (备用)",
-                "output_path": output_path
+                "success": False,
+                "message": msg,
+                "method": "失败",
+                "output_path": None,
+                "bytes_read": len(source),
+                "error_kind": ERROR_PASSWORD
             }
+        password = resolved
+
+    if cache is not None:
+        with _phase(metrics, "cache"):
+            hit = _cache_lookup(cache, input_path, password, profile, output, source)
+        if hit is not None:
+            return hit
+
+    try:
+        with _phase(metrics, "probe"):
+            family = _document_family(source)
+        strategies = _strategy_order(family) if adaptive else list(_STRATEGIES)
+        over_budget = (memory_budget is not None and "pypdf2" in strategies
+                       and _pypdf2_memory_estimate(len(source)) > memory_budget)
+        if over_budget:
+            strategies.remove("pypdf2")
+            logger.info(f"[Unlocker] '{input_path}' 的 PyPDF2 重建预计超出内存预算 "
+                        f"({memory_budget >> 20} MB)，只尝试 PikePDF。")
+        message = ""
+        kind = ERROR_UNKNOWN
+        for position, name in enumerate(strategies):
+            unlock_func, method = _STRATEGIES[name]
+            metrics["strategies_tried"].append(name)
+            if to_path:
+                target, start = output, 0
+            elif output.seekable() and output.tell() == 0:
+                # qpdf writes from offset 0 whatever the stream position, so only empty streams are direct
+                target, start = output, 0
+            else:
+                target, start = io.BytesIO(), 0
+            started = time.perf_counter()
+            try:
+                success, message, kind = unlock_func(input_path, target, password, source,
+                                                     profile, metrics)
+            except WrongPasswordError:
+                _record_attempt(name, family, False, ERROR_PASSWORD, time.perf_counter() - started)
+                _discard_partial(target, start)
+                raise
+            _record_attempt(name, family, success, kind, time.perf_counter() - started)
+            if success:
+                if to_path:
+                    output_size = os.path.getsize(output)
+                else:
+                    output_size = target.tell() - start
+                    if target is not output:
+                        output.write(target.getbuffer())
+                result: UnlockResult = {
+                    "success": True,
+                    "message": message,
+                    "method": method,
+                    "output_path": output if to_path else None,
+                    "bytes_read": len(source),
+                    "profile": profile,
+                    "save_seconds": metrics["phases"].get(f"{name}.save", {}).get("wall_seconds", 0.0),
+                    "output_size": output_size
+                }
+                if _is_mapped(source):
+                    result["large_file"] = True
+                if cache is not None:
+                    with _phase(metrics, "cache"):
+                        _cache_store(cache, input_path, password, profile, result, source)
+                if keyring is not None and password:
+                    keyring.remember(input_path, password)
+                return result
 
-        # Both strategies failed
+            _discard_partial(target, start)
+            remaining = strategies[position + 1:]
+            if not remaining:
+                break
+            if kind not in _RECOVERABLE_ERRORS:
+                logger.info(f"[Unlocker] '{input_path}' 的失败类型为 {kind}，备用方法无法处理，跳过。")
+                message = f"{message}（{kind}，已跳过备用方法）"
+                break
+            if remaining[0] == "pypdf2" and family.startswith("AES") and not _pypdf2_has_aes():
+                logger.info(f"[Unlocker] '{input_path}' 使用 AES 加密，但未安装 PyCryptodome，跳过 PyPDF2。")
+                message = f"{message}（PyPDF2 需要 PyCryptodome 才能处理 AES，已跳过）"
+                break
+            # If the preferred method fails (non-password), fall back to the next one on the same buffer
+            logger.info(f"[Unlocker] '{input_path}' 使用 {method} 解密失败，尝试备用方法...")
+
+        # Every strategy failed or was skipped
+        if over_budget and kind in _RECOVERABLE_ERRORS:
+            message = f"{message}（PyPDF2 超出内存预算，已跳过）"
+            kind = ERROR_RESOURCE
         return {
             "success": False,
             "message": f"所有解密方法均失败。最后错误: {message}",
             "method": "失败",
-            "output_path": None
+            "output_path": None,
+            "bytes_read": len(source),
+            "error_kind": kind
         }
 
-    except (PikePasswordError, WrongPasswordError):
+    except WrongPasswordError:
         msg = "密码错误或缺失。需要提供正确的密码才能打开此文件。"
         logger.warning(f"[Unlocker] '{input_path}' 解密失败: {msg}")
         return {
             "success": False,
             "message": msg,
             "method": "失败",
-            "output_path": None
+            "output_path": None,
+            "bytes_read": len(source),
+            "error_kind": ERROR_PASSWORD
         }
     except Exception as e:
         logger.error(f"[Unlocker] '{input_path}' 解密过程中发生未知顶层错误: {type(e).__name__}: {e}", exc_info=True)
@@ -141,23 +725,1225 @@ def unlock_pdf(input_path: str, output_path: str, password: str = '') -> UnlockR
             "success": False,
             "message": f"发生未知错误: {e}",
             "method": "失败",
-            "output_path": None
+            "output_path": None,
+            "bytes_read": len(source),
+            "error_kind": classify_error(e)
+        }
+
+# --- Batch metrics aggregation for dashboards ---
+class MetricsAggregator:
+    """
+    Accumulates UnlockResults (ideally produced with ``instrument=True``) into batch totals
+    and renders them as Prometheus text exposition format or JSON lines.
+    """
+
+    PREFIX = "crackleaf"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = {"success": 0, "failure": 0}
+        self.failures_by_kind: dict[str, int] = {}
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.phase_wall: dict[str, float] = {}
+        self.phase_cpu: dict[str, float] = {}
+        self.strategy_attempts: dict[str, int] = {}
+        self.peak_rss_bytes = 0
+
+    def add(self, result: UnlockResult):
+        """Fold one result into the totals. Thread-safe."""
+        metrics = result.get("metrics")
+        with self._lock:
+            self.files["success" if result["success"] else "failure"] += 1
+            if not result["success"]:
+                kind = result.get("error_kind", ERROR_UNKNOWN)
+                self.failures_by_kind[kind] = self.failures_by_kind.get(kind, 0) + 1
+            self.input_bytes += result.get("bytes_read", 0)
+            self.output_bytes += result.get("output_size", 0)
+            if not metrics:
+                return
+            for phase, timing in metrics["phases"].items():
+                self.phase_wall[phase] = self.phase_wall.get(phase, 0.0) + timing["wall_seconds"]
+                self.phase_cpu[phase] = self.phase_cpu.get(phase, 0.0) + timing["cpu_seconds"]
+            for strategy in metrics["strategies_tried"]:
+                self.strategy_attempts[strategy] = self.strategy_attempts.get(strategy, 0) + 1
+            self.peak_rss_bytes = max(self.peak_rss_bytes, metrics["peak_rss_bytes"] or 0)
+
+    def samples(self) -> List[tuple[str, str, str, dict[str, str], float]]:
+        """Return (name, type, help, labels, value) for every metric sample."""
+        p = self.PREFIX
+        with self._lock:
+            samples = [
+                (f"{p}_files_total", "counter", "Files processed, by outcome", {"result": result}, count)
+                for result, count in self.files.items()
+            ]
+            samples += [
+                (f"{p}_failures_total", "counter", "Failed files, by failure kind", {"kind": kind}, count)
+                for kind, count in sorted(self.failures_by_kind.items())
+            ]
+            samples += [
+                (f"{p}_input_bytes_total", "counter", "Bytes read from input files", {}, self.input_bytes),
+                (f"{p}_output_bytes_total", "counter", "Bytes written to output files", {}, self.output_bytes),
+            ]
+            samples += [
+                (f"{p}_phase_wall_seconds_total", "counter", "Wall time spent per phase", {"phase": phase}, seconds)
+                for phase, seconds in sorted(self.phase_wall.items())
+            ]
+            samples += [
+                (f"{p}_phase_cpu_seconds_total", "counter", "CPU time spent per phase", {"phase": phase}, seconds)
+                for phase, seconds in sorted(self.phase_cpu.items())
+            ]
+            samples += [
+                (f"{p}_strategy_attempts_total", "counter", "Strategy attempts", {"strategy": name}, count)
+                for name, count in sorted(self.strategy_attempts.items())
+            ]
+            samples.append((f"{p}_peak_rss_bytes", "gauge", "Highest peak RSS reported by a worker", {},
+                            self.peak_rss_bytes))
+        return samples
+
+    def to_prometheus(self) -> str:
+        """Render the totals in the Prometheus text exposition format."""
+        lines = []
+        declared = set()
+        for name, metric_type, help_text, labels, value in self.samples():
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self) -> str:
+        """Render the totals as one JSON object per sample."""
+        return "".join(
+            json.dumps({"metric": name, "labels": labels, "value": value}, ensure_ascii=False) + "\n"
+            for name, _, _, labels, value in self.samples()
+        )
+
+# --- Cheap encryption probe: reads only the trailer and /Encrypt dictionary ---
+class PdfProbeError(Exception): pass
+
+class ProbeResult(TypedDict):
+    encrypted: bool
+    algorithm: Optional[str]
+    revision: Optional[int]
+    user_password_required: Optional[bool]
+    permissions: Optional[int]
+    permission_flags: dict[str, bool]
+    page_count: Optional[int]
+
+# Bit positions (1-based, PDF 32000-1 Table 22) of the /P permission flags
+_PERMISSION_BITS = {
+    "print": 3,
+    "modify": 4,
+    "extract": 5,
+    "annotate": 6,
+    "fill_forms": 9,
+    "accessibility": 10,
+    "assemble": 11,
+    "print_high_res": 12,
+}
+
+# Padding string from PDF 32000-1 Algorithm 2, step a
+_PASSWORD_PAD = bytes.fromhex(
+    "28BF4E5E4E758A4164004E56FFFA01082E2E00B6D0683E802F0CA9FE6453697A"
+)
+
+_PROBE_TAIL_BYTES = 2048
+_PROBE_CACHE_SIZE = 4096
+_probe_cache: "OrderedDict[tuple[str, int, int], ProbeResult]" = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+_DELIMITERS = b"()<>[]{}/%"
+_WHITESPACE = b"\x00\t\n\x0c\r "
+
+
+class _PdfRef(NamedTuple):
+    num: int
+    gen: int
+
+
+class _PdfLexer:
+    """Minimal PDF object parser covering what trailers and small dictionaries use."""
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def _skip_whitespace(self):
+        data = self.data
+        while self.pos < len(data):
+            ch = data[self.pos]
+            if ch in _WHITESPACE:
+                self.pos += 1
+            elif ch == 0x25:  # '%' comment runs to end of line
+                while self.pos < len(data) and data[self.pos] not in b"\r\n":
+                    self.pos += 1
+            else:
+                break
+
+    def _read_token(self) -> bytes:
+        self._skip_whitespace()
+        start = self.pos
+        while self.pos < len(self.data) and self.data[self.pos] not in _WHITESPACE + _DELIMITERS:
+            self.pos += 1
+        return self.data[start:self.pos]
+
+    def expect(self, keyword: bytes):
+        token = self._read_token()
+        if token != keyword:
+            raise PdfProbeError(f"期望 {keyword!r}，实际为 {token!r}")
+
+    def parse(self):
+        self._skip_whitespace()
+        if self.pos >= len(self.data):
+            raise PdfProbeError("数据意外结束")
+        data = self.data
+        ch = data[self.pos:self.pos + 1]
+        if ch == b"/":
+            self.pos += 1
+            return "/" + self._read_token().decode("latin-1")
+        if data.startswith(b"<<", self.pos):
+            self.pos += 2
+            result = {}
+            while True:
+                self._skip_whitespace()
+                if data.startswith(b">>", self.pos):
+                    self.pos += 2
+                    return result
+                key = self.parse()
+                if not isinstance(key, str) or not key.startswith("/"):
+                    raise PdfProbeError(f"字典键无效: {key!r}")
+                result[key] = self.parse()
+        if ch == b"<":
+            end = data.find(b">", self.pos)
+            if end < 0:
+                raise PdfProbeError("十六进制字符串未结束")
+            digits = bytes(c for c in data[self.pos + 1:end] if c not in _WHITESPACE)
+            self.pos = end + 1
+            if len(digits) % 2:
+                digits += b"0"
+            return bytes.fromhex(digits.decode("ascii"))
+        if ch == b"(":
+            return self._parse_literal_string()
+        if ch == b"[":
+            self.pos += 1
+            items = []
+            while True:
+                self._skip_whitespace()
+                if data.startswith(b"]", self.pos):
+                    self.pos += 1
+                    return items
+                items.append(self.parse())
+        token = self._read_token()
+        if not token:
+            raise PdfProbeError(f"无法解析的字符 {ch!r}")
+        if token == b"true":
+            return True
+        if token == b"false":
+            return False
+        if token == b"null":
+            return None
+        try:
+            number = float(token) if b"." in token else int(token)
+        except ValueError:
+            raise PdfProbeError(f"未知标记 {token!r}")
+        if isinstance(number, int):
+            # Look ahead for an indirect reference "num gen R"
+            saved = self.pos
+            gen = self._read_token()
+            if gen.isdigit() and self._read_token() == b"R":
+                return _PdfRef(number, int(gen))
+            self.pos = saved
+        return number
+
+    def _parse_literal_string(self) -> bytes:
+        data = self.data
+        self.pos += 1
+        out = bytearray()
+        depth = 1
+        while self.pos < len(data):
+            ch = data[self.pos]
+            self.pos += 1
+            if ch == 0x5C:  # backslash escape
+                if self.pos >= len(data):
+                    break
+                esc = data[self.pos]
+                self.pos += 1
+                if esc in b"01234567":
+                    digits = bytes([esc])
+                    while len(digits) < 3 and self.pos < len(data) and data[self.pos] in b"01234567":
+                        digits += data[self.pos:self.pos + 1]
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif esc == 0x0D:  # line continuation
+                    if data[self.pos:self.pos + 1] == b"\n":
+                        self.pos += 1
+                elif esc != 0x0A:
+                    out.append({0x6E: 0x0A, 0x72: 0x0D, 0x74: 0x09, 0x62: 0x08, 0x66: 0x0C}.get(esc, esc))
+            elif ch == 0x28:
+                depth += 1
+                out.append(ch)
+            elif ch == 0x29:
+                depth -= 1
+                if depth == 0:
+                    return bytes(out)
+                out.append(ch)
+            else:
+                out.append(ch)
+        raise PdfProbeError("字符串未结束")
+
+
+def _read_at(f, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+def _parse_indirect_object(f, offset: int) -> tuple[object, int]:
+    """Parse ``num gen obj <object>`` at offset. Returns (object, absolute end position)."""
+    for size in (8192, 262144):
+        data = _read_at(f, offset, size)
+        lexer = _PdfLexer(data)
+        try:
+            lexer._read_token()
+            lexer._read_token()
+            lexer.expect(b"obj")
+            value = lexer.parse()
+            return value, offset + lexer.pos
+        except PdfProbeError:
+            if len(data) < size:
+                raise
+    raise PdfProbeError(f"偏移 {offset} 处的对象过大")
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    """Undo PNG row predictors (/Predictor >= 10) on a decoded xref stream."""
+    row_len = columns + 1
+    prev = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data) - row_len + 1, row_len):
+        filter_type = data[start]
+        row = bytearray(data[start + 1:start + row_len])
+        for i in range(columns):
+            left = row[i - 1] if i else 0
+            up = prev[i]
+            up_left = prev[i - 1] if i else 0
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif filter_type == 4:
+                p = left + up - up_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+                predictor = left if pa <= pb and pa <= pc else (up if pb <= pc else up_left)
+                row[i] = (row[i] + predictor) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
+
+
+class _XrefSection(NamedTuple):
+    trailer: dict
+    offsets: dict[int, Optional[int]]  # object number -> byte offset, None if in an object stream
+
+
+def _read_xref_section(f, offset: int) -> _XrefSection:
+    """Read one classic xref table or xref stream starting at ``offset``."""
+    head = _read_at(f, offset, 4)
+    if head == b"xref":
+        offsets: dict[int, Optional[int]] = {}
+        pos = offset + 4
+        while True:
+            data = _read_at(f, pos, 64)
+            lexer = _PdfLexer(data)
+            first = lexer._read_token()
+            if first == b"trailer":
+                trailer, _ = _parse_trailer_dict(f, pos + lexer.pos)
+                return _XrefSection(trailer, offsets)
+            count = lexer._read_token()
+            if not (first.isdigit() and count.isdigit()):
+                raise PdfProbeError("xref 子表头无效")
+            lexer._skip_whitespace()
+            pos += lexer.pos
+            table = _read_at(f, pos, int(count) * 20)
+            for i in range(int(count)):
+                entry = table[i * 20:i * 20 + 18].split()
+                if len(entry) == 3 and entry[2] == b"n":
+                    offsets.setdefault(int(first) + i, int(entry[0]))
+            pos += int(count) * 20
+
+    stream_dict, end = _parse_indirect_object(f, offset)
+    if not isinstance(stream_dict, dict) or stream_dict.get("/Type") != "/XRef":
+        raise PdfProbeError("startxref 未指向 xref 表或 xref 流")
+    length = stream_dict.get("/Length")
+    if not isinstance(length, int):
+        raise PdfProbeError("xref 流缺少直接的 /Length")
+    data = _read_at(f, end, length + 32)
+    start = data.find(b"stream")
+    start += len(b"stream")
+    if data[start:start + 2] == b"\r\n":
+        start += 2
+    elif data[start:start + 1] in (b"\n", b"\r"):
+        start += 1
+    raw = data[start:start + length]
+    if stream_dict.get("/Filter") in ("/FlateDecode", ["/FlateDecode"]):
+        raw = zlib.decompress(raw)
+    parms = stream_dict.get("/DecodeParms") or {}
+    if isinstance(parms, list):
+        parms = parms[0] or {}
+    if not isinstance(parms, dict):
+        raise PdfProbeError("xref 流的 /DecodeParms 不是字典")
+    widths = stream_dict["/W"]
+    if parms.get("/Predictor", 1) >= 10:
+        raw = _png_unpredict(raw, parms.get("/Columns", sum(widths)))
+    index = stream_dict.get("/Index", [0, stream_dict["/Size"]])
+    offsets = {}
+    pos = 0
+    for first, count in zip(index[::2], index[1::2]):
+        for num in range(first, first + count):
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(raw[pos:pos + width], "big") if width else None)
+                pos += width
+            entry_type = 1 if fields[0] is None else fields[0]
+            if entry_type == 1:
+                offsets.setdefault(num, fields[1])
+            elif entry_type == 2:
+                offsets.setdefault(num, None)
+    return _XrefSection(stream_dict, offsets)
+
+def _parse_trailer_dict(f, offset: int) -> tuple[dict, int]:
+    data = _read_at(f, offset, 8192)
+    lexer = _PdfLexer(data)
+    trailer = lexer.parse()
+    if not isinstance(trailer, dict):
+        raise PdfProbeError("trailer 不是字典")
+    return trailer, offset + lexer.pos
+
+
+class _XrefChain:
+    """Lazily walks the /Prev chain of xref sections, newest first."""
+
+    _MAX_SECTIONS = 64
+
+    def __init__(self, f, startxref: int):
+        self.f = f
+        self.sections = [_read_xref_section(f, startxref)]
+
+    @property
+    def trailer(self) -> dict:
+        return self.sections[0].trailer
+
+    def offset_of(self, num: int) -> Optional[int]:
+        index = 0
+        while True:
+            section = self.sections[index]
+            if num in section.offsets:
+                return section.offsets[num]
+            index += 1
+            if index == len(self.sections):
+                prev = section.trailer.get("/Prev")
+                if not isinstance(prev, int) or index >= self._MAX_SECTIONS:
+                    return None
+                self.sections.append(_read_xref_section(self.f, prev))
+
+    def resolve(self, value):
+        """Resolve an indirect reference; returns None when it lives in an object stream."""
+        if not isinstance(value, _PdfRef):
+            return value
+        offset = self.offset_of(value.num)
+        if offset is None:
+            return None
+        obj, _ = _parse_indirect_object(self.f, offset)
+        return obj
+
+
+def _rc4(key: bytes, data: bytes) -> bytes:
+    state = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + state[i] + key[i % len(key)]) & 0xFF
+        state[i], state[j] = state[j], state[i]
+    out = bytearray()
+    i = j = 0
+    for byte in data:
+        i = (i + 1) & 0xFF
+        j = (j + state[i]) & 0xFF
+        state[i], state[j] = state[j], state[i]
+        out.append(byte ^ state[(state[i] + state[j]) & 0xFF])
+    return bytes(out)
+
+def _aes_cbc_encrypt(key: bytes, iv: bytes, data: bytes) -> Optional[bytes]:
+    """AES-128-CBC without padding, or None when no AES implementation is installed."""
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    except ImportError:
+        try:
+            from Crypto.Cipher import AES
+        except ImportError:
+            return None
+        return AES.new(key, AES.MODE_CBC, iv).encrypt(data)
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    return encryptor.update(data) + encryptor.finalize()
+
+def _hash_r6(password: bytes, salt: bytes, udata: bytes = b"") -> Optional[bytes]:
+    """PDF 2.0 hardened hash (ISO 32000-2 Algorithm 2.B)."""
+    k = hashlib.sha256(password + salt + udata).digest()
+    i = 0
+    while True:
+        e = _aes_cbc_encrypt(k[:16], k[16:32], (password + k + udata) * 64)
+        if e is None:
+            return None
+        k = (hashlib.sha256, hashlib.sha384, hashlib.sha512)[sum(e[:16]) % 3](e).digest()
+        i += 1
+        if i >= 64 and e[-1] <= i - 32:
+            return k[:32]
+
+def _encode_password(password: str, revision: int) -> bytes:
+    if revision >= 5:
+        return password.encode("utf-8")[:127]
+    try:
+        return password.encode("latin-1")[:32]
+    except UnicodeEncodeError:
+        return password.encode("utf-8")[:32]
+
+def _rc4_file_key(encrypt: dict, id0: bytes, password: bytes) -> bytes:
+    """PDF 32000-1 Algorithm 2: derive the RC4/AES-128 file key from a user password."""
+    revision = encrypt.get("/R", 2)
+    key_len = 5 if revision == 2 else encrypt.get("/Length", 40) // 8
+    digest = hashlib.md5(
+        (password + _PASSWORD_PAD)[:32]
+        + encrypt["/O"][:32]
+        + (encrypt.get("/P", 0) & 0xFFFFFFFF).to_bytes(4, "little")
+        + id0
+        + (b"\xff\xff\xff\xff" if revision >= 4 and encrypt.get("/EncryptMetadata", True) is False else b"")
+    ).digest()
+    if revision >= 3:
+        for _ in range(50):
+            digest = hashlib.md5(digest[:key_len]).digest()
+    return digest[:key_len]
+
+def _check_user_password(encrypt: dict, id0: bytes, password: bytes) -> Optional[bool]:
+    revision = encrypt.get("/R", 2)
+    user = encrypt.get("/U", b"")
+    if revision >= 5:
+        if revision == 5:
+            return hashlib.sha256(password + user[32:40]).digest() == user[:32]
+        digest = _hash_r6(password, user[32:40])
+        return None if digest is None else digest == user[:32]
+    key = _rc4_file_key(encrypt, id0, password)
+    if revision == 2:
+        return _rc4(key, _PASSWORD_PAD) == user[:32]
+    value = _rc4(key, hashlib.md5(_PASSWORD_PAD + id0).digest())
+    for i in range(1, 20):
+        value = _rc4(bytes(b ^ i for b in key), value)
+    return value == user[:16]
+
+def _check_owner_password(encrypt: dict, id0: bytes, password: bytes) -> Optional[bool]:
+    revision = encrypt.get("/R", 2)
+    owner = encrypt.get("/O", b"")
+    if revision >= 5:
+        user = encrypt.get("/U", b"")[:48]
+        if revision == 5:
+            return hashlib.sha256(password + owner[32:40] + user).digest() == owner[:32]
+        digest = _hash_r6(password, owner[32:40], user)
+        return None if digest is None else digest == owner[:32]
+    # Algorithm 7: recover the user password from /O, then authenticate it
+    key_len = 5 if revision == 2 else encrypt.get("/Length", 40) // 8
+    digest = hashlib.md5((password + _PASSWORD_PAD)[:32]).digest()
+    if revision >= 3:
+        for _ in range(50):
+            digest = hashlib.md5(digest).digest()
+    key = digest[:key_len]
+    if revision == 2:
+        user_password = _rc4(key, owner[:32])
+    else:
+        user_password = owner[:32]
+        for i in range(19, -1, -1):
+            user_password = _rc4(bytes(b ^ i for b in key), user_password)
+    return _check_user_password(encrypt, id0, user_password)
+
+def _check_password(encrypt: dict, id0: bytes, password: str) -> Optional[str]:
+    """
+    Verify a password against the /Encrypt dictionary alone, without opening the document.
+
+    Returns:
+        Optional[str]: "user" or "owner" when the password is accepted, "" when it is
+        rejected, None when the handler cannot be checked here (e.g. no AES library for R6).
+    """
+    if encrypt.get("/Filter") != "/Standard":
+        return None
+    encoded = _encode_password(password, encrypt.get("/R", 2))
+    unknown = False
+    for kind, check in (("user", _check_user_password), ("owner", _check_owner_password)):
+        try:
+            accepted = check(encrypt, id0, encoded)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if accepted:
+            return kind
+        unknown = unknown or accepted is None
+    return None if unknown else ""
+
+def _encryption_algorithm(encrypt: dict) -> Optional[str]:
+    version = encrypt.get("/V", 0)
+    if encrypt.get("/Filter") != "/Standard":
+        return str(encrypt.get("/Filter", "unknown")).lstrip("/")
+    if version == 1:
+        return "RC4-40"
+    if version == 2:
+        return f"RC4-{encrypt.get('/Length', 40)}"
+    if version == 4:
+        filters = encrypt.get("/CF")
+        stream_filter = filters.get(encrypt.get("/StmF", "/Identity")) if isinstance(filters, dict) else None
+        method = stream_filter.get("/CFM") if isinstance(stream_filter, dict) else None
+        return {"/AESV2": "AES-128", "/V2": "RC4-128"}.get(method, "RC4-128")
+    if version == 5:
+        return "AES-256"
+    return None
+
+def _permission_flags(permissions: int) -> dict[str, bool]:
+    return {name: bool(permissions & (1 << (bit - 1))) for name, bit in _PERMISSION_BITS.items()}
+
+def _open_xref_chain(f) -> _XrefChain:
+    """Locate startxref in the last few KB of ``f`` and load the newest xref section."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    tail = _read_at(f, max(0, size - _PROBE_TAIL_BYTES), _PROBE_TAIL_BYTES)
+    marker = tail.rfind(b"startxref")
+    if marker < 0:
+        raise PdfProbeError("未找到 startxref")
+    lexer = _PdfLexer(tail, marker + len(b"startxref"))
+    startxref = lexer._read_token()
+    if not startxref.isdigit() or int(startxref) >= size:
+        raise PdfProbeError(f"startxref 偏移无效: {startxref!r}")
+    return _XrefChain(f, int(startxref))
+
+def _security_handler(chain: _XrefChain) -> tuple[Optional[dict], bytes]:
+    """Return the resolved /Encrypt dictionary (None if unencrypted) and the first /ID string."""
+    trailer = chain.trailer
+    encrypt = chain.resolve(trailer.get("/Encrypt"))
+    ids = chain.resolve(trailer.get("/ID")) or [b""]
+    id0 = ids[0] if isinstance(ids, list) and isinstance(ids[0], bytes) else b""
+    if not isinstance(encrypt, dict):
+        return None, id0
+    # Any entry may be an indirect reference (qpdf accepts e.g. "/CF 12 0 R"), so resolve
+    # the entries and the crypt filter dictionaries once here instead of at every use
+    encrypt = {key: chain.resolve(value) for key, value in encrypt.items()}
+    filters = encrypt.get("/CF")
+    if isinstance(filters, dict):
+        encrypt["/CF"] = {name: chain.resolve(value) for name, value in filters.items()}
+    return encrypt, id0
+
+def _probe_stream(f, check_password: bool = True) -> ProbeResult:
+    chain = _open_xref_chain(f)
+    trailer = chain.trailer
+
+    page_count = None
+    try:
+        catalog = chain.resolve(trailer.get("/Root"))
+        pages = chain.resolve(catalog.get("/Pages")) if isinstance(catalog, dict) else None
+        count = pages.get("/Count") if isinstance(pages, dict) else None
+        page_count = count if isinstance(count, int) else None
+    except PdfProbeError:
+        pass  # the page count is best-effort only
+
+    encrypt, id0 = _security_handler(chain)
+    if encrypt is None:
+        return {
+            "encrypted": False,
+            "algorithm": None,
+            "revision": None,
+            "user_password_required": False,
+            "permissions": None,
+            "permission_flags": {},
+            "page_count": page_count,
         }
 
-def batch_unlock_files(filepaths: List[str], password: str = '') -> List[UnlockResult]:
+    accepted = _check_password(encrypt, id0, "") if check_password else None
+    permissions = encrypt.get("/P")
+    permissions = permissions if isinstance(permissions, int) else None
+    return {
+        "encrypted": True,
+        "algorithm": _encryption_algorithm(encrypt),
+        "revision": encrypt.get("/R"),
+        "user_password_required": None if accepted is None else accepted == "",
+        "permissions": permissions,
+        "permission_flags": _permission_flags(permissions) if permissions is not None else {},
+        "page_count": page_count,
+    }
+
+def probe_pdf(path: str) -> ProbeResult:
+    """
+    Inspect a PDF's encryption by reading only its trailer and /Encrypt dictionary.
+
+    Results are cached by (path, size, mtime), so probing an unchanged file again is free.
+
+    Args:
+        path (str): Path to the PDF.
+
+    Returns:
+        ProbeResult: Encryption status, algorithm/revision, whether a user password is
+        needed (None if it cannot be decided cheaply), /P permissions and page count.
+
+    Raises:
+        PdfProbeError: If the trailer cannot be located or parsed (e.g. damaged xref).
+        OSError: If the file cannot be read.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _probe_cache_lock:
+        cached = _probe_cache.get(key)
+        if cached is not None:
+            _probe_cache.move_to_end(key)
+            return dict(cached)
+
+    try:
+        with open(path, "rb") as f:
+            result = _probe_stream(f)
+    except (PdfProbeError, OSError, MemoryError):
+        raise
+    except Exception as e:
+        # Any other parser failure (unexpected object types, recursion...) is a damaged trailer
+        raise PdfProbeError(f"无法解析 trailer: {type(e).__name__}: {e}") from e
+
+    with _probe_cache_lock:
+        _probe_cache[key] = result
+        if len(_probe_cache) > _PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return dict(result)
+
+# --- Multi-candidate password keyring ---
+class Keyring:
+    """
+    A set of candidate passwords, checked cheaply against each document's /Encrypt dictionary.
+
+    The trailer is parsed once per file and every candidate is verified with the standard
+    security handler's key derivation (a few hash rounds), so wrong guesses never cost a
+    full open. Candidates are tried in this order: the /ID mapping, passwords that already
+    worked for the same source folder, matching path patterns, the caller's own password
+    (usually empty, which opens restriction-only files), then ``candidates`` in order.
+
+    Remembered passwords live in this object; with a process pool each worker keeps its own.
+
+    Args:
+        candidates (Sequence[str]): Passwords to try for any document.
+        by_document_id (Optional[dict[str, str]]): Hex-encoded first /ID string -> password.
+        by_pattern (Optional[Sequence[tuple[str, str]]]): (fnmatch pattern on the path, password) pairs.
+    """
+
+    def __init__(self, candidates: Sequence[str] = (),
+                 by_document_id: Optional[dict[str, str]] = None,
+                 by_pattern: Optional[Sequence[tuple[str, str]]] = None):
+        self.candidates = list(candidates)
+        self.by_document_id = {doc_id.lower(): pw for doc_id, pw in (by_document_id or {}).items()}
+        self.by_pattern = list(by_pattern or [])
+        self._by_source: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, password: str, document_id: Optional[str] = None, pattern: Optional[str] = None):
+        """Add a candidate, optionally bound to a document /ID (hex) or a path pattern."""
+        if document_id is not None:
+            self.by_document_id[document_id.lower()] = password
+        elif pattern is not None:
+            self.by_pattern.append((pattern, password))
+        else:
+            self.candidates.append(password)
+
+    @staticmethod
+    def _source_of(input_path: str) -> str:
+        return os.path.dirname(os.path.abspath(input_path))
+
+    def remember(self, input_path: str, password: str):
+        """Try ``password`` first for later files from the same folder."""
+        with self._lock:
+            self._by_source[self._source_of(input_path)] = password
+
+    def _ordered(self, input_path: str, document_id: str, fallback: str) -> List[str]:
+        with self._lock:
+            remembered = self._by_source.get(self._source_of(input_path))
+        ordered = [self.by_document_id.get(document_id), remembered]
+        ordered += [pw for pattern, pw in self.by_pattern if fnmatch.fnmatch(input_path, pattern)]
+        ordered += [fallback] + self.candidates
+        return list(dict.fromkeys(pw for pw in ordered if pw is not None))
+
+    def resolve(self, input_path: str, source: bytes, fallback: str = '') -> Optional[str]:
+        """
+        Pick the password that opens ``source``.
+
+        Args:
+            input_path (str): Path of the document, used for patterns and the source folder.
+            source (bytes): The document's bytes (or mmap), already loaded by the caller.
+            fallback (str): The caller's password, tried before the plain candidates.
+
+        Returns:
+            Optional[str]: The first accepted candidate, ``fallback`` if the document is not
+            encrypted, or None if every candidate was rejected.
+        """
+        try:
+            chain = _open_xref_chain(_source_reader(source))
+            encrypt, id0 = _security_handler(chain)
+        except (PdfProbeError, KeyError, IndexError, TypeError, ValueError, zlib.error):
+            # Damaged trailer: let the strategies (which can rebuild the xref) do the checking
+            encrypt, id0 = {}, b""
+        if encrypt is None:
+            return fallback
+
+        for password in self._ordered(input_path, id0.hex(), fallback):
+            accepted = _check_password(encrypt, id0, password) if encrypt else None
+            if accepted is None:
+                # Handler we cannot check from the dictionary (e.g. R6 without an AES library)
+                accepted = self._open_check(input_path, source, password)
+            if accepted:
+                logger.debug(f"[Keyring] '{input_path}' 匹配到 {accepted} 密码。")
+                return password
+        return None
+
+    @staticmethod
+    def _open_check(input_path: str, source: bytes, password: str) -> str:
+        import pikepdf
+        try:
+            with pikepdf.open(_open_source(input_path, source), password=password):
+                return "user"
+        except pikepdf.PasswordError:
+            return ""
+        except Exception:
+            # Not a password problem; the real unlock will report it properly
+            return "user"
+
+# --- Job scheduling ---
+SCHEDULES = ("fifo", "sjf")
+# Per-page work (PyPDF2 rebuilds page by page, qpdf walks every page tree node) in input-byte terms
+_PAGE_COST_BYTES = 32 << 10
+
+def estimate_cost(path: str) -> float:
+    """
+    Rough relative cost of unlocking ``path``: its size plus a per-page charge.
+
+    The page count comes from probe_pdf, so only the trailer and page tree root are read.
+    Unreadable files cost 0: they fail immediately and should not hold anything up.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0.0
+    try:
+        pages = probe_pdf(path)["page_count"] or 0
+    except (PdfProbeError, OSError):
+        pages = 0
+    return size + pages * _PAGE_COST_BYTES
+
+def schedule_order(filepaths: Sequence[str], schedule: str = "sjf",
+                   priorities: Optional[Sequence[int]] = None) -> List[int]:
+    """
+    Return the indices of ``filepaths`` in the order they should be started.
+
+    Args:
+        filepaths (Sequence[str]): Files to schedule.
+        schedule (str): "fifo" keeps input order; "sjf" starts the cheapest files first
+            (see estimate_cost), which lowers median time-to-result for mixed batches.
+        priorities (Optional[Sequence[int]]): Per-file priority; higher always goes first,
+            ties are broken by the schedule.
+
+    Returns:
+        List[int]: A permutation of ``range(len(filepaths))``.
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"未知的调度方式: {schedule}（可选: {', '.join(SCHEDULES)}）")
+    priority = (lambda idx: -priorities[idx]) if priorities is not None else (lambda idx: 0)
+    if schedule == "fifo":
+        return sorted(range(len(filepaths)), key=priority)  # stable: input order within a priority
+    costs = [estimate_cost(path) for path in filepaths]
+    return sorted(range(len(filepaths)), key=lambda idx: (priority(idx), costs[idx]))
+
+def _default_output_path(path: str) -> str:
+    """Return the sibling ``<stem>_unlocked.pdf`` path used for batch output."""
+    return str(Path(path).with_stem(Path(path).stem + "_unlocked"))
+
+def _failure_result(message: str, kind: str = ERROR_UNKNOWN) -> UnlockResult:
+    return {
+        "success": False,
+        "message": message,
+        "method": "失败",
+        "output_path": None,
+        "error_kind": kind
+    }
+
+# --- Worker entry points (must stay module-level so they can be pickled) ---
+def _init_worker():
+    """Pool initializer: leave Ctrl+C to the parent, which shuts the pool down cleanly."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Workers exist to unlock, so import the libraries while the pool is still starting up
+    preload_backends()
+
+def _unlock_chunk(jobs: List[tuple[str, str, str]], options: Optional[dict] = None) -> List[UnlockResult]:
+    """
+    Unlock a chunk of (input_path, output_path, password) jobs in order.
+
+    Args:
+        jobs (List[tuple[str, str, str]]): Jobs to run in this worker.
+        options (Optional[dict]): Extra keyword arguments for unlock_pdf.
+
+    Returns:
+        List[UnlockResult]: One result per job, in the same order.
+    """
+    results = []
+    for input_path, output_path, password in jobs:
+        try:
+            results.append(unlock_pdf(input_path, output_path, password, **(options or {})))
+        except Exception as e:
+            # unlock_pdf already catches everything; this only guards the chunk
+            logger.error(f"[Batch] '{input_path}' 处理时发生未捕获错误: {type(e).__name__}: {e}", exc_info=True)
+            results.append(_failure_result(f"发生未知错误: {e}"))
+    return results
+
+def _output_path_for(path: str, output_dir: Optional[str] = None) -> str:
+    """Return the ``_unlocked`` output path, next to the input or inside ``output_dir``."""
+    if output_dir is None:
+        return _default_output_path(path)
+    filename = os.path.splitext(os.path.basename(path))[0] + "_unlocked.pdf"
+    return os.path.join(output_dir, filename)
+
+def iter_unlock(filepaths: Sequence[str], password: str = '',
+                max_workers: Optional[int] = 1, chunksize: int = 1,
+                ordered: bool = False, output_dir: Optional[str] = None,
+                passwords: Optional[Sequence[str]] = None,
+                output_paths: Optional[Sequence[str]] = None,
+                adaptive: bool = False, profile: str = "default",
+                instrument: bool = False, cache=None,
+                keyring: Optional[Keyring] = None, sink=None, schedule: str = "fifo",
+                priorities: Optional[Sequence[int]] = None,
+                large_file_bytes: Optional[int] = LARGE_FILE_BYTES, large_workers: int = 1,
+                memory_budget: Optional[int] = None, timeout: Optional[float] = None,
+                memory_limit: Optional[int] = None, resume: Optional[threading.Event] = None,
+                cancel: Optional[threading.Event] = None,
+                abort: Optional[threading.Event] = None) -> Iterator[tuple[int, UnlockResult]]:
+    """
+    Unlock PDFs and yield ``(index, UnlockResult)`` as each file finishes.
+
+    Only ``max_workers * 2`` chunks are in flight at any time, so memory stays
+    constant regardless of batch size. Closing the generator early cancels the
+    work that has not started yet.
+
+    With a process pool, files of at least ``large_file_bytes`` run in a separate lane of
+    ``large_workers`` processes, one file per task, so a few huge inputs can neither take
+    over the main pool nor run side by side and exhaust memory.
+
+    Setting ``timeout`` or ``memory_limit`` switches to isolated execution (see
+    isolated_unlocker.py): every file runs in a recycled worker process that is killed when
+    it exceeds either, even with ``max_workers=1``, and every result carries ``status``.
+
+    ``resume`` and ``cancel`` let another thread control a running batch: while ``resume``
+    is cleared no new file is started (to make that take effect promptly, only one chunk
+    per worker is then in flight), and once ``cancel`` is set no new file is started and
+    the generator returns after the files already running have been yielded. ``abort`` does
+    not wait for them: the generator returns without their results. Isolated workers still
+    running are killed and their partial outputs removed; a plain process pool lets them
+    finish while it shuts down.
+
+    Args:
+        filepaths (Sequence[str]): PDFs to unlock.
+        password (str): Password shared by every file.
+        max_workers (Optional[int]): Process pool size; 1 runs in-process, None uses all cores.
+        chunksize (int): Files per worker task.
+        ordered (bool): Yield in start order (input order under "fifo") instead of completion order.
+        output_dir (Optional[str]): Write outputs here instead of next to each input.
+        passwords (Optional[Sequence[str]]): Per-file passwords, overriding ``password``.
+        output_paths (Optional[Sequence[str]]): Explicit per-file outputs, overriding ``output_dir``.
+        adaptive (bool): Let each worker reorder strategies from its own statistics.
+        profile (str): PikePDF save profile, see SAVE_PROFILES.
+        instrument (bool): Attach per-phase UnlockMetrics to every result.
+        cache (Optional[ResultCache]): Shared result cache, see result_cache.py.
+        keyring (Optional[Keyring]): Candidate passwords checked before ``password``.
+        sink (Optional[OutputSink]): Publish outputs through a sink (see output_sinks.py);
+            ``output_paths`` are then names relative to the sink, ``output_dir`` is ignored.
+        schedule (str): Start order, "fifo" or "sjf" (cheapest first), see schedule_order.
+        priorities (Optional[Sequence[int]]): Per-file priorities; higher starts first.
+        large_file_bytes (Optional[int]): Size from which a file is memory-mapped and sent to
+            the large-file lane; None disables large-file mode.
+        large_workers (int): Processes in the large-file lane.
+        memory_budget (Optional[int]): Per-file memory budget in bytes, see unlock_pdf.
+        timeout (Optional[float]): Wall-clock seconds per file in isolated execution.
+        memory_limit (Optional[int]): Memory cap per isolated worker process, in bytes.
+        resume (Optional[threading.Event]): Cleared to pause, set to continue.
+        cancel (Optional[threading.Event]): Set to stop starting new files.
+        abort (Optional[threading.Event]): Set to stop at once, abandoning running files.
+
+    Yields:
+        tuple[int, UnlockResult]: Index into ``filepaths`` and its result.
+    """
+    if profile not in SAVE_PROFILES:
+        raise ValueError(f"未知的保存配置: {profile}（可选: {', '.join(SAVE_PROFILES)}）")
+    options = {"adaptive": adaptive, "profile": profile, "instrument": instrument, "cache": cache,
+               "keyring": keyring, "large_file_bytes": large_file_bytes, "memory_budget": memory_budget}
+    lanes = {"max_workers": max_workers, "chunksize": chunksize, "ordered": ordered,
+             "large_file_bytes": large_file_bytes, "large_workers": large_workers,
+             "resume": resume, "cancel": cancel, "abort": abort}
+    if timeout is not None or memory_limit is not None:
+        lanes["isolation"] = {"timeout": timeout, "memory_limit": memory_limit}
+    if sink is None:
+        jobs = [
+            (path,
+             output_paths[idx] if output_paths is not None else _output_path_for(path, output_dir),
+             passwords[idx] if passwords is not None else password)
+            for idx, path in enumerate(filepaths)
+        ]
+        yield from _run_scheduled(jobs, filepaths, schedule, priorities, options, **lanes)
+        return
+
+    # Workers write to staging paths; results are published from this thread as they arrive
+    names = list(output_paths) if output_paths is not None else [
+        os.path.basename(_default_output_path(path)) for path in filepaths
+    ]
+    jobs = [
+        (path, sink.stage(names[idx]), passwords[idx] if passwords is not None else password)
+        for idx, path in enumerate(filepaths)
+    ]
+    unfinished = set(range(len(jobs)))
+    results = _run_scheduled(jobs, filepaths, schedule, priorities, options, **lanes)
+    try:
+        for idx, result in results:
+            unfinished.discard(idx)
+            try:
+                result = sink.finish(names[idx], jobs[idx][1], result)
+            except OSError as e:
+                logger.error(f"[Batch] 无法写入输出 '{names[idx]}': {e}")
+                result = {**result, **_failure_result(f"无法写入输出: {e}", ERROR_IO)}
+            yield idx, result
+    finally:
+        results.close()
+        for idx in unfinished:
+            sink.discard(jobs[idx][1])
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _run_scheduled(jobs: List[tuple[str, str, str]], filepaths: Sequence[str], schedule: str,
+                   priorities: Optional[Sequence[int]], options: dict, max_workers: Optional[int],
+                   chunksize: int, ordered: bool, large_file_bytes: Optional[int] = None,
+                   large_workers: int = 1, isolation: Optional[dict] = None,
+                   resume: Optional[threading.Event] = None,
+                   cancel: Optional[threading.Event] = None,
+                   abort: Optional[threading.Event] = None) -> Iterator[tuple[int, UnlockResult]]:
+    """Start ``jobs`` in schedule order and yield results under their original indices."""
+    order = schedule_order(filepaths, schedule, priorities)
+    large = set()
+    if large_file_bytes is not None and (max_workers != 1 or isolation is not None):
+        large = {position for position, idx in enumerate(order)
+                 if _file_size(filepaths[idx]) >= large_file_bytes}
+    results = _iter_unlock_jobs([jobs[idx] for idx in order], options, max_workers, chunksize, ordered,
+                                large, large_workers, isolation, resume, cancel, abort)
+    try:
+        for position, result in results:
+            yield order[position], result
+    finally:
+        results.close()
+
+_CONTROL_POLL_SECONDS = 0.1
+
+def _replace_executor(lane: dict, broken) -> None:
+    """Swap a lane's broken process pool for a new one (once, however many futures report it)."""
+    if lane["executor"] is not broken:
+        return
+    broken.shutdown(wait=False, cancel_futures=True)
+    lane["executor"] = ProcessPoolExecutor(max_workers=lane["workers"], initializer=_init_worker)
+
+def _submit_chunks(lane: dict, jobs: List[tuple[str, str, str]], options: dict, pending: dict) -> None:
+    """Fill the lane's window; after a crash, rerun the suspects alone before anything else."""
+    while True:
+        if lane["suspects"]:
+            # Alone on the pool, so a crash can only be this file's doing
+            if lane["in_flight"]:
+                return
+            chunk, alone = lane["suspects"].popleft(), True
+        elif lane["chunks"] and lane["in_flight"] < lane["window"]:
+            chunk, alone = lane["chunks"].popleft(), False
+        else:
+            return
+        executor = lane["executor"]
+        try:
+            future = executor.submit(lane["task"], [jobs[p] for p in chunk], options)
+        except BrokenProcessPool:
+            # Broke before this chunk ran: requeue it untouched on a fresh pool
+            _replace_executor(lane, executor)
+            (lane["suspects"] if alone else lane["chunks"]).appendleft(chunk)
+            continue
+        pending[future] = (lane, chunk, executor, alone)
+        lane["in_flight"] += 1
+
+def _may_start(resume: Optional[threading.Event], cancel: Optional[threading.Event]) -> bool:
+    return (resume is None or resume.is_set()) and (cancel is None or not cancel.is_set())
+
+def _wait_to_start(resume: Optional[threading.Event], cancel: Optional[threading.Event]) -> bool:
+    """Block while paused; False once cancelled."""
+    while resume is not None and not resume.wait(_CONTROL_POLL_SECONDS):
+        if cancel is not None and cancel.is_set():
+            return False
+    return cancel is None or not cancel.is_set()
+
+def _iter_unlock_jobs(jobs: List[tuple[str, str, str]], options: dict, max_workers: Optional[int],
+                      chunksize: int, ordered: bool, large: frozenset = frozenset(),
+                      large_workers: int = 1, isolation: Optional[dict] = None,
+                      resume: Optional[threading.Event] = None,
+                      cancel: Optional[threading.Event] = None,
+                      abort: Optional[threading.Event] = None) -> Iterator[tuple[int, UnlockResult]]:
+    """
+    Scheduling half of iter_unlock: run (input, output, password) jobs, yield as they finish.
+
+    Positions in ``large`` go to their own pool of ``large_workers`` processes, one job per
+    task; everything else shares the main pool in chunks of ``chunksize``. With
+    ``isolation`` (IsolatedPool settings) both pools are isolated_unlocker.IsolatedPools.
+    ``resume`` / ``cancel`` gate every submission and ``abort`` ends the run, see iter_unlock.
+
+    If a worker process dies, every chunk in flight on that pool fails with
+    BrokenProcessPool. The pool is then replaced and the files of those chunks are run
+    again one at a time, alone on the new pool, so only the file that kills a worker again
+    is reported as failed.
+    """
+    if isolation is None and (max_workers == 1 or len(jobs) <= 1):
+        # In-process: completion order and input order are the same thing
+        for idx, job in enumerate(jobs):
+            if not _wait_to_start(resume, cancel) or (abort is not None and abort.is_set()):
+                return
+            yield idx, _unlock_chunk([job], options)[0]
+        return
+
+    chunksize = max(1, chunksize)
+    workers = max_workers or os.cpu_count() or 1
+    regular = [position for position in range(len(jobs)) if position not in large]
+    lanes = []
+    for positions, lane_workers, lane_chunksize in ((regular, workers, chunksize),
+                                                    (sorted(large), max(1, large_workers), 1)):
+        if not positions:
+            continue
+        if isolation is not None:
+            from isolated_unlocker import IsolatedPool
+            executor = IsolatedPool(lane_workers, **isolation)
+            task = executor.unlock_chunk
+        else:
+            executor = ProcessPoolExecutor(max_workers=lane_workers, initializer=_init_worker)
+            task = _unlock_chunk
+        lanes.append({
+            "executor": executor,
+            "task": task,
+            "workers": lane_workers,
+            # A queued chunk would still start during a pause, so keep none queued when pausable
+            "window": lane_workers if resume is not None else lane_workers * 2,
+            "chunks": deque(positions[i:i + lane_chunksize] for i in range(0, len(positions), lane_chunksize)),
+            "in_flight": 0,
+            "suspects": deque(),  # single-file chunks lost when a worker died, rerun one at a time
+        })
+    pending = {}
+    buffered: dict[int, UnlockResult] = {}
+    next_index = 0
+    try:
+        while abort is None or not abort.is_set():
+            # Keep each pool busy without queueing the whole batch up front
+            if _may_start(resume, cancel):
+                for lane in lanes:
+                    _submit_chunks(lane, jobs, options, pending)
+            if not pending:
+                if not any(lane["chunks"] or lane["suspects"] for lane in lanes) \
+                        or not _wait_to_start(resume, cancel):
+                    break
+                continue
+
+            # While paused or abortable, wake up now and then to notice resume / cancel / abort
+            polling = abort is not None or (resume is not None and not resume.is_set())
+            done, _ = wait(pending, timeout=_CONTROL_POLL_SECONDS if polling else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                lane, chunk, executor, alone = pending.pop(future)
+                lane["in_flight"] -= 1
+                try:
+                    chunk_results = future.result()
+                except BrokenProcessPool:
+                    _replace_executor(lane, executor)
+                    if not alone:
+                        # Maybe just a victim of another chunk's crash: run its files again, one by one
+                        lane["suspects"].extend([position] for position in chunk)
+                        continue
+                    logger.error(f"[Batch] '{jobs[chunk[0]][0]}' 导致工作进程异常退出")
+                    chunk_results = [_failure_result("工作进程异常退出（可能是该文件导致解析器崩溃或内存不足）",
+                                                     ERROR_RESOURCE)]
+                except Exception as e:
+                    # Any other worker exception only fails its own chunk, the rest of the batch continues
+                    logger.error(f"[Batch] 工作进程异常，{len(chunk)} 个文件未能处理: {type(e).__name__}: {e}")
+                    chunk_results = [_failure_result(f"工作进程异常: {e}") for _ in chunk]
+
+                if not ordered:
+                    for position, result in zip(chunk, chunk_results):
+                        yield position, result
+                    continue
+                for position, result in zip(chunk, chunk_results):
+                    buffered[position] = result
+                while next_index in buffered:
+                    yield next_index, buffered.pop(next_index)
+                    next_index += 1
+        # Cancelled: files that finished out of order are still results
+        for position in sorted(buffered):
+            yield position, buffered.pop(position)
+    finally:
+        for lane in lanes:
+            lane["executor"].shutdown(wait=True, cancel_futures=True)
+
+def batch_unlock_files(filepaths: List[str], password: str = '',
+                       max_workers: Optional[int] = 1, chunksize: int = 1,
+                       adaptive: bool = False, profile: str = "default",
+                       instrument: bool = False, cache=None,
+                       keyring: Optional[Keyring] = None, sink=None, schedule: str = "fifo",
+                       priorities: Optional[Sequence[int]] = None,
+                       large_file_bytes: Optional[int] = LARGE_FILE_BYTES, large_workers: int = 1,
+                       memory_budget: Optional[int] = None, timeout: Optional[float] = None,
+                       memory_limit: Optional[int] = None) -> List[UnlockResult]:
     """
     批量解锁 PDF 文件，自动生成输出路径。
 
     Args:
         filepaths (List[str]): 需要解锁的 PDF 文件路径列表。
         password (str, optional): 解锁密码。默认为空字符串。
+        max_workers (Optional[int], optional): 进程池大小。1 表示在当前进程中顺序处理，
+            None 表示使用全部 CPU 核心。默认为 1。
+        chunksize (int, optional): 每次提交给工作进程的文件数。默认为 1。
+        adaptive (bool, optional): 根据统计数据为每类文档调整解密方法的顺序。默认为 False。
+        profile (str, optional): PikePDF 保存配置，见 SAVE_PROFILES。默认为 "default"。
+        instrument (bool, optional): 在结果中附带分阶段耗时等指标（见 MetricsAggregator）。默认为 False。
+        cache (Optional[ResultCache], optional): 结果缓存，相同内容的文件直接复用已解锁的输出。默认为 None。
+        keyring (Optional[Keyring], optional): 候选密码钥匙串，先于 password 逐一校验。默认为 None。
+        sink (Optional[OutputSink], optional): 输出目标（目录 / ZIP / TAR，见 output_sinks.py）；
+            为 None 时写在原文件旁边。默认为 None。
+        schedule (str, optional): 处理顺序。"fifo" 按输入顺序，"sjf" 先处理估计耗时最短的文件。默认为 "fifo"。
+        priorities (Optional[Sequence[int]], optional): 每个文件的优先级，数值大的先处理。默认为 None。
+        large_file_bytes (Optional[int], optional): 不小于该大小的文件以内存映射方式打开，并交给单独的
+            低并发进程池处理；None 表示关闭大文件模式。默认为 LARGE_FILE_BYTES（256 MB）。
+        large_workers (int, optional): 大文件进程池的进程数。默认为 1。
+        memory_budget (Optional[int], optional): 每个文件的内存预算（字节），预计超出时跳过 PyPDF2。默认为 None。
+        timeout (Optional[float], optional): 每个文件的处理时限（秒）。设置后每个文件都在独立的工作进程中处理，
+            超时即终止该进程，结果的 status 为 "timeout"。默认为 None。
+        memory_limit (Optional[int], optional): 独立工作进程的内存上限（字节），同样会启用独立进程模式。默认为 None。
 
     Returns:
-        List[UnlockResult]: 每个文件的解锁结果。
+        List[UnlockResult]: 每个文件的解锁结果，顺序与输入一致。
     """
-    results = []
-    for path in filepaths:
-        output_path = str(Path(path).with_stem(Path(path).stem + "_unlocked"))
-        result = unlock_pdf(path, output_path, password)
-        results.append(result)
-    return results
\ No newline at end of file
+    results: List[Optional[UnlockResult]] = [None] * len(filepaths)
+    for idx, result in iter_unlock(filepaths, password, max_workers=max_workers,
+                                   chunksize=chunksize, adaptive=adaptive, profile=profile,
+                                   instrument=instrument, cache=cache, keyring=keyring, sink=sink,
+                                   schedule=schedule, priorities=priorities,
+                                   large_file_bytes=large_file_bytes, large_workers=large_workers,
+                                   memory_budget=memory_budget, timeout=timeout, memory_limit=memory_limit):
+        results[idx] = result
+    return results
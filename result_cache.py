@@ -0,0 +1,194 @@
+"""
+result_cache.py
+
+Content-addressed on-disk cache of unlocked outputs.
+
+Entries are keyed by SHA-256 of the input bytes together with the password, the save
+profile and the versions of the unlocking stack, so a hit is only possible for the exact
+same document opened with the same password. A (path, size, mtime) fingerprint table lets
+unchanged files hit without being read at all. Outputs are hard-linked in and out of the
+cache when the filesystem allows it, and copied otherwise; the cache is trimmed in
+least-recently-used order once it grows past ``max_bytes``.
+
+The index is a SQLite database, so several worker processes can share one cache directory.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("crackleaf")
+
+# Bump when the output produced for a given input changes (new strategy, new defaults...)
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 2 << 30
+
+
+def _stack_version() -> str:
+    import pikepdf
+    import PyPDF2
+    return f"v{CACHE_FORMAT_VERSION}/pikepdf-{pikepdf.__version__}/PyPDF2-{PyPDF2.__version__}"
+
+def _place(source: str, target: str):
+    """Hard-link ``source`` to ``target`` (replacing it), copying across filesystems."""
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+class ResultCache:
+    """
+    Args:
+        directory (str): Cache directory, created if missing.
+        max_bytes (int): Size budget for stored outputs.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._local = threading.local()  # one connection per thread, sqlite3 objects are not shareable
+        self._version: Optional[str] = None
+
+    def __getstate__(self):
+        # Connections cannot cross process or thread boundaries; workers reopen lazily
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["max_bytes"])
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.join(self.directory, "objects"), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, size INTEGER, method TEXT, message TEXT, last_used REAL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS fingerprints (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+            conn.commit()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.directory, "objects", key[:2], key + ".pdf")
+
+    def _key(self, digest: str, password: str, profile: str) -> str:
+        if self._version is None:
+            self._version = _stack_version()
+        material = "\0".join((self._version, profile, hashlib.sha256(password.encode("utf-8")).hexdigest(), digest))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _fingerprint_digest(self, input_path: str) -> Optional[str]:
+        try:
+            stat = os.stat(input_path)
+        except OSError:
+            return None
+        row = self._db().execute(
+            "SELECT digest FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, input_path: str, password: str, profile: str, output_path: str,
+               source: Optional[bytes] = None) -> Optional[dict]:
+        """
+        Return a finished UnlockResult if the output is cached, placing it at ``output_path``.
+
+        Without ``source`` only the (path, size, mtime) fast path is tried and nothing is read.
+        With ``source`` the content digest is computed from the already-loaded bytes.
+        """
+        digest = hashlib.sha256(source).hexdigest() if source is not None else self._fingerprint_digest(input_path)
+        if digest is None:
+            return None
+        key = self._key(digest, password, profile)
+        db = self._db()
+        row = db.execute("SELECT size, method, message FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        stored = self._object_path(key)
+        try:
+            _place(stored, output_path)
+        except OSError:
+            # The object vanished or is unreadable: drop the stale row and treat it as a miss
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            db.commit()
+            return None
+        db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        db.commit()
+        size, method, message = row
+        return {
+            "success": True,
+            "message": message,
+            "method": method,
+            "output_path": output_path,
+            "bytes_read": len(source) if source is not None else 0,
+            "profile": profile,
+            "save_seconds": 0.0,
+            "output_size": size,
+            "cache_hit": True,
+        }
+
+    def store(self, input_path: str, password: str, profile: str, result: dict, source: bytes):
+        """Remember a successful result produced from ``source`` and trim the cache to budget."""
+        if not result.get("success") or not result.get("output_path"):
+            return
+        digest = hashlib.sha256(source).hexdigest()
+        key = self._key(digest, password, profile)
+        stored = self._object_path(key)
+        os.makedirs(os.path.dirname(stored), exist_ok=True)
+        _place(result["output_path"], stored)
+        db = self._db()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, method, message, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, os.path.getsize(stored), result["method"], result["message"], time.time()),
+            )
+            try:
+                stat = os.stat(input_path)
+            except OSError:
+                stat = None
+            if stat is not None and stat.st_size == len(source):
+                db.execute(
+                    "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                    (os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns, digest),
+                )
+        self._evict()
+
+    def _evict(self):
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._object_path(key))
+            except FileNotFoundError:
+                pass
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        db.commit()
+
+    def stats(self) -> dict:
+        """Number of entries and bytes currently stored."""
+        entries, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        """Remove every cached output and fingerprint."""
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM fingerprints")
+        shutil.rmtree(os.path.join(self.directory, "objects"), ignore_errors=True)
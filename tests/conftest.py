@@ -0,0 +1,24 @@
+import multiprocessing
+import os
+
+import pytest
+
+import pdf_unlocker
+
+
+def _fake_unlock(input_path, output_path, password='', **kwargs):
+    """Stand-in for unlock_pdf whose worker dies on any file with 'crash' in its name."""
+    if "crash" in os.path.basename(input_path):
+        os._exit(1)
+    with open(output_path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+    return {"success": True, "message": "ok", "method": "fake", "output_path": output_path,
+            "error_kind": None}
+
+
+@pytest.fixture
+def crashing_unlock(monkeypatch):
+    """Patch unlock_pdf before any pool is forked, so worker processes inherit the patch."""
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("the patched unlock_pdf only reaches forked workers")
+    monkeypatch.setattr(pdf_unlocker, "unlock_pdf", _fake_unlock)
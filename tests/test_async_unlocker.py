@@ -0,0 +1,28 @@
+"""unlock_pdf_async reports a crashed worker as a failed result and recovers the pool."""
+import asyncio
+
+import pytest
+
+import async_unlocker
+from pdf_unlocker import ERROR_RESOURCE
+
+
+@pytest.fixture
+def process_pool(crashing_unlock, monkeypatch):
+    import pdf_unlocker
+    monkeypatch.setattr(async_unlocker, "unlock_pdf", pdf_unlocker.unlock_pdf)
+    async_unlocker.configure_async_executor("process", max_workers=2)
+    yield
+    async_unlocker.shutdown_async_executor()
+
+
+def test_crashed_worker_returns_a_failed_result(tmp_path, process_pool):
+    async def main():
+        crashed = await async_unlocker.unlock_pdf_async(str(tmp_path / "bad_crash.pdf"), str(tmp_path / "a.pdf"))
+        after = await async_unlocker.unlock_pdf_async(str(tmp_path / "good.pdf"), str(tmp_path / "b.pdf"))
+        return crashed, after
+
+    crashed, after = asyncio.run(main())
+    assert not crashed["success"]
+    assert crashed["error_kind"] == ERROR_RESOURCE
+    assert after["success"]
@@ -0,0 +1,69 @@
+"""Killed isolated workers leave existing outputs untouched and no temp files behind."""
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+import isolated_unlocker
+import pdf_unlocker
+from pdf_unlocker import STATUS_OK, STATUS_TIMEOUT
+
+
+def _slow_unlock(input_path, output_path, password='', **kwargs):
+    with open(output_path, "wb") as f:
+        f.write(b"%PDF-partial")
+        f.flush()
+        if "slow" in os.path.basename(input_path):
+            time.sleep(30)
+    return {"success": True, "message": "ok", "method": "fake", "output_path": output_path,
+            "error_kind": None}
+
+
+@pytest.fixture
+def slow_unlock(monkeypatch):
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("the patched unlock_pdf only reaches forked workers")
+    monkeypatch.setattr(isolated_unlocker, "unlock_pdf", _slow_unlock)
+
+
+@pytest.fixture
+def unlocker(slow_unlock):
+    with isolated_unlocker.IsolatedUnlocker(timeout=1) as unlocker:
+        yield unlocker
+
+
+def test_timeout_keeps_existing_output(tmp_path, unlocker):
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"%PDF-old")
+    result = unlocker.unlock(str(tmp_path / "slow.pdf"), str(output))
+    assert result["status"] == STATUS_TIMEOUT
+    assert output.read_bytes() == b"%PDF-old"
+    assert sorted(os.listdir(tmp_path)) == ["out.pdf"]
+
+
+def test_finished_output_is_renamed_into_place(tmp_path, unlocker):
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"%PDF-old")
+    result = unlocker.unlock(str(tmp_path / "fast.pdf"), str(output))
+    assert result["status"] == STATUS_OK
+    assert result["output_path"] == str(output)
+    assert output.read_bytes() == b"%PDF-partial"
+    assert sorted(os.listdir(tmp_path)) == ["out.pdf"]
+
+
+def test_abort_kills_running_isolated_workers(tmp_path, slow_unlock):
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"slow{i}.pdf"
+        path.write_bytes(b"%PDF-1.4\n")
+        paths.append(str(path))
+    abort = threading.Event()
+    threading.Timer(1.0, abort.set).start()
+    started = time.monotonic()
+    results = list(pdf_unlocker.iter_unlock(paths, max_workers=2, timeout=60, output_dir=str(tmp_path),
+                                            abort=abort))
+    assert results == []
+    assert time.monotonic() - started < 10
+    assert sorted(os.listdir(tmp_path)) == ["slow0.pdf", "slow1.pdf"]
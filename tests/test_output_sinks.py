@@ -0,0 +1,13 @@
+"""Archive sinks must not leave a staging directory behind when the archive cannot be opened."""
+import pytest
+
+from output_sinks import TarSink, ZipSink
+
+
+@pytest.mark.parametrize("sink_class", [ZipSink, TarSink])
+def test_failed_open_leaves_no_staging_dir(tmp_path, sink_class):
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    with pytest.raises(OSError):
+        sink_class(str(tmp_path / "missing" / "out.archive"), staging_dir=str(staging))
+    assert list(staging.iterdir()) == []
@@ -0,0 +1,32 @@
+"""FolderWatcher keeps watching after a dropped file kills a worker process."""
+import queue
+import threading
+
+from pdf_unlocker import ERROR_RESOURCE
+from watch_folder import FolderWatcher
+
+
+def test_watcher_survives_a_crashed_worker(tmp_path, crashing_unlock):
+    inbox = tmp_path / "in"
+    inbox.mkdir()
+    results = queue.Queue()
+    watcher = FolderWatcher(str(inbox), output_dir=str(tmp_path / "out"), poll_interval=0.05,
+                            settle_seconds=0.1, on_result=lambda path, result: results.put((path, result)))
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    try:
+        (inbox / "bad_crash.pdf").write_bytes(b"%PDF-1.4\n")
+        path, result = results.get(timeout=30)
+        assert path.endswith("bad_crash.pdf")
+        assert not result["success"]
+        assert result["error_kind"] == ERROR_RESOURCE
+
+        (inbox / "good.pdf").write_bytes(b"%PDF-1.4\n")
+        path, result = results.get(timeout=30)
+        assert path.endswith("good.pdf")
+        assert result["success"]
+        assert thread.is_alive()
+    finally:
+        watcher.stop()
+        thread.join(timeout=30)
+    assert not thread.is_alive()
@@ -0,0 +1,28 @@
+"""A worker process that dies must only fail the file that killed it."""
+import pytest
+
+import pdf_unlocker
+
+
+@pytest.fixture
+def files(tmp_path, crashing_unlock):
+    paths = []
+    for i in range(16):
+        path = tmp_path / (f"{i:02d}_crash.pdf" if i == 5 else f"{i:02d}.pdf")
+        path.write_bytes(b"%PDF-1.4\n")
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("chunksize", [1, 3])
+def test_iter_unlock_survives_a_crashed_worker(files, chunksize):
+    results = dict(pdf_unlocker.iter_unlock(files, max_workers=2, chunksize=chunksize))
+    assert len(results) == len(files)
+    failed = [index for index, result in results.items() if not result["success"]]
+    assert failed == [5]
+    assert results[5]["error_kind"] == pdf_unlocker.ERROR_RESOURCE
+
+
+def test_batch_unlock_files_survives_a_crashed_worker(files):
+    results = pdf_unlocker.batch_unlock_files(files, max_workers=2)
+    assert [result["success"] for result in results] == [i != 5 for i in range(16)]
@@ -0,0 +1,371 @@
+"""
+unlock_server.py
+
+Local HTTP front end for pdf_unlocker, standard library only:
+
+    python -m unlock_server --port 8765 --jobs 4
+    curl --data-binary @locked.pdf -H "X-Password: secret" http://127.0.0.1:8765/unlock -o unlocked.pdf
+
+Requests are handed to a process pool that is started, and its workers spawned, before the
+first request arrives, so pikepdf/PyPDF2 are already imported when a document comes in.
+The upload is held in memory (at most ``max_body_bytes``) and unlocked with unlock_stream;
+the worker writes the unlocked PDF to a temporary file, which the handler streams back in
+64 KiB chunks and then deletes, so the response is never buffered whole in the server.
+
+Endpoints:
+    POST /unlock     PDF as the body; password in the ``X-Password`` header (percent-encoded
+                     if not ASCII), optional ``?profile=``. 200 with the PDF and the
+                     UnlockResult as JSON in ``X-Crackleaf-Result``; on failure a JSON
+                     UnlockResult with a 4xx/5xx status.
+    GET  /healthz    JSON liveness and queue state.
+    GET  /metrics    Prometheus text: MetricsAggregator totals plus server gauges.
+
+At most ``max_pending`` requests are admitted (running or waiting for a worker); beyond
+that the server answers 503 with ``Retry-After`` instead of queueing without bound.
+
+If a worker dies (OOM kill, a document that crashes qpdf), the next request to reach the pool
+gets BrokenProcessPool and the pool is replaced with a fresh, warmed one. Only the requests
+that were running on the broken pool fail; /healthz reports ``degraded`` (with status 503)
+while the new pool is starting.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from pdf_unlocker import (ERROR_DAMAGED, ERROR_IO, ERROR_NOT_PDF, ERROR_PASSWORD, ERROR_RESOURCE,
+                          ERROR_TRUNCATED, ERROR_UNSUPPORTED, SAVE_PROFILES, MetricsAggregator, UnlockResult,
+                          _failure_result, _init_worker, unlock_stream)
+
+logger = logging.getLogger("crackleaf")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BODY_BYTES = 256 << 20
+_CHUNK_BYTES = 64 << 10
+_WARM_TIMEOUT_SECONDS = 60.0
+
+# Failures caused by the document or the password are the client's problem
+_STATUS_BY_KIND = {
+    ERROR_PASSWORD: HTTPStatus.FORBIDDEN,
+    ERROR_NOT_PDF: HTTPStatus.UNPROCESSABLE_ENTITY,
+    ERROR_TRUNCATED: HTTPStatus.UNPROCESSABLE_ENTITY,
+    ERROR_DAMAGED: HTTPStatus.UNPROCESSABLE_ENTITY,
+    ERROR_UNSUPPORTED: HTTPStatus.UNPROCESSABLE_ENTITY,
+    ERROR_IO: HTTPStatus.BAD_REQUEST,
+}
+
+
+_warm_barrier = None  # set in each worker by _init_server_worker
+
+def _init_server_worker(barrier):
+    global _warm_barrier
+    _init_worker()
+    _warm_barrier = barrier
+
+def _warm() -> int:
+    """
+    Pool warm-up task; returns the worker pid so the caller can see how many started.
+
+    Blocks until ``max_workers`` warm-up tasks run at once, so each lands on its own,
+    fully initialised process however fast the others finish.
+    """
+    _warm_barrier.wait(timeout=_WARM_TIMEOUT_SECONDS)
+    return os.getpid()
+
+def _unlock_request(data: bytes, password: str, profile: str, output_path: str) -> UnlockResult:
+    with open(output_path, "wb") as output:
+        return unlock_stream(data, output, password, profile=profile, instrument=True, name="<http>")
+
+
+class UnlockServer:
+    """
+    Args:
+        host (str): Interface to bind; keep the default unless a proxy sits in front.
+        port (int): TCP port, 0 picks a free one (see ``server_address`` after start()).
+        max_workers (Optional[int]): Worker processes; None uses all CPU cores.
+        max_pending (Optional[int]): Requests admitted at once; defaults to 4 per worker.
+        max_body_bytes (int): Largest accepted upload.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.max_body_bytes = max_body_bytes
+        self.metrics = MetricsAggregator()
+        self.started_at = time.time()
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()  # held while a broken pool is being replaced
+        self._pending = 0
+        self._rejected = 0
+        self._pool_restarts = 0
+        self._serving = False
+
+    @property
+    def server_address(self) -> tuple[str, int]:
+        return self._httpd.server_address[:2] if self._httpd else (self.host, self.port)
+
+    def start(self):
+        """Spawn and warm the worker pool, then bind the socket. Does not block."""
+        self._executor = self._start_pool()
+        handler = type("_BoundHandler", (_UnlockHandler,), {"app": self})
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        host, port = self.server_address
+        logger.info(f"[Server] 正在监听 http://{host}:{port}")
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        barrier = multiprocessing.Barrier(self.max_workers)
+        executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_server_worker,
+                                       initargs=(barrier,))
+        warmups = [executor.submit(_warm) for _ in range(self.max_workers)]
+        wait(warmups)
+        pids = {future.result() for future in warmups}
+        logger.info(f"[Server] 已预启动 {len(pids)} 个工作进程")
+        return executor
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Replace ``broken`` with a fresh, warmed pool, unless another thread already did."""
+        with self._pool_lock:
+            if self._executor is not broken:
+                return
+            logger.error("[Server] 工作进程异常退出，正在重建进程池")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start_pool()
+            self._pool_restarts += 1
+
+    def serve_forever(self):
+        """Serve until shutdown() is called from another thread. Calls start() if needed."""
+        if self._httpd is None:
+            self.start()
+        self._serving = True
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._serving = False
+
+    def shutdown(self):
+        """Stop accepting requests and shut the worker pool down."""
+        if self._httpd is not None:
+            if self._serving:
+                self._httpd.shutdown()
+            self._httpd.server_close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    # --- Admission control ---
+    def _admit(self) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def unlock(self, data: bytes, password: str, profile: str, output_path: str) -> UnlockResult:
+        """
+        Run one unlock on the pool, writing the PDF to ``output_path``; the caller must hold
+        an admission slot and remove ``output_path`` afterwards.
+
+        A request that was running when a worker died fails with ERROR_RESOURCE (it may be
+        the document that killed it); one that only found the pool already broken is
+        submitted again to the replacement pool.
+        """
+        for _ in range(2):
+            executor = self._executor
+            try:
+                future = executor.submit(_unlock_request, data, password, profile, output_path)
+            except BrokenProcessPool:
+                self._replace_pool(executor)
+                continue
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                self._replace_pool(executor)
+                result = _failure_result("工作进程异常退出（可能是文件导致解析器崩溃或内存不足）", ERROR_RESOURCE)
+            self.metrics.add(result)
+            return result
+        raise BrokenProcessPool("重建后的进程池仍不可用")
+
+    def health(self) -> dict:
+        with self._lock:
+            pending, rejected = self._pending, self._rejected
+        # Held only while a pool that raised BrokenProcessPool is being replaced
+        restarting = self._pool_lock.locked()
+        return {
+            "status": "degraded" if restarting else "ok",
+            "pool_restarts": self._pool_restarts,
+            "workers": self.max_workers,
+            "pending": pending,
+            "max_pending": self.max_pending,
+            "rejected": rejected,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+        }
+
+    def prometheus(self) -> str:
+        health = self.health()
+        p = MetricsAggregator.PREFIX
+        lines = [
+            f"# HELP {p}_server_pending_requests Requests admitted and not yet answered",
+            f"# TYPE {p}_server_pending_requests gauge",
+            f"{p}_server_pending_requests {health['pending']}",
+            f"# HELP {p}_server_rejected_total Requests refused because the queue was full",
+            f"# TYPE {p}_server_rejected_total counter",
+            f"{p}_server_rejected_total {health['rejected']}",
+            f"# HELP {p}_server_workers Worker processes in the pool",
+            f"# TYPE {p}_server_workers gauge",
+            f"{p}_server_workers {health['workers']}",
+            f"# HELP {p}_server_pool_restarts_total Worker pools replaced after a worker died",
+            f"# TYPE {p}_server_pool_restarts_total counter",
+            f"{p}_server_pool_restarts_total {health['pool_restarts']}",
+        ]
+        return self.metrics.to_prometheus() + "\n".join(lines) + "\n"
+
+
+class _UnlockHandler(BaseHTTPRequestHandler):
+    app: UnlockServer
+    protocol_version = "HTTP/1.1"
+    server_version = "crackleaf"
+
+    def log_message(self, format, *args):
+        logger.debug(f"[Server] {self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/healthz":
+            health = self.app.health()
+            status = HTTPStatus.OK if health["status"] == "ok" else HTTPStatus.SERVICE_UNAVAILABLE
+            self._send_json(status, health)
+        elif path == "/metrics":
+            body = self.app.prometheus().encode("utf-8")
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"message": "未知路径"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/unlock":
+            self.close_connection = True
+            self._send_json(HTTPStatus.NOT_FOUND, {"message": "未知路径"})
+            return
+        profile = parse_qs(url.query).get("profile", ["default"])[0]
+        if profile not in SAVE_PROFILES:
+            self.close_connection = True
+            self._send_json(HTTPStatus.BAD_REQUEST, {"message": f"未知的保存配置: {profile}"})
+            return
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {"message": "需要 Content-Length"})
+            return
+        if int(length) > self.app.max_body_bytes:
+            self.close_connection = True
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            {"message": f"文件超过上限 {self.app.max_body_bytes} 字节"})
+            return
+        # Refuse before reading the body, so an overloaded server does not buffer uploads
+        if not self.app._admit():
+            self.close_connection = True
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"message": "服务器繁忙，请稍后重试"},
+                            {"Retry-After": "1"})
+            return
+        fd, output_path = tempfile.mkstemp(prefix="crackleaf-http-", suffix=".pdf")
+        os.close(fd)
+        try:
+            try:
+                data = self.rfile.read(int(length))
+                password = unquote(self.headers.get("X-Password", ""))
+                result = self.app.unlock(data, password, profile, output_path)
+            except Exception as e:
+                logger.error(f"[Server] 处理请求失败: {type(e).__name__}: {e}")
+                self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                {"success": False, "message": f"服务器错误: {e}"})
+                return
+            finally:
+                self.app._release()
+
+            if not result["success"]:
+                status = _STATUS_BY_KIND.get(result.get("error_kind"), HTTPStatus.INTERNAL_SERVER_ERROR)
+                self._send_json(status, result)
+                return
+            self._send_file(output_path, result)
+        finally:
+            os.remove(output_path)
+
+    def _send_file(self, path: str, result: UnlockResult):
+        summary = {key: value for key, value in result.items() if key != "metrics"}
+        with open(path, "rb") as f:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("X-Crackleaf-Result", json.dumps(summary))  # ASCII-only thanks to \u escapes
+            self.end_headers()
+            while chunk := f.read(_CHUNK_BYTES):
+                self.wfile.write(chunk)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m unlock_server", description="本地 PDF 解锁 HTTP 服务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址，默认 {DEFAULT_HOST}")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口，默认 {DEFAULT_PORT}")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="工作进程数，0 表示使用全部 CPU 核心")
+    parser.add_argument("--max-pending", type=int, default=0, help="同时接受的请求数上限，默认每个工作进程 4 个")
+    parser.add_argument("--max-body-mb", type=int, default=DEFAULT_MAX_BODY_BYTES >> 20, help="单个文件大小上限（MB）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个请求的日志")
+    args = parser.parse_args(argv)
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+
+    server = UnlockServer(args.host, args.port, max_workers=args.jobs or None,
+                          max_pending=args.max_pending or None, max_body_bytes=args.max_body_mb << 20)
+    try:
+        server.start()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"无法启动服务: {e}", file=sys.stderr)
+        return 1
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+watch_folder.py
+
+Long-running drop-folder service around pdf_unlocker.unlock_pdf.
+
+New or changed PDFs are picked up by polling, processed only once their size and mtime have
+stopped changing for ``settle_seconds``, and fed to a bounded process pool. Only directories
+whose mtime changed are rescanned on each poll; a full rescan runs every ``rescan_interval``
+to catch files rewritten in place. Processed (size, mtime) pairs can be persisted so a
+restart does not redo finished work; entries for files that have been deleted or moved away
+are dropped on each full rescan, and the state file is rewritten at most every
+STATE_SAVE_INTERVAL seconds.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from pdf_unlocker import ERROR_RESOURCE, SAVE_PROFILES, Keyring, UnlockResult, _failure_result, _init_worker, _unlock_chunk
+
+logger = logging.getLogger("crackleaf")
+
+FileSignature = Tuple[int, int]  # (size, mtime_ns)
+
+STATE_SAVE_INTERVAL = 5.0  # seconds between state file rewrites while files keep finishing
+
+
+def _signature(path: str) -> Optional[FileSignature]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FolderWatcher:
+    """
+    Watch a directory and unlock every PDF dropped into it.
+
+    Args:
+        directory (str): Folder to watch.
+        password (str): Password used for every file.
+        output_dir (Optional[str]): Where outputs go; next to the input when None.
+        suffix (str): Output file name suffix; files already ending in it are ignored.
+        recursive (bool): Also watch subdirectories.
+        max_workers (int): Process pool size.
+        poll_interval (float): Seconds between polls.
+        settle_seconds (float): How long a file must stay unchanged before it is processed.
+        rescan_interval (float): Seconds between full rescans.
+        state_file (Optional[str]): JSON file recording processed files across restarts.
+        profile (str): PikePDF save profile.
+        keyring (Optional[Keyring]): Candidate passwords checked before ``password``.
+        memory_budget (Optional[int]): Per-file memory budget in bytes, see unlock_pdf.
+        on_result (Optional[Callable[[str, UnlockResult], None]]): Called in the watcher thread
+            for every finished file.
+    """
+
+    def __init__(self, directory: str, password: str = '', output_dir: Optional[str] = None,
+                 suffix: str = "_unlocked", recursive: bool = True, max_workers: int = 2,
+                 poll_interval: float = 0.25, settle_seconds: float = 0.5, rescan_interval: float = 30.0,
+                 state_file: Optional[str] = None, profile: str = "default",
+                 keyring: Optional[Keyring] = None, memory_budget: Optional[int] = None,
+                 on_result: Optional[Callable[[str, UnlockResult], None]] = None):
+        if profile not in SAVE_PROFILES:
+            raise ValueError(f"未知的保存配置: {profile}（可选: {', '.join(SAVE_PROFILES)}）")
+        self.directory = os.path.abspath(directory)
+        self.password = password
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.suffix = suffix
+        self.recursive = recursive
+        self.max_workers = max(1, max_workers)
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.rescan_interval = rescan_interval
+        self.state_file = state_file
+        self.profile = profile
+        self.keyring = keyring
+        self.memory_budget = memory_budget
+        self.on_result = on_result
+
+        self._dir_mtimes: Dict[str, int] = {}
+        self._candidates: Dict[str, Tuple[FileSignature, float]] = {}  # path -> (signature, first seen unchanged)
+        self._ready: deque = deque()
+        self._queued: set = set()
+        self._processed: Dict[str, FileSignature] = self._load_state()
+        self._state_dirty = False
+        self._state_saved_at = 0.0
+        self._last_full_scan = 0.0
+        self._stop = threading.Event()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._options: dict = {}
+        self._suspects: deque = deque()  # files lost when a worker died, rerun one at a time
+
+    # --- State persistence ---
+    def _load_state(self) -> Dict[str, FileSignature]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                return {path: tuple(sig) for path, sig in json.load(f).items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Watch] 状态文件 '{self.state_file}' 无法读取，将重新处理所有文件: {e}")
+            return {}
+
+    def _save_state(self, force: bool = False):
+        if not self.state_file or not self._state_dirty:
+            return
+        if not force and time.monotonic() - self._state_saved_at < STATE_SAVE_INTERVAL:
+            return
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._processed, f)
+        os.replace(tmp, self.state_file)
+        self._state_dirty = False
+        self._state_saved_at = time.monotonic()
+
+    # --- Discovery ---
+    def _wanted(self, path: str) -> bool:
+        if not path.lower().endswith(".pdf") or Path(path).stem.endswith(self.suffix):
+            return False
+        if self.output_dir and os.path.commonpath([self.output_dir, path]) == self.output_dir:
+            return False
+        return True
+
+    def _scan_directory(self, directory: str, full: bool, seen: Optional[Set[str]] = None) -> bool:
+        """
+        Scan ``directory`` (and subdirectories when recursive), adding every directory and
+        wanted file found to ``seen`` if given. Returns False if part of the tree could not
+        be listed, in which case ``seen`` is incomplete.
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            self._dir_mtimes.pop(directory, None)
+            return False
+        changed = self._dir_mtimes.get(directory) != mtime
+        self._dir_mtimes[directory] = mtime
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return False
+        if seen is not None:
+            seen.add(directory)
+        complete = True
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if self.recursive:
+                    complete = self._scan_directory(entry.path, full, seen) and complete
+            elif (full or changed) and entry.is_file() and self._wanted(entry.path):
+                if seen is not None:
+                    seen.add(entry.path)
+                self._consider(entry.path)
+        return complete
+
+    def _forget_missing(self, seen: Set[str]):
+        """Drop state for files and directories that a complete full scan no longer found."""
+        missing = [path for path in self._processed if path not in seen]
+        for path in missing:
+            del self._processed[path]
+        if missing:
+            self._state_dirty = True
+            logger.debug(f"[Watch] {len(missing)} 个已处理文件已被删除或移走，不再记录")
+        self._dir_mtimes = {path: mtime for path, mtime in self._dir_mtimes.items() if path in seen}
+
+    def _consider(self, path: str):
+        signature = _signature(path)
+        if signature is None or path in self._queued or self._processed.get(path) == signature:
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[0] != signature:
+            # New, or still growing: restart the settle timer
+            self._candidates[path] = (signature, time.monotonic())
+
+    def poll(self):
+        """Discover new files and promote those that stopped changing to the ready queue."""
+        now = time.monotonic()
+        full = now - self._last_full_scan >= self.rescan_interval
+        seen: Optional[Set[str]] = set() if full else None
+        if full:
+            self._last_full_scan = now
+        if self._scan_directory(self.directory, full, seen) and full:
+            self._forget_missing(seen)
+
+        for path, (signature, since) in list(self._candidates.items()):
+            current = _signature(path)
+            if current is None:
+                del self._candidates[path]
+            elif current != signature:
+                self._candidates[path] = (current, now)
+            elif now - since >= self.settle_seconds:
+                del self._candidates[path]
+                self._ready.append((path, signature))
+                self._queued.add(path)
+
+    # --- Processing ---
+    def _output_path(self, path: str) -> str:
+        if self.output_dir is None:
+            target = Path(path)
+        else:
+            target = Path(self.output_dir) / os.path.relpath(path, self.directory)
+            target.parent.mkdir(parents=True, exist_ok=True)
+        return str(target.with_stem(target.stem + self.suffix))
+
+    def _finish(self, path: str, signature: FileSignature, result: UnlockResult):
+        self._queued.discard(path)
+        # Record the signature seen when the job started; if the file changed meanwhile it is picked up again
+        self._processed[path] = signature
+        self._state_dirty = True
+        if self.on_result is not None:
+            self.on_result(path, result)
+
+    def stop(self):
+        """Ask run() to return after in-flight files finish."""
+        self._stop.set()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swap a pool broken by a dead worker for a new one (once, however many futures report it)."""
+        if self._executor is not broken:
+            return
+        logger.warning("[Watch] 工作进程异常退出，重建进程池")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_pool()
+
+    def _submit(self, job_entry: Tuple[str, FileSignature], pending: dict, alone: bool = False) -> bool:
+        path, signature = job_entry
+        job = (path, self._output_path(path), self.password)
+        executor = self._executor
+        try:
+            future = executor.submit(_unlock_chunk, [job], self._options)
+        except BrokenProcessPool:
+            # Broke before this file ran: put it back and retry on a fresh pool
+            self._replace_pool(executor)
+            (self._suspects if alone else self._ready).appendleft(job_entry)
+            return False
+        pending[future] = (path, signature, executor, alone)
+        return True
+
+    def _collect(self, future, pending: dict):
+        path, signature, executor, alone = pending.pop(future)
+        try:
+            result = future.result()[0]
+        except BrokenProcessPool:
+            self._replace_pool(executor)
+            if not alone:
+                # Maybe only a victim of another file's crash: run it again, alone on the new pool
+                self._suspects.append((path, signature))
+                return
+            logger.error(f"[Watch] '{path}' 导致工作进程异常退出")
+            result = _failure_result("工作进程异常退出（可能是该文件导致解析器崩溃或内存不足）", ERROR_RESOURCE)
+        except Exception as e:
+            logger.error(f"[Watch] 工作进程异常 ({path}): {type(e).__name__}: {e}")
+            result = _failure_result(f"工作进程异常: {e}")
+        self._finish(path, signature, result)
+
+    def _fill(self, pending: dict):
+        """Hand ready files to the pool; after a crash, the suspects run one at a time first."""
+        if self._suspects:
+            # Alone on the pool, so a crash can only be this file's doing
+            if not pending:
+                self._submit(self._suspects.popleft(), pending, alone=True)
+            return
+        # Bounded hand-off: at most two jobs per worker wait inside the pool
+        while self._ready and len(pending) < self.max_workers * 2:
+            if not self._submit(self._ready.popleft(), pending):
+                return
+
+    def run(self):
+        """
+        Watch until stop() is called. Blocks the calling thread.
+
+        A worker process that dies breaks the pool for every file in flight; the pool is then
+        replaced and those files are run again one at a time, so only the file that kills a
+        worker again is reported as failed and the watcher keeps running.
+        """
+        self._options = {"profile": self.profile, "keyring": self.keyring, "memory_budget": self.memory_budget}
+        pending = {}
+        logger.info(f"[Watch] 开始监视 '{self.directory}'")
+        self._executor = self._new_pool()
+        try:
+            while not self._stop.is_set():
+                self.poll()
+                self._save_state()
+                self._fill(pending)
+                if not pending:
+                    self._stop.wait(self.poll_interval)
+                    continue
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._collect(future, pending)
+            for future in list(pending):
+                self._collect(future, pending)
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._save_state(force=True)
+        logger.info(f"[Watch] 已停止监视 '{self.directory}'")